@@ -404,6 +404,12 @@ Commands" are activated.
 may_have_compiled = False  # has the compiler been called?
 compile_error     = False  # has a compiler error occurred?
 
+# Run the Vocola compiler in this process (vcl2py.compile), which avoids
+# starting python and rebuilding the compiler's tables for each compile.
+# If False, or if the compiler cannot be run in this process, vcl2py.py is
+# run as a separate program:
+use_in_process_compiler = True
+
 # Run Vocola compiler, converting command files from "inputFileOrFolder"
 # and writing output to NatLink/MacroSystem
 def compile_Vocola(inputFileOrFolder, force):
@@ -411,6 +417,15 @@ def compile_Vocola(inputFileOrFolder, force):
 
     may_have_compiled = True
 
+    if use_in_process_compiler:
+        try:
+            compile_Vocola_in_process(inputFileOrFolder, force)
+            return
+        except Exception, e:
+            print >> sys.stderr, \
+                "Vocola compiler failed in process (" + str(e) + \
+                "); running it as a separate program"
+
     executable = sys.prefix + r'\python.exe'
     arguments  = [VocolaFolder + r'\exec\vcl2py.py']
 
@@ -421,6 +436,8 @@ def compile_Vocola(inputFileOrFolder, force):
 
     arguments += ["-suffix", "_vcl"]
     if force: arguments += ["-f"]
+    # convert in parallel when several files are out of date:
+    arguments += ["-parallel", "0"]
 
     arguments += [inputFileOrFolder, NatLinkFolder]
     hidden_call(executable, arguments)
@@ -436,6 +453,29 @@ def compile_Vocola(inputFileOrFolder, force):
         except IOError:  # no log file means no Vocola errors
             pass
 
+# Same as above, with the same options, but without a separate program.
+# The files are converted one after another: worker processes cannot be
+# started from inside NatSpeak.
+def compile_Vocola_in_process(inputFileOrFolder, force):
+    global compiler_error
+    import vcl2py
+
+    options = {"extensions": ExtensionsFolder + r'\extensions.csv',
+               "suffix":     "_vcl",
+               "force":      force}
+    if language == "enx":
+        options["numbers"] = 'zero,one,two,three,four,five,six,seven,eight,nine'
+
+    diagnostics, log, rebuilt = vcl2py.compile([inputFileOrFolder],
+                                               NatLinkFolder, options)
+    # conversions caused by a changed include or extensions file:
+    for input_name, reason, changed in rebuilt:
+        if changed:
+            print "Vocola: converting " + input_name + " because " + reason
+    if diagnostics:
+        compiler_error = True
+        print >> sys.stderr, log
+
 # Unload all commands, including those of files no longer existing
 def purgeOutput():
     pattern = re.compile("_vcl\d*\.pyc?$")
@@ -470,6 +510,8 @@ def compile_changed():
     global lastVocolaFileTime, lastCommandFolderTime
     global compiler_error
 
+    # (converts only the files whose .vcl file, include files or
+    # extensions file changed, see vcl2py.dependencies)
     current = getLastVocolaFileModTime()
     if current > lastVocolaFileTime:
         compiler_error = False
@@ -486,14 +528,104 @@ def compile_changed():
     #    deleteOrphanFiles()
 
 # Returns the newest modified time of any Vocola command folder file or
-# 0 if none:
+# 0 if none.
+#
+# This is called before every utterance, so the result is cached and the
+# folder's files are only listed and stat'ed again when the folder may
+# have changed:
+#   - with pywin32, when a change notification for the folder (file
+#     created, removed, renamed or written) was signaled; the handle is
+#     polled here rather than waited on by a thread, because Python threads
+#     only run while NatLink is running Python code
+#   - else, when the folder's own modification time changed (a file was
+#     created, removed or renamed, as most editors do when saving) or
+#     commandFolderRescanInterval seconds passed (for files written in
+#     place, which does not change the folder's time)
+commandFolderRescanInterval = 2.0
+commandFolderStats = dict(calls=0, scans=0, statCalls=0, statCallsSaved=0)
+commandFolderCache    = None  # [folder time, newest time, number of files, scan time]
+commandFolderWatcher  = None  # change notification handle, see startCommandFolderWatcher
+
 def getLastVocolaFileModTime():
-    last = 0
-    if commandFolder:
-        last = max([last] +
-                   [vocolaGetModTime(os.path.join(commandFolder,f))
-                    for f in os.listdir(commandFolder)])
-    return last
+    global commandFolderCache
+    if not commandFolder:
+        return 0
+    commandFolderStats['calls'] += 1
+    now = time.time()
+    if commandFolderWatcher:
+        changed = commandFolderChanged()
+        folderTime = 0
+    else:
+        folderTime = vocolaGetModTime(commandFolder)
+        commandFolderStats['statCalls'] += 1
+        changed = not commandFolderCache or \
+                  commandFolderCache[0] != folderTime or \
+                  now - commandFolderCache[3] >= commandFolderRescanInterval
+    if changed or not commandFolderCache:
+        files = os.listdir(commandFolder)
+        last = max([0] + [vocolaGetModTime(os.path.join(commandFolder,f))
+                          for f in files])
+        commandFolderStats['scans'] += 1
+        commandFolderStats['statCalls'] += len(files)
+        commandFolderCache = [folderTime, last, len(files), now]
+    else:
+        commandFolderStats['statCallsSaved'] += commandFolderCache[2]
+    return commandFolderCache[1]
+
+# Watch the command folder with a Windows change notification; returns
+# False if that is not possible (no pywin32), then the folder's time is
+# checked instead.
+def startCommandFolderWatcher():
+    global commandFolderWatcher
+    if commandFolderWatcher or not commandFolder:
+        return bool(commandFolderWatcher)
+    try:
+        import win32file, win32con
+        commandFolderWatcher = win32file.FindFirstChangeNotification(
+            commandFolder, 0,
+            win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
+            win32con.FILE_NOTIFY_CHANGE_SIZE |
+            win32con.FILE_NOTIFY_CHANGE_LAST_WRITE)
+    except ImportError:
+        return False
+    except Exception, e:
+        print >> sys.stderr, "Vocola: cannot watch command folder: " + str(e)
+        return False
+    return True
+
+def stopCommandFolderWatcher():
+    global commandFolderWatcher, commandFolderCache
+    if commandFolderWatcher:
+        import win32file
+        win32file.FindCloseChangeNotification(commandFolderWatcher)
+        commandFolderWatcher = None
+        commandFolderCache   = None
+
+# Returns whether the command folder changed since the previous call
+# (always true the first time):
+def commandFolderChanged():
+    import win32event, win32file
+    changed = not commandFolderCache
+    # the notification stays signaled until reset by FindNextChangeNotification:
+    while win32event.WaitForSingleObject(commandFolderWatcher, 0) == \
+              win32event.WAIT_OBJECT_0:
+        changed = True
+        win32file.FindNextChangeNotification(commandFolderWatcher)
+    return changed
+
+# Returns a copy of the counters of getLastVocolaFileModTime, plus the
+# average number of stat calls saved per call:
+def getCommandFolderStats():
+    stats = dict(commandFolderStats)
+    stats['statCallsSavedPerCall'] = 0.0
+    if stats['calls']:
+        stats['statCallsSavedPerCall'] = \
+            float(stats['statCallsSaved']) / stats['calls']
+    return stats
+
+def resetCommandFolderStats():
+    for key in commandFolderStats:
+        commandFolderStats[key] = 0
 
 # Returns the modification time of a file or 0 if the file does not exist:
 def vocolaGetModTime(file):
@@ -637,13 +769,15 @@ purgeOutput()
 if not VocolaEnabled:
     print "Vocola not active"
 else:
-    print "Vocola version 2.8.6 starting..."
+    print "Vocola version 2.8.7 starting..."
     thisGrammar = ThisGrammar()
     thisGrammar.initialize()
+    startCommandFolderWatcher()
 
 
 def unload():
     global thisGrammar
     disable_callback()
+    stopCommandFolderWatcher()
     if thisGrammar: thisGrammar.unload()
     thisGrammar = None
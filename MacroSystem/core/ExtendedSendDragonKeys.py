@@ -14,6 +14,7 @@
 import re
 import win32con
 
+from collections import OrderedDict
 from ctypes    import *
 from SendInput import *
 
@@ -24,7 +25,29 @@ debug = False
 # ignore_unknown_names True means type out bad chords rather than
 # raising a KeyError; e.g., "{bad}" sends {, b, a, d, }.
 #
+# Returns a tuple of events, which is shared with later calls for the same
+# input (see Event_cache below), so the events must not be modified.
+#
 def senddragonkeys_to_events(input, ignore_unknown_names=True):
+    if debug or Event_cache_size <= 0:
+        return tuple(build_events(input, ignore_unknown_names))
+
+    # the events depend on the keyboard layout and the swapping of the
+    # mouse buttons, which can change while running:
+    key = (input, ignore_unknown_names, GetKeyboardLayout(0),
+           GetSystemMetrics(win32con.SM_SWAPBUTTON))
+    try:
+        events = Event_cache.pop(key)
+        Event_cache_stats["hits"] += 1
+    except KeyError:
+        events = tuple(build_events(input, ignore_unknown_names))
+        Event_cache_stats["misses"] += 1
+        if len(Event_cache) >= Event_cache_size:
+            Event_cache.popitem(last=False)   # least recently used
+    Event_cache[key] = events
+    return events
+
+def build_events(input, ignore_unknown_names=True):
     chords = parse_into_chords(input)
 
     events = []
@@ -44,6 +67,20 @@ def senddragonkeys_to_events(input, ignore_unknown_names=True):
 
     return events
 
+
+## 
+## Cache of the events of the most recently used inputs: Vocola commands
+## send the same key strings over and over.
+## 
+
+Event_cache_size  = 500   # 0 disables the cache
+Event_cache       = OrderedDict()   # key: tuple of events, oldest first
+Event_cache_stats = {"hits": 0, "misses": 0}
+
+def clear_event_cache():
+    Event_cache.clear()
+    Event_cache_stats["hits"] = Event_cache_stats["misses"] = 0
+
     
 
 ### 
@@ -60,18 +97,27 @@ def senddragonkeys_to_events(input, ignore_unknown_names=True):
 
 def parse_into_chords(specification):
     chords = []
+    append = chords.append
+    match  = chord_pattern.match
     
-    while len(specification) > 0:
-        m = chord_pattern.match(specification)
+    # advance a position rather than slicing off each chord, which was
+    # quadratic in the length of the specification:
+    position = 0
+    end      = len(specification)
+    while position < end:
+        if specification[position] == "{":
+            m = match(specification, position)
+        else:
+            m = None
         if m:
             modifiers = m.group(1)
             if modifiers: modifiers = modifiers[:-1]  # remove final "+"
-            chords += [[modifiers, m.group(2), m.group(3), m.group(0)]]
-            specification = specification[m.end():]
+            append([modifiers, m.group(2), m.group(3), m.group(0)])
+            position = m.end()
         else:
-            char = specification[0]
-            chords += [[None, char, None, char]]
-            specification = specification[1:]
+            char = specification[position]
+            append([None, char, None, char])
+            position += 1
     
     return chords
 
@@ -124,6 +124,11 @@ def do_flush(functional_context, buffer):
         natlink.playString(convert_keys(buffer))
     return ''
 
+# plays keys vcl2py already converted with convert_key_names (a flush of
+# a buffer holding only text known when the command file was converted):
+def play_converted_keys(keys):
+    natlink.playString(prefix_shift(keys))
+
 
 
 ##
@@ -132,18 +137,26 @@ def do_flush(functional_context, buffer):
 
 dragon_prefix = ""
 
-def convert_keys(keys):
-    # Roughly, {<keyname>_<count>}'s -> {<keyname> <count>}:
-    #   (is somewhat generous about what counts as a key name)
-    #
-    # Because we can't be sure of the current code page, treat all non-ASCII
-    # characters as potential accented letters for now.
-    keys = re.sub(r"""(?x)
+# Roughly, {<keyname>_<count>}'s -> {<keyname> <count>}:
+#   (is somewhat generous about what counts as a key name)
+#
+# Because we can't be sure of the current code page, treat all non-ASCII
+# characters as potential accented letters for now.
+#
+# (vcl2py's emit.py has a copy of this to convert constant keys.)
+key_name_pattern = re.compile(r"""(?x)
                       \{ ( (?: [a-zA-Z\x80-\xff]+ \+ )*
                            (?:[^}]|[-a-zA-Z0-9/*+.\x80-\xff]+) )
                       [ _]
-                      (\d+) \}""", r'{\1 \2}', keys)
+                      (\d+) \}""")
+
+def convert_keys(keys):
+    return prefix_shift(convert_key_names(keys))
 
+def convert_key_names(keys):
+    return key_name_pattern.sub(r'{\1 \2}', keys)
+
+def prefix_shift(keys):
     # prefix with current language appropriate version of {shift}
     # to prevent doubling/dropping bug:
     shift = name_for_shift()
@@ -252,49 +265,62 @@ def call_Unimacro(argumentString):
 ## EvalTemplate built-in function:
 ##
 
-def eval_template(template, *arguments):
-    variables = {}
-
-    waiting = list(arguments)
-    def get_argument():
-        if len(waiting) == 0:
-            raise VocolaRuntimeError(
-                "insufficient number of arguments passed to Eval[Template]")
-        return waiting.pop(0)
-
-    def get_variable(value):
-        argument_number = len(arguments)-len(waiting)
-        name = "v" + str(argument_number)
-        variables[name] = value
-        return name
-
-    # is string the canonical representation of a long?
-    def isCanonicalNumber(string):
-        try:
-            return str(long(string)) == string
-        except ValueError:
-            return 0
+# The Python expression of a template and its code only depend on the
+# template (the arguments are bound to the variables v1, v2, ...), so they
+# are computed once per template:
+#   template -> [expression, descriptors of the arguments, code or None]
+# (templates computed at runtime could be all different, hence the limit)
+template_cache = {}
+template_cache_size = 500
 
+def compile_template(template):
+    descriptors = []
     def handle_descriptor(m):
         descriptor = m.group()
         if descriptor == "%%":
             return "%"
-        elif descriptor == "%s":
-            return get_variable(str(get_argument()))
-        elif descriptor == "%i":
-            return get_variable(to_long(get_argument()))
-        elif descriptor == "%a":
-            a = get_argument()
-            if isCanonicalNumber(a):
-                return get_variable(long(a))
-            else:
-                return get_variable(str(a))
+        elif descriptor in ("%s", "%i", "%a"):
+            descriptors.append(descriptor)
+            return "v" + str(len(descriptors))
         else:
             return descriptor
 
     expression = re.sub(r'%.', handle_descriptor, template)
+    compiled = [expression, descriptors, None]
+    if len(template_cache) >= template_cache_size:
+        template_cache.clear()
+    template_cache[template] = compiled
+    return compiled
+
+def eval_template(template, *arguments):
+    compiled = template_cache.get(template) or compile_template(template)
+    expression, descriptors, code = compiled
+    if len(descriptors) > len(arguments):
+        # (after the conversions of the arguments before the missing one)
+        for descriptor, argument in zip(descriptors, arguments):
+            if descriptor == "%i": to_long(argument)
+        raise VocolaRuntimeError(
+            "insufficient number of arguments passed to Eval[Template]")
+
+    variables = {}
+    for i in range(len(descriptors)):
+        descriptor = descriptors[i]
+        argument   = arguments[i]
+        if descriptor == "%s":
+            value = str(argument)
+        elif descriptor == "%i":
+            value = to_long(argument)
+        elif isCanonicalNumber(argument):
+            value = long(argument)
+        else:
+            value = str(argument)
+        variables["v" + str(i+1)] = value
+
     try:
-        return eval('str(' + expression + ')', variables.copy())
+        if code is None:
+            code = compile('str(' + expression + ')', '<string>', 'eval')
+            compiled[2] = code
+        return eval(code, variables.copy())
     except VocolaRuntimeAbort:
         raise
     except Exception, e:
@@ -308,3 +334,10 @@ def eval_template(template, *arguments):
         m += '    Python reported the following error:\n' \
             + '        ' + type(e).__name__ + ": " + str(e)
         raise VocolaRuntimeError, m
+
+# is string the canonical representation of a long?
+def isCanonicalNumber(string):
+    try:
+        return str(long(string)) == string
+    except ValueError:
+        return 0
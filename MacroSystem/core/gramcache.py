@@ -0,0 +1,181 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+"""gramcache.py
+
+On-disk cache of packed grammars, used by GrammarBase.load (natlinkutils.py).
+
+Parsing and packing a big grammar (Unimacro, Vocola) takes noticeable time,
+and it is done again at each user switch and mic on.  Here the packed binary
+and the rule maps of the parser are stored in a file per grammar, keyed by a
+sha1 hash of the (normalised, see gramparser.splitApartLines) gramSpec and
+gramparser.GramParserVersion.  A cache hit skips the scanner and parser.
+
+The total size of the cache files is kept below maxCacheSize, the least
+recently used files (by modification time, which is touched on each hit)
+are removed first.
+
+get(gramSpec): returns (gramBin, knownRules, exportRules, knownLists), or None
+put(gramSpec, gramBin, parser): stores the results of a parse
+setCacheDirectory(directory): None (the default) switches the cache off;
+                  natlinkmain sets it to getUserCacheDirectory() at startup
+getUserCacheDirectory(): the per user folder natlink\grammarcache in the
+                  local application data folder (the install folder is often
+                  read only)
+clearCache(): remove all cache files
+getCacheStats(), resetCacheStats(): hits, misses, stores, evictions, errors
+
+"""
+import os, os.path, marshal
+import gramparser
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+cacheExtension = '.gram'
+maxCacheSize = 4*1024*1024  # bytes
+cacheDirectory = None       # off until set by natlinkmain
+cacheStats = dict(hits=0, misses=0, stores=0, evictions=0, errors=0)
+writeErrorReported = 0      # the write error is only printed once
+
+def setCacheDirectory(directory):
+    """set the cache directory, None switches off the cache"""
+    global cacheDirectory, writeErrorReported
+    cacheDirectory = directory
+    writeErrorReported = 0
+
+def getUserCacheDirectory():
+    """the per user folder for the cache"""
+    appData = os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or \
+              os.path.expanduser('~')
+    return os.path.join(appData, 'natlink', 'grammarcache')
+
+def getCacheKey(gramSpec):
+    """return the cache key (hex string) of a gramSpec (list of lines)"""
+    h = sha1('gramparser %s\n'% gramparser.GramParserVersion)
+    h.update('\n'.join(gramSpec))
+    return h.hexdigest()
+
+def getCacheFile(gramSpec):
+    return os.path.join(cacheDirectory, getCacheKey(gramSpec) + cacheExtension)
+
+def get(gramSpec):
+    """return (gramBin, knownRules, exportRules, knownLists) of the gramSpec
+
+    or None if the grammar is not in the cache
+    """
+    if not cacheDirectory:
+        return None
+    filepath = getCacheFile(gramSpec)
+    try:
+        f = open(filepath, 'rb')
+    except IOError:
+        cacheStats['misses'] += 1
+        return None
+    try:
+        try:
+            version, gramBin, knownRules, exportRules, knownLists = marshal.load(f)
+        finally:
+            f.close()
+        if version != gramparser.GramParserVersion:
+            raise ValueError('gramcache, wrong version: %s'% version)
+    except (EOFError, ValueError, TypeError):
+        # damaged or outdated file, remove:
+        cacheStats['errors'] += 1
+        cacheStats['misses'] += 1
+        removeFile(filepath)
+        return None
+    try:
+        os.utime(filepath, None)  # most recently used
+    except OSError:
+        pass
+    cacheStats['hits'] += 1
+    return gramBin, knownRules, exportRules, knownLists
+
+def put(gramSpec, gramBin, parser):
+    """store the packed grammar and the rule maps of parser (a GramParser instance)"""
+    global writeErrorReported
+    if not cacheDirectory:
+        return
+    data = marshal.dumps( (gramparser.GramParserVersion, gramBin, parser.knownRules,
+                           parser.exportRules, parser.knownLists) )
+    filepath = getCacheFile(gramSpec)
+    tempPath = filepath + '.tmp'
+    try:
+        if not os.path.isdir(cacheDirectory):
+            os.makedirs(cacheDirectory)
+        f = open(tempPath, 'wb')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        if os.path.isfile(filepath):
+            os.remove(filepath)
+        os.rename(tempPath, filepath)
+    except (IOError, OSError), message:
+        if not writeErrorReported:
+            print 'gramcache, could not write cache file %s: %s'% (filepath, message)
+            writeErrorReported = 1
+        cacheStats['errors'] += 1
+        removeFile(tempPath)
+        return
+    cacheStats['stores'] += 1
+    evict(keep=filepath)
+
+def evict(keep=None, maxSize=None):
+    """remove least recently used files until the cache is within maxSize
+
+    the file keep (just written) is never removed
+    """
+    if maxSize is None:
+        maxSize = maxCacheSize
+    entries = []
+    totalSize = 0
+    try:
+        names = os.listdir(cacheDirectory)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith(cacheExtension):
+            continue
+        filepath = os.path.join(cacheDirectory, name)
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            continue
+        totalSize += st.st_size
+        entries.append( (st.st_mtime, st.st_size, filepath) )
+    if totalSize <= maxSize:
+        return
+    entries.sort()
+    for mtime, size, filepath in entries:
+        if totalSize <= maxSize:
+            break
+        if filepath == keep:
+            continue
+        if removeFile(filepath):
+            totalSize -= size
+            cacheStats['evictions'] += 1
+
+def removeFile(filepath):
+    try:
+        os.remove(filepath)
+        return 1
+    except OSError:
+        return 0
+
+def clearCache():
+    """remove all cache files"""
+    if not (cacheDirectory and os.path.isdir(cacheDirectory)):
+        return
+    for name in os.listdir(cacheDirectory):
+        if name.endswith(cacheExtension):
+            removeFile(os.path.join(cacheDirectory, name))
+
+def getCacheStats():
+    return dict(cacheStats)
+
+def resetCacheStats():
+    for key in cacheStats:
+        cacheStats[key] = 0
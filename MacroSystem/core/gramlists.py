@@ -0,0 +1,97 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+"""gramlists.py
+
+ListManager, used by GrammarBase (natlinkutils.py) for emptyList, appendList
+and setList.
+
+Grammars often refresh lists (windows, files, contacts) with the same contents
+in each gotBegin.  The ListManager remembers the words which are in each list
+of the grammar object, so:
+
+- setList with the same words does nothing,
+- setList with only additions appends only the new words,
+- setList with removals empties the list and appends the new words, because
+  the natlink GramObj has no call to remove words from a list.
+
+The GramObj takes one word per appendList call.  If the grammar object has a
+method appendListWords(listName, words), it is used instead, one call per
+batch of words.
+
+This module does not import natlink, so it can be tested with a stand-in
+grammar object (see PyTest/unittestGramlists.py).
+"""
+
+class ListManager(object):
+
+    def __init__(self, gramObj):
+        self.gramObj = gramObj
+        self.contents = {}  # listName: list of words in the gramObj
+        self.stats = dict(emptyCalls=0, appendCalls=0, unchanged=0, incremental=0, rebuilt=0)
+
+    def reset(self):
+        """forget all contents, when the grammar is (un)loaded"""
+        self.contents = {}
+
+    def getList(self, listName):
+        """return the words of the list, as far as known, or None"""
+        words = self.contents.get(listName)
+        if words is None:
+            return None
+        return list(words)
+
+    def emptyList(self, listName):
+        self.gramObj.emptyList(listName)
+        self.stats['emptyCalls'] += 1
+        self.contents[listName] = []
+
+    def appendList(self, listName, words):
+        if type(words) == type(""):
+            words = [words]
+        else:
+            words = list(words)
+        if not words:
+            return
+        appendListWords = getattr(self.gramObj, 'appendListWords', None)
+        if appendListWords:
+            appendListWords(listName, words)
+            self.stats['appendCalls'] += 1
+        else:
+            appendList = self.gramObj.appendList
+            for word in words:
+                appendList(listName, word)
+            self.stats['appendCalls'] += len(words)
+        if listName in self.contents:
+            self.contents[listName].extend(words)
+        # if the contents were unknown they stay unknown
+
+    def setList(self, listName, words):
+        """make the list contain words, with as few calls to the gramObj as possible"""
+        if type(words) == type(""):
+            words = [words]
+        else:
+            words = list(words)
+        old = self.contents.get(listName)
+        if old is None:
+            self.emptyList(listName)
+            self.appendList(listName, words)
+            return
+        if old == words:
+            self.stats['unchanged'] += 1
+            return
+        oldSet = set(old)
+        newSet = set(words)
+        if oldSet == newSet and len(old) == len(oldSet) and len(words) == len(newSet):
+            # only the order changed, which does not matter for recognition
+            self.contents[listName] = words
+            self.stats['unchanged'] += 1
+            return
+        if oldSet <= newSet and len(old) == len(oldSet):
+            added = [w for w in words if w not in oldSet]
+            self.appendList(listName, added)  # also extends self.contents[listName]
+            self.stats['incremental'] += 1
+            return
+        self.emptyList(listName)
+        self.appendList(listName, words)
+        self.stats['rebuilt'] += 1
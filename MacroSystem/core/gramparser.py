@@ -50,8 +50,13 @@
 # 
 ########################################################################
 
-from struct import pack
+from struct import Struct
 import re, sys, os, os.path, traceback
+
+# increase when a change in this module changes the packed grammar binary
+# or the rule/list numbering, so grammars cached by gramcache.py are rebuilt:
+GramParserVersion = 1
+
 reAlphaNumeric = re.compile('\w+$')
 #
 # This is the lexical scanner.
@@ -306,6 +311,110 @@ class GramScanner(object):
 
         self.char = ch
 
+# the master patterns of GramRegexScanner, per value of string.letters
+# (which can depend on the locale):
+scanPatterns = {}
+
+def getScanPatterns():
+    """return the (token, skip) patterns for GramRegexScanner
+
+    token matches whitespace and comments, followed by one token, the kind of token
+    is the name of the last group. Word characters are the characters of
+    isCharOrDigit: string.letters, string.digits and ordinal >= 192.
+    skip only matches the whitespace and comments (for error positions).
+    """
+    letters = string.letters + string.digits
+    try:
+        return scanPatterns[letters]
+    except KeyError:
+        pass
+    whitespace = re.escape(string.whitespace)
+    skip = r'(?P<skip>[%s]*(?:\#[^\n]*[%s]*)*)'% (whitespace, whitespace)
+    token = skip + r"""(?:
+         (?P<punct>[()\[\]|+=;\0])
+        |"(?P<dqword>[^"\n]*)"
+        |'(?P<sqword>[^'\n]*)'
+        |<(?P<rule>[^>\n]*)>
+        |\{(?P<list>[^}\n]*)\}
+        |(?P<word>(?:[%s]|[^\x00-\xbf])+)
+        )"""% re.escape(letters)
+    patterns = re.compile(token, re.X), re.compile(skip)
+    scanPatterns[letters] = patterns
+    return patterns
+
+class GramRegexScanner(GramScanner):
+    """scanner which gives the same tokens, values and error positions as GramScanner
+
+    The text is joined and scanned with one regular expression (see getScanPatterns)
+    instead of character by character.  After each token self.line, self.start and
+    self.char are set as in GramScanner, so error messages are identical.
+
+    self.lastWhiteSpace is not maintained, GramScannerReverse needs GramScanner.
+    """
+    def __init__(self, text=None, grammarName=None):
+        GramScanner.__init__(self, text, grammarName=grammarName)
+        # GramScanner does this while advancing through the lines:
+        for i in range(1, len(self.text)):
+            self.text[i] = self.text[i].replace('\t', ' ').replace('\n', ' ')
+        self.nextToken = self.tokenize().next
+
+    def newText(self,text):
+        GramRegexScanner.__init__(self, text)
+
+    def tokenize(self):
+        """generator, gives (token, value, line, start, char) for each token
+
+        lexical errors are raised when the token is reached, so syntax errors before
+        it are reported first, as in GramScanner
+        """
+        tokenPattern, skipPattern = getScanPatterns()
+        match = tokenPattern.match
+        text = '\n'.join(self.text)
+        lineStarts = []
+        pos = 0
+        for ln in self.text:
+            lineStarts.append(pos)
+            pos = pos + len(ln) + 1
+        lineStarts.append(pos)
+        line = 0
+        pos = 0
+        while 1:
+            m = match(text, pos)
+            if m is None:
+                start = skipPattern.match(text, pos).end()
+                while lineStarts[line+1] <= start:
+                    line = line + 1
+                self.line = line
+                self.start = self.char = start - lineStarts[line]
+                ch = text[start]
+                if ch == '"' or ch == "'":
+                    raise LexicalError( "expecting closing quote in word name", self)
+                elif ch == '<':
+                    raise LexicalError( "expecting closing angle bracket in rule name", self)
+                elif ch == '{':
+                    raise LexicalError( "expecting closing brace in list name", self)
+                else:
+                    raise LexicalError( "unknown character found", self)
+
+            start = m.end('skip')
+            while lineStarts[line+1] <= start:
+                line = line + 1
+            pos = m.end()
+            kind = m.lastgroup
+            if kind == 'punct':
+                yield text[start], None, line, start - lineStarts[line], pos - lineStarts[line]
+            else:
+                yield kind, m.group(kind), line, start - lineStarts[line], pos - lineStarts[line]
+
+    def getAnotherToken(self):
+        """return a token and (if appropriate) the corresponding value
+        
+        see GramScanner.getAnotherToken
+        """    
+        if self.token == '\0':
+            return None
+        self.token, self.value, self.line, self.start, self.char = self.nextToken()
+
 ## generator function, scanning the tokens and whitespace of a gramspec:
 ## this class can scan a grammar, return the tokens in a generator function
 ## and put back the results exactly the same:
@@ -410,10 +519,14 @@ class peek_ahead(object):
 # type and element value
 #
 
+# the scanner used by GramParser, GramScanner is the character by character version:
+GramParserScanner = GramRegexScanner
+
 class GramParser(object):
 
-    def __init__(self,text=[''], grammarName=None):
-        self.scanObj = GramScanner(text, grammarName=grammarName)
+    def __init__(self,text=[''], grammarName=None, scannerClass=None):
+        scannerClass = scannerClass or GramParserScanner
+        self.scanObj = scannerClass(text, grammarName=grammarName)
         self.knownRules = {}
         self.knownWords = {}
         self.knownLists = {}
@@ -693,74 +806,135 @@ class GramParser(object):
 # defined rule.
 #
 
+# the (native) structures used in the packing, compiled once:
+dwordPair = Struct("LL")
+ruleElement = Struct("HHL")
+
 def packGrammar(parseObj):
-    output = ""
+    # the size of all chunks is computed first, then everything is written
+    # into one preallocated buffer (linear in the size of the grammar)
+    chunks = []
+    if len(parseObj.exportRules):
+        chunks.append( (4, parseObj.exportRules, None) )
+    if len(parseObj.importRules):
+        chunks.append( (5, parseObj.importRules, None) )
+    if len(parseObj.knownLists):
+        chunks.append( (6, parseObj.knownLists, None) )
+    if len(parseObj.knownWords):
+        chunks.append( (2, parseObj.knownWords, None) )
+    if len(parseObj.ruleDefines):
+        chunks.append( (3, parseObj.ruleDefines, parseObj.knownRules) )
 
     # header:
     #   DWORD dwType  = 0
     #   DWORD dwFlags = 0
-    output = output + pack("LL", 0, 0)
+    size = dwordPair.size
+    for type, dict, names in chunks:
+        if names is None:
+            size = size + sizeGrammarChunk(dict)
+        else:
+            size = size + sizeGrammarRules(dict)
+    buf = bytearray(size)
+    dwordPair.pack_into(buf, 0, 0, 0)
+    offset = dwordPair.size
 
     # various chunks
-    if len(parseObj.exportRules):
-        output = output + packGrammarChunk(4, parseObj.exportRules)
-    if len(parseObj.importRules):
-        output = output + packGrammarChunk(5, parseObj.importRules)
-    if len(parseObj.knownLists):
-        output = output + packGrammarChunk(6, parseObj.knownLists)
-    if len(parseObj.knownWords):
-        output = output + packGrammarChunk(2, parseObj.knownWords)
-    if len(parseObj.ruleDefines):
-        output = output + packGrammarRules(3, parseObj.knownRules, parseObj.ruleDefines)
-    return output
+    for type, dict, names in chunks:
+        if names is None:
+            offset = packGrammarChunkInto(buf, offset, type, dict)
+        else:
+            offset = packGrammarRulesInto(buf, offset, type, names, dict)
+    return str(buf)
 
 
 def packGrammarChunk(type,dict):
-    output = ""
+    buf = bytearray(sizeGrammarChunk(dict))
+    packGrammarChunkInto(buf, 0, type, dict)
+    return str(buf)
+
+def sizeGrammarChunk(dict):
+    """return the number of bytes packGrammarChunkInto writes"""
+    size = dwordPair.size * (len(dict) + 1)
+    for word in dict:
+        size = size + (( len(word) + 4 ) & 0xFFFC)
+    return size
+
+def packGrammarChunkInto(buf, offset, type, dict):
+    """write the chunk into buf (a bytearray) at offset, return the offset after it
+
+    buf must be zero filled, the padding of the names is not written
+    """
+    headerOffset = offset
+    headerSize = dwordPair.size
+    offset = offset + headerSize
     totalLen = 0
+    packInto = dwordPair.pack_into
 
-    for word in dict.keys():
+    for word, number in dict.items():
         # chunk data entry
         #   DWORD dwSize = number of bytes in entry
         #   DWORD dwNum  = ID number for this rule/word
         #   DWORD szName = name of rule/word, zero-term'd and padded to dword
         paddedLen = ( len(word) + 4 ) & 0xFFFC
-        output = output + pack( "LL%ds" % paddedLen, paddedLen+8, dict[word], word )
+        packInto( buf, offset, paddedLen+8, number )
+        buf[offset+headerSize:offset+headerSize+len(word)] = word
+        offset = offset + headerSize + paddedLen
         totalLen = totalLen + paddedLen+8
 
     # chunk header
     #   DWORD dwChunkID = type
     #   DWORD dwChunkSize = number of bytes in chunk not including this header
-    return pack( "LL", type, totalLen ) + output
+    packInto( buf, headerOffset, type, totalLen )
+    return offset
+
 
+elemType = { 'start':1, 'end':2, 'word':3, 'rule':4, 'list':6 }
 
 def packGrammarRules(type,names,dict):
-    output = ""
+    buf = bytearray(sizeGrammarRules(dict))
+    packGrammarRulesInto(buf, 0, type, names, dict)
+    return str(buf)
+
+def sizeGrammarRules(dict):
+    """return the number of bytes packGrammarRulesInto writes"""
+    size = dwordPair.size * (len(dict) + 1)
+    for elements in dict.values():
+        size = size + ruleElement.size*len(elements)
+    return size
+
+def packGrammarRulesInto(buf, offset, type, names, dict):
+    """write the rules chunk into buf (a bytearray) at offset, return the offset after it"""
+    headerOffset = offset
+    offset = offset + dwordPair.size
     totalLen = 0
-    elemType = { 'start':1, 'end':2, 'word':3, 'rule':4, 'list':6 }
+    packHeader = dwordPair.pack_into
+    packElement = ruleElement.pack_into
+    headerSize, elemSize = dwordPair.size, ruleElement.size
 
-    for word in dict.keys():
-        ruleDef = ""
-        ruleLen = 0
+    for word, elements in dict.items():
+        ruleOffset = offset
+        offset = offset + headerSize
 
-        for element in dict[word]:
+        for element in elements:
             # repeated element:
             #   WORD wType    = element type
             #   WORD wProb    = 0
             #   DWORD dwValue = element value
-            ruleDef = ruleDef + pack( "HHL", elemType[element[0]], 0, element[1] )
-            ruleLen = ruleLen + 8
+            packElement( buf, offset, elemType[element[0]], 0, element[1] )
+            offset = offset + elemSize
+        ruleLen = 8*len(elements)
         
         # rule definition:
         #   DWORD dwSize = number of bytes in rule definition
         #   DWORD dwnum  = ID number of rule
-        output = output + pack( "LL", ruleLen+8, names[word] ) + ruleDef
+        packHeader( buf, ruleOffset, ruleLen+8, names[word] )
         totalLen = totalLen + ruleLen+8
 
     # chunk header:
     #   DWORD dwChunkID = type
     #   DWORD dwChunkSize = number of bytes in chunk not including this header
-    return pack( "LL", type, totalLen ) + output
+    packHeader( buf, headerOffset, type, totalLen )
+    return offset
 
 #
 # This is a routine which was included for testing but can also be used to 
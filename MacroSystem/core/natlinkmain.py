@@ -137,6 +137,7 @@ try:
     import pprint
     import natlinkstatus    # for extracting status info (QH)
     import natlinkstartup
+    import gramcache        # cache of packed grammars, see start_natlink
     debugTiming=0
     #
     # This redirects stdout and stderr to a dialog box.
@@ -232,7 +233,80 @@ try:
         changeCallbackUserFirst
     except NameError:
         changeCallbackUserFirst = 1
-    
+
+    #
+    # Index of the Python files of the grammar directories, used by
+    # findAndLoadFiles and, when checkForGrammarChanges is on (see
+    # beginCallback), for finding the changed files.  Key is the directory,
+    # value is a list [directory mtime, time of listing, set of module names,
+    # [global module names (_*)], {lowercase module name: [module names of its
+    # files]}, {loaded module name: (mtime, size)}, time of these file dates].
+    # A file wordpad_extra_more.py is indexed under wordpad, wordpad_extra and
+    # wordpad_extra_more, so the files of an application are found with one
+    # lookup, without matching a regular expression against each file name.
+    # A directory is only listed again when its mtime moved, or when the mtime is
+    # too close to the time of the listing (directoryRescanInterval) to rely on.
+    # Only the files of loaded modules are checked for changes: again when the
+    # directory was listed again, or (for editors that save in place, which
+    # leaves the directory mtime alone) after fileRescanInterval seconds.
+    # A file without a date in the index is compared with its compiled file,
+    # as loadFile does.
+    #
+    try:
+        directoryIndex
+    except NameError:
+        directoryIndex = {}
+    directoryRescanInterval = 2.0
+    fileRescanInterval = 2.0
+    directoryIndexStats = dict(lookups=0, listings=0)
+    snapshotStats = dict(checks=0, dirsStatted=0, filesStatted=0, modulesReloaded=0, msSpent=0.0)
+
+    #
+    # Profiling of the hot paths, switched on with setProfiling.  The time spent
+    # per module in loadFile, safelyCall, changeCallbackLoadedModules, the gotBegin
+    # of each grammar (natlinkutils.GramClassBase.beginCallback) and beginCallback
+    # as a whole goes into a ring buffer of profileBufferSize records
+    # (time.clock() at the start, stage, module name, detail, seconds), the
+    # oldest records are overwritten.
+    # Dump with dumpProfileRecords (csv or json), or let beginCallback write
+    # profileDumpFile every profileDumpInterval seconds.  printProfileSummary
+    # gives the modules which take the most time, eg from a voice command.
+    #
+    try:
+        profiling
+    except NameError:
+        profiling = 0
+        profileBufferSize = 10000
+        profileRecords = []
+        profileIndex = 0     # number of records added since the last clear
+        profileDumpFile = ''
+        profileDumpInterval = 0
+        profileLastDump = 0
+        profileClockOffset = time.time() - time.clock()
+
+    #
+    # Lazy loading, switched on with setLazyLoading.  The global grammar files
+    # (_*.py) which are listed in the manifest file of their directory are not
+    # loaded by findAndLoadFiles, but in beginCallback (loadModSpecific) when
+    # the foreground window first matches one of the executables or window
+    # classes of the module.  Lines of a manifest file:
+    #   # comment
+    #   <module name>: <executable> ... class:<window class> ...
+    # for example:
+    #   _wordmacros: winword excel
+    #   _notes: class:Notepad
+    #
+    manifestFileName = 'natlinkmanifest.txt'
+    try:
+        lazyLoading
+    except NameError:
+        lazyLoading = 0
+        deferredModules = {}    # module name: (set of executables, set of window classes)
+        deferredByExecutable = {}   # executable: [module names]
+        deferredByClass = {}        # window class: [module names]
+        manifestCache = {}      # manifest path: (mtime, manifest)
+    lazyStats = dict(loadedLazily=0, msFindAndLoadFiles=0.0)
+
     def unloadModule(modName):
         """calls the 'unload' function of the module.
         
@@ -266,6 +340,15 @@ try:
             print 'loading module %s failed, put in "wrongFiles"'% modName
     
     def loadFile(modName, origName=None):
+        if profiling:
+            t0 = time.clock()
+            try:
+                return doLoadFile(modName, origName)
+            finally:
+                addProfileRecord('loadFile', modName, t0)
+        return doLoadFile(modName, origName)
+
+    def doLoadFile(modName, origName=None):
         global wrongFiles  # keep track of non edited files with errors
         try: fndFile,fndName,fndDesc = imp.find_module(modName, searchImportDirs)
         except ImportError: return None     # module not found
@@ -324,7 +407,343 @@ try:
     def getFileDate(modName):
         try: return os.stat(modName)[ST_MTIME]
         except OSError: return 0        # file not found
-    
+
+    # Directory index functions, see directoryIndex above.
+
+    def getDirectoryIndex(directory, now=None):
+        """return the index entry of directory, listing it again if it changed"""
+        directoryIndexStats['lookups'] += 1
+        return indexDirectory(directory, now)
+
+    def indexDirectory(directory, now=None):
+        if now is None:
+            now = time.time()
+        try:
+            dirDate = os.stat(directory).st_mtime
+        except OSError:
+            return [0, 0, set(), [], {}, {}, 0]
+        entry = directoryIndex.get(directory)
+        if entry and entry[0] == dirDate and dirDate < entry[1] - directoryRescanInterval:
+            return entry
+        directoryIndexStats['listings'] += 1
+        names = set()
+        globalNames = []
+        modules = {}
+        for f in os.listdir(directory):
+            if not f.endswith('.py'):
+                continue
+            name = f[:-3]
+            names.add(name)
+            if name.startswith('_') and len(name) > 1:
+                globalNames.append(name)
+            lowerName = name.lower()
+            keys = set([lowerName])
+            for i in range(1, len(name)):
+                if name[i] == '_':
+                    keys.add(lowerName[:i])
+            for key in keys:
+                modules.setdefault(key, []).append(name)
+        # (the file dates are kept, to be compared at the next check)
+        fileDates = entry and entry[5] or {}
+        entry = [dirDate, now, names, globalNames, modules, fileDates, 0]
+        directoryIndex[directory] = entry
+        return entry
+
+    def findModuleFiles(directory, curModule=None):
+        """return the module names of the files in directory for curModule
+
+        without curModule the global files (_*.py), otherwise the files
+        <curModule>.py and <curModule>_*.py (ignoring case)
+        """
+        entry = getDirectoryIndex(directory)
+        if curModule:
+            return entry[4].get(curModule.lower(), [])
+        return entry[3]
+
+    def getDirectoryIndexStats():
+        """return a copy of the counters of the directory index
+
+        lookups: number of directory lookups by findAndLoadFiles
+        listings: number of directory listings needed for these and for the
+        checks for changed files (see getSnapshotStats)
+        """
+        return dict(directoryIndexStats)
+
+    def snapshotDirectory(directory, modNames, now=None):
+        """check the files of loaded modules of a grammar directory
+
+        modNames are the loaded modules whose file is in directory.  Returns
+        those of them whose file changed (mtime or size) or was removed since
+        the previous check, or, without a previous date, is newer than its
+        compiled file.
+        """
+        if now is None:
+            now = time.time()
+        entry = indexDirectory(directory, now)
+        snapshotStats['dirsStatted'] += 1
+        if entry[6] and now - entry[6] < fileRescanInterval:
+            return []
+        previous = entry[5]
+        files = {}
+        changed = []
+        for name in modNames:
+            path = os.path.join(directory, name + '.py')
+            try:
+                st = os.stat(path)
+            except OSError:
+                changed.append(name)   # removed
+                continue
+            snapshotStats['filesStatted'] += 1
+            files[name] = (st.st_mtime, st.st_size)
+            if name in previous:
+                if previous[name] != files[name]:
+                    changed.append(name)
+            elif st.st_mtime > getFileDate(path + 'c'):
+                changed.append(name)
+        if entry[0]:
+            entry[5] = files
+            entry[6] = now
+        return changed
+
+    def changedGrammarModules():
+        """return the names of the loaded modules whose file changed
+
+        according to the directory index of the searchImportDirs
+        """
+        now = time.time()
+        loadedByDirectory = {}
+        for modName, path in loadedFiles.items():
+            if path:
+                directory = os.path.normcase(os.path.dirname(path))
+                loadedByDirectory.setdefault(directory, []).append(modName)
+        changed = []
+        for directory in searchImportDirs:
+            modNames = loadedByDirectory.get(os.path.normcase(directory))
+            if not modNames:
+                continue
+            for modName in snapshotDirectory(directory, modNames, now):
+                if not modName in changed:
+                    changed.append(modName)
+        return changed
+
+    def forgetFileDates():
+        """let the next check compare the loaded files with their compiled files
+
+        after loadFile checked all of them, instead of taking their dates now
+        """
+        now = time.time()
+        for entry in directoryIndex.values():
+            entry[5] = {}
+            entry[6] = now
+
+    def getSnapshotStats():
+        """return a copy of the counters of the checks for changed files
+
+        checks: number of beginCallback checks done via the index
+        dirsStatted, filesStatted: number of os.stat calls on directories and files
+        modulesReloaded: number of modules passed to loadFile because they changed
+        msSpent: total time (milliseconds) of these checks
+        """
+        return dict(snapshotStats)
+
+    def resetSnapshotStats():
+        for key in snapshotStats:
+            snapshotStats[key] = 0
+        snapshotStats['msSpent'] = 0.0
+
+    # Profiling functions, see profiling above.
+
+    def setProfiling(on=1, bufferSize=None, dumpFile=None, dumpInterval=None):
+        """switch profiling on or off
+
+        bufferSize: number of records kept (a new size clears the records)
+        dumpFile, dumpInterval: write the records to dumpFile (.csv or .json)
+        every dumpInterval seconds, from beginCallback (0: no periodic dump)
+        """
+        global profiling, profileBufferSize, profileDumpFile, profileDumpInterval, profileLastDump
+        if bufferSize and bufferSize != profileBufferSize:
+            profileBufferSize = bufferSize
+            clearProfileRecords()
+        if dumpFile is not None:
+            profileDumpFile = dumpFile
+        if dumpInterval is not None:
+            profileDumpInterval = dumpInterval
+        profileLastDump = time.time()
+        if on and not profileRecords:
+            clearProfileRecords()
+        profiling = on
+
+    def clearProfileRecords():
+        global profileRecords, profileIndex
+        profileRecords = [None]*profileBufferSize
+        profileIndex = 0
+
+    def addProfileRecord(stage, modName, t0, detail=''):
+        """add a record of stage, started at t0 (time.clock()), to the ring buffer"""
+        global profileIndex
+        t1 = time.clock()
+        profileRecords[profileIndex % profileBufferSize] = (t0, stage, modName, detail, t1-t0)
+        profileIndex += 1
+
+    def getProfileRecords():
+        """return the records in the ring buffer, oldest first"""
+        if profileIndex <= profileBufferSize:
+            return profileRecords[:profileIndex]
+        start = profileIndex % profileBufferSize
+        return profileRecords[start:] + profileRecords[:start]
+
+    def dumpProfileRecords(fileName, format=None):
+        """write the records to fileName, as csv or json (default by extension)
+
+        the columns (keys) are time (seconds since the epoch), stage, module,
+        detail and ms
+        """
+        if format is None:
+            format = os.path.splitext(fileName)[1][1:].lower() or 'csv'
+        rows = [(t0 + profileClockOffset, stage, modName, detail, seconds*1000)
+                for (t0, stage, modName, detail, seconds) in getProfileRecords()]
+        output = open(fileName, 'wb')
+        try:
+            if format == 'json':
+                import json
+                keys = ('time', 'stage', 'module', 'detail', 'ms')
+                json.dump([dict(zip(keys, row)) for row in rows], output, indent=1)
+            else:
+                import csv
+                writer = csv.writer(output)
+                writer.writerow(('time', 'stage', 'module', 'detail', 'ms'))
+                for row in rows:
+                    writer.writerow(('%.6f'% row[0],) + row[1:4] + ('%.3f'% row[4],))
+        finally:
+            output.close()
+
+    def checkProfileDump():
+        """write profileDumpFile if profileDumpInterval has passed"""
+        global profileLastDump
+        now = time.time()
+        if now - profileLastDump >= profileDumpInterval:
+            profileLastDump = now
+            try:
+                dumpProfileRecords(profileDumpFile)
+            except (IOError, OSError), e:
+                print 'cannot write profile records to %s: %s'% (profileDumpFile, e)
+
+    def getProfileSummary():
+        """return (stage, module, count, total ms, max ms) per stage and module
+
+        sorted by total time, largest first
+        """
+        totals = {}
+        for t0, stage, modName, detail, seconds in getProfileRecords():
+            key = (stage, modName)
+            if key in totals:
+                count, total, maximum = totals[key]
+                totals[key] = (count+1, total+seconds, max(maximum, seconds))
+            else:
+                totals[key] = (1, seconds, seconds)
+        summary = [(stage, modName, count, total*1000, maximum*1000)
+                   for (stage, modName), (count, total, maximum) in totals.items()]
+        summary.sort(key=lambda x: -x[3])
+        return summary
+
+    def printProfileSummary(number=20):
+        print '%-30s %-30s %6s %10s %10s'% ('stage', 'module', 'count', 'total ms', 'max ms')
+        for stage, modName, count, total, maximum in getProfileSummary()[:number]:
+            print '%-30s %-30s %6d %10.1f %10.1f'% (stage, modName, count, total, maximum)
+
+    # Lazy loading functions, see lazyLoading above.
+
+    def setLazyLoading(on=1):
+        """switch lazy loading on or off, from the next findAndLoadFiles on"""
+        global lazyLoading
+        lazyLoading = on
+
+    def readManifest(directory):
+        """return {module name: (executables, window classes)} of the manifest in directory
+
+        the result is kept until the manifest file changes
+        """
+        path = os.path.join(directory, manifestFileName)
+        date = getFileDate(path)
+        if not date:
+            return {}
+        cached = manifestCache.get(path)
+        if cached and cached[0] == date:
+            return cached[1]
+        manifest = {}
+        try:
+            lines = open(path).readlines()
+        except IOError:
+            lines = []
+        for line in lines:
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            if line.find(':') <= 0:
+                print 'invalid line in %s: %s'% (path, line)
+                continue
+            modName, targets = line.split(':', 1)
+            executables, windowClasses = set(), set()
+            for target in targets.split():
+                if target.lower().startswith('class:'):
+                    windowClasses.add(target[6:])
+                else:
+                    executables.add(target.lower())
+            manifest[modName.strip()] = (executables, windowClasses)
+        manifestCache[path] = (date, manifest)
+        return manifest
+
+    def deferModule(modName, targets):
+        deferredModules[modName] = targets
+        executables, windowClasses = targets
+        for x in executables:
+            deferredByExecutable.setdefault(x, []).append(modName)
+        for x in windowClasses:
+            deferredByClass.setdefault(x, []).append(modName)
+
+    def clearDeferredModules():
+        deferredModules.clear()
+        deferredByExecutable.clear()
+        deferredByClass.clear()
+
+    def getWindowClass(hndle):
+        try:
+            import ctypes
+            buf = ctypes.create_string_buffer(256)
+            ctypes.windll.user32.GetClassNameA(hndle, buf, 256)
+            return buf.value
+        except (ImportError, AttributeError):
+            return ''
+
+    def loadDeferredModules(curModule, moduleInfo):
+        """load the deferred modules of the executable or window class of moduleInfo"""
+        modNames = list(deferredByExecutable.get(curModule.lower(), []))
+        if deferredByClass and moduleInfo[2]:
+            modNames.extend(deferredByClass.get(getWindowClass(moduleInfo[2]), []))
+        for modName in modNames:
+            if not modName in deferredModules:
+                continue  # loaded already
+            executables, windowClasses = deferredModules.pop(modName)
+            for x in executables:
+                deferredByExecutable[x].remove(modName)
+                if not deferredByExecutable[x]: del deferredByExecutable[x]
+            for x in windowClasses:
+                deferredByClass[x].remove(modName)
+                if not deferredByClass[x]: del deferredByClass[x]
+            if debugLoad: print 'loading deferred module %s'% modName
+            loadedFiles[modName] = loadFile(modName, None)
+            lazyStats['loadedLazily'] += 1
+
+    def getLazyStats():
+        """return a copy of the lazy loading counters
+
+        deferred: number of modules waiting for their first match
+        loadedLazily: number of deferred modules loaded by beginCallback
+        msFindAndLoadFiles: time (milliseconds) of the last findAndLoadFiles for
+                            the global files (the cold start after a user switch)
+        """
+        return dict(lazyStats, deferred=len(deferredModules))
+
     # Calls the unload member function of a given module.  Does not make the call
     # if the function does not exist and cleans up in the case of errors.
     
@@ -334,6 +753,15 @@ try:
         except AttributeError:
             # unload function does not exist
             return None
+        if profiling:
+            t0 = time.clock()
+            try:
+                return applySafely(modName, funcName, func)
+            finally:
+                addProfileRecord('safelyCall', modName, t0, funcName)
+        return applySafely(modName, funcName, func)
+
+    def applySafely(modName, funcName, func):
         try:
             apply(func, [])
         except:
@@ -359,52 +787,35 @@ try:
     
     def findAndLoadFiles(curModule=None):
         global loadedFiles, vocolaIsLoaded, vocolaModule, vocolaEnabled
+        tStart = time.clock()
         if curModule == 'calc':
             pass
         moduleHasDot = None
         if curModule:
             # special case, encountered with Vocola modules with . in name:
             moduleHasDot = curModule.find(".") >= 0
-            curModuleEscaped = re.escape(curModule)
-            pat = re.compile(r"""
-                ^(%s        # filename must match module name
-    ##            (_\w+)?)    # optional underscore followed by text (old)
-                (_.*)?)    # optional underscore followed by anything (or nothing) (QH)
-                [.]py$      # extension .py
-              """%curModuleEscaped, re.VERBOSE|re.IGNORECASE)
-        else:
-            pat = re.compile(r"""
-                ^(_         # filename must start with an underscore
-    ##            \w+)        # remainder of filename (old)
-                 .+)        # remainder of filename (anything) (QH)
-                [.]py$      # extension .py
-              """, re.VERBOSE|re.IGNORECASE)
-    
+        # the files whose name match the module name, followed by an optional
+        # underscore and anything, or (curModule empty) which start with an
+        # underscore, see findModuleFiles.
+
         filesToLoad = {}
         if userDirectory != '':
-            userDirFiles = [x for x in os.listdir(userDirectory) if x.endswith('.py')]
-            for x in userDirFiles:
-                res = pat.match(x)
-                if res: addToFilesToLoad( filesToLoad, res.group(1), userDirectory, moduleHasDot )
+            for x in findModuleFiles(userDirectory, curModule):
+                addToFilesToLoad( filesToLoad, x, userDirectory, moduleHasDot )
         ## unimacro:
         if status.UnimacroIsEnabled():
-            unimacroDirFiles = [x for x in os.listdir(unimacroDirectory) if x.endswith('.py')]
-            for x in unimacroDirFiles:
-                res = pat.match(x)
-                if res: addToFilesToLoad( filesToLoad, res.group(1), unimacroDirectory, moduleHasDot )
-        else:
-            unimacroDirFiles = []
-
+            for x in findModuleFiles(unimacroDirectory, curModule):
+                addToFilesToLoad( filesToLoad, x, unimacroDirectory, moduleHasDot )
 
         # baseDirectory:
         if baseDirectory:
-            baseDirFiles = [x for x in os.listdir(baseDirectory) if x.endswith('.py')]
+            baseDirModules = getDirectoryIndex(baseDirectory)[2]
         else:
-            baseDirFiles = []
+            baseDirModules = set()
     
         # if present, load _vocola_main first, it can generate grammar files
         # before proceeding:
-        vocolaEnabled = (vocolaEnabled and doVocolaFirst and doVocolaFirst+'.py' in baseDirFiles)
+        vocolaEnabled = (vocolaEnabled and doVocolaFirst and doVocolaFirst in baseDirModules)
         if debugLoad:
             print 'vocolaEnabled: %s'% vocolaEnabled
         if vocolaEnabled and not vocolaIsLoaded:
@@ -423,11 +834,11 @@ try:
                         vocolaEnabled = 0
                         del loadedFiles[x]
                         if debugLoad: print 'Vocola is disabled...'
-            # repeat the base directory, as Vocola just had the chance to rebuild Python grammar files:
-            baseDirFiles = [x for x in os.listdir(baseDirectory) if x.endswith('.py')]
-        for x in baseDirFiles:
-            res = pat.match(x)
-            if res: addToFilesToLoad( filesToLoad, res.group(1), baseDirectory, moduleHasDot )
+            # (Vocola just had the chance to rebuild Python grammar files, the
+            # index of the base directory is updated if it changed)
+        if baseDirectory:
+            for x in findModuleFiles(baseDirectory, curModule):
+                addToFilesToLoad( filesToLoad, x, baseDirectory, moduleHasDot )
     
         # Try to (re)load any files we find
         # to Unimacro grammar control last:
@@ -437,10 +848,22 @@ try:
         keysToLoad = reorderKeys(filesToLoad.keys())
         if debugLoad: print 'filesToLoad: %s'% keysToLoad
         
+        # lazy loading: the global files in a manifest are loaded at first match
+        manifest = {}
+        if not curModule:
+            clearDeferredModules()
+        if lazyLoading and not curModule:
+            for directory in searchImportDirs:
+                for modName, targets in readManifest(directory).items():
+                    manifest.setdefault(modName, targets)
+
         for x in keysToLoad:
             if x == doVocolaFirst:
                 continue
             origName = loadedFiles.get(x, None)
+            if x in manifest and not origName:
+                deferModule(x, manifest[x])
+                continue
             loadedFiles[x] = loadFile(x, origName)
     
         # Unload any files which have been deleted
@@ -448,6 +871,8 @@ try:
             if path and not getFileDate(path):
                 safelyCall(name,'unload')
                 del loadedFiles[name]
+        if not curModule:
+            lazyStats['msFindAndLoadFiles'] = (time.clock()-tStart)*1000
     
     def reorderKeys(modulesKeys):
         """here is the chance to influence the order of loading
@@ -534,6 +959,8 @@ try:
             print "loadModSpecific: invalid modulename, skipping (moduleInfo): %s"% `moduleInfo`
             curModule = ''
             
+        if curModule and deferredModules:
+            loadDeferredModules(curModule, moduleInfo)
         if curModule and not (onlyIfChanged and curModule==lastModule):
             findAndLoadFiles(curModule)
             lastModule = curModule
@@ -580,6 +1007,7 @@ try:
         if natlink.getCallbackDepth() > 1:
             return
         t0 = time.time()
+        tc = time.clock()
         
         if vocolaEnabled and vocolaIsLoaded:
             result = vocolaModule.vocolaBeginCallback(moduleInfo)
@@ -596,18 +1024,37 @@ try:
                 if debugCallback:
                     print 'no changes Vocola user files'
                     
-        if checkAll or checkForGrammarChanges:
+        if checkAll:
             if debugCallback:
                 print 'check for changed files (all files)...'
             for x in loadedFiles.keys():
                 loadedFiles[x] = loadFile(x, loadedFiles[x])
-            loadModSpecific(moduleInfo)  # in checkAll or checkForGrammarChanges mode each time
+            forgetFileDates()   # (loadFile checked them all)
+            loadModSpecific(moduleInfo)
+        elif checkForGrammarChanges:
+            # only reload modules the directory index reports as changed:
+            if debugCallback:
+                print 'check for changed files (directory index)...'
+            tSnap = time.time()
+            changed = changedGrammarModules()
+            for x in changed:
+                loadedFiles[x] = loadFile(x, loadedFiles[x])
+            snapshotStats['checks'] += 1
+            snapshotStats['modulesReloaded'] += len(changed)
+            snapshotStats['msSpent'] += (time.time()-tSnap)*1000
+            if debugTiming:
+                print 'directory index: changed modules: %s, stats: %s'% (changed, snapshotStats)
+            loadModSpecific(moduleInfo)  # in checkForGrammarChanges mode each time
         else:
             if debugCallback:
                 print 'check for changed files (only specific)'
             loadModSpecific(moduleInfo, 1)  # only if changed module
         if debugTiming:
             print 'checked all grammar files: %.6f'% (time.time()-t0,)
+        if profiling:
+            addProfileRecord('beginCallback', '', tc)
+            if profileDumpFile and profileDumpInterval:
+                checkProfileDump()
             
     #
     # This callback is called when the user changes or when the microphone
@@ -688,7 +1135,12 @@ try:
                 except AttributeError: pass
                 else:
     ##                print 'call changeCallback for: %s'% x
-                    apply(func, [type,args])
+                    if profiling:
+                        t0 = time.clock()
+                        apply(func, [type,args])
+                        addProfileRecord('changeCallbackLoadedModules', x, t0, type)
+                    else:
+                        apply(func, [type,args])
     
     ### try here a adapted recognitionMimic function
     def recognitionMimic(mimicList):
@@ -733,6 +1185,10 @@ try:
                     print 'insert baseDirectory: %s to sys.path!'% baseDirectory
             if debugLoad: print "NatLink base dir" + baseDirectory
             
+            # the grammar cache is kept per user (the install folder is
+            # often read only):
+            gramcache.setCacheDirectory(gramcache.getUserCacheDirectory())
+
             # get the current user information from the NatLink module
             userDirectory = status.getUserDirectory()
             if userDirectory:
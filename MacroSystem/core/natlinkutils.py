@@ -80,6 +80,8 @@ import time
 import natlink
 #from gramparser import *
 import gramparser
+import gramcache
+import gramlists
 import natlinkmain
 DNSVersion = natlinkmain.DNSVersion
 print 'DNSVersion (natlinkutils) %s'% DNSVersion
@@ -318,7 +320,14 @@ class GramClassBase(object):
         self.gramObj.setExclusive(exclusive)
         
     def beginCallback(self, moduleInfo):
-        self.callIfExists( "gotBegin", (moduleInfo,) )
+        if natlinkmain.profiling:
+            # the time of gotBegin per grammar, see natlinkmain.setProfiling:
+            t0 = time.clock()
+            self.callIfExists( "gotBegin", (moduleInfo,) )
+            natlinkmain.addProfileRecord('gotBegin', self.__module__, t0,
+                                         self.__class__.__name__)
+        else:
+            self.callIfExists( "gotBegin", (moduleInfo,) )
 
     def hypothesisCallback(self, words):
         self.callIfExists( "gotHypothesis", (words,) )
@@ -480,6 +489,7 @@ class GrammarBase(GramClassBase):
         self.validRules = []
         self.validLists = []
         self.doOnlyGotResultsObject = None # can rarely be set (QH, dec 2009)
+        self.listManager = gramlists.ListManager(self.gramObj)
 
     def load(self,gramSpec,allResults=0,hypothesis=0, grammarName=None):
         if type(gramSpec) == types.StringType:
@@ -490,11 +500,20 @@ class GrammarBase(GramClassBase):
             raise TypeError( "grammar definition must be a list of strings" )
 
         gramparser.splitApartLines(gramSpec)
-        parser = gramparser.GramParser(gramSpec, grammarName=grammarName)
-        parser.doParse()
-        parser.checkForErrors()
-        gramBin = gramparser.packGrammar(parser)
-        self.scanObj = parser.scanObj  # for later error messages.
+        cached = gramcache.get(gramSpec)
+        if cached:
+            gramBin, knownRules, exportRules, knownLists = cached
+            # only for later error messages, no scanning needed:
+            self.scanObj = gramparser.GramScanner(gramSpec, grammarName=grammarName)
+        else:
+            parser = gramparser.GramParser(gramSpec, grammarName=grammarName)
+            parser.doParse()
+            parser.checkForErrors()
+            gramBin = gramparser.packGrammar(parser)
+            gramcache.put(gramSpec, gramBin, parser)
+            knownRules, exportRules, knownLists = parser.knownRules, parser.exportRules, parser.knownLists
+            self.scanObj = parser.scanObj  # for later error messages.
+        self.listManager.reset()
         try:
             GramClassBase.load(self,gramBin,allResults,hypothesis)
         except natlink.BadGrammar:
@@ -502,16 +521,40 @@ class GrammarBase(GramClassBase):
             raise
         # we want to keep a list of the rules which can be activated and the
         # known lists so we can catch errors earlier
-        self.validRules = parser.exportRules.keys()
-        self.validLists = parser.knownLists.keys()
+        self.validRules = exportRules.keys()
+        self.validLists = knownLists.keys()
 
         # we reverse the rule dictionary so we can convert rule numbers back
         # to rule names during recognition
         self.ruleMap = {}
-        for x in parser.knownRules.keys():
-            self.ruleMap[ parser.knownRules[x] ] = x
+        for x in knownRules.keys():
+            self.ruleMap[ knownRules[x] ] = x
+        self.buildRuleDispatch()
         return 1
 
+    def buildRuleDispatch(self):
+        """build the table used by resultsCallback, called at load time
+
+        self.ruleDispatch maps the rule number as it comes from NatSpeak to the
+        rule name, with the DNS15 offset folded in, and with the dgndictation and
+        dgnletters numbers added when these rules are in the grammar.
+        """
+        if DNSVersion >= 15:
+            offset = 1
+        else:
+            offset = 0
+        ruleNames = self.ruleMap.values()
+        dispatch = {}
+        if 'dgnletters' in ruleNames:
+            for n in (1000001, 1000002):
+                dispatch[n - offset] = 'dgnletters'
+        if 'dgndictation' in ruleNames:
+            for n in (1000000, 1000001):
+                dispatch[n - offset] = 'dgndictation'
+        for number, ruleName in self.ruleMap.items():
+            dispatch[number - offset] = ruleName
+        self.ruleDispatch = dispatch
+
     # these are wrappers for the GramObj base methods.  We also keep track of
     # legal rules, lists and active rules so we can do some first level error
     # checking
@@ -519,6 +562,7 @@ class GrammarBase(GramClassBase):
     def unload(self):
         GramClassBase.unload(self)
         self.activeRules = []
+        self.listManager.reset()
 
     def activate(self, ruleName, window=0, exclusive=None, noError=0):
         if ruleName not in self.validRules:
@@ -589,20 +633,21 @@ class GrammarBase(GramClassBase):
     def emptyList(self, listName):
         if listName not in self.validLists:
             raise gramparser.GrammarError( "list %s was not defined in the grammar" % listName , self.scanObj)
-        self.gramObj.emptyList(listName)
+        self.listManager.emptyList(listName)
 
     def appendList(self, listName, words):
         if listName not in self.validLists:
             raise gramparser.GrammarError( "list %s was not defined in the grammar" % listName , self.scanObj)
-        if type(words) == type(""):
-            self.gramObj.appendList(listName,words)
-        else:
-            for x in words:
-                self.gramObj.appendList(listName,x)
+        self.listManager.appendList(listName, words)
     
     def setList(self, listName, words):
-        self.emptyList(listName)
-        self.appendList(listName, words)
+        """set the words of a list, nothing is done if the words did not change
+
+        see gramlists.ListManager
+        """
+        if listName not in self.validLists:
+            raise gramparser.GrammarError( "list %s was not defined in the grammar" % listName , self.scanObj)
+        self.listManager.setList(listName, words)
 
     # when a recognition for this grammar occurs, this function gets called
     # by GramObj (it is set as the callback in GrammarBase.load.
@@ -624,53 +669,54 @@ class GrammarBase(GramClassBase):
         if type(wordsAndNums) != type([]):
             return None
 
-        # we first convert the passed array of word/ruleNumbers into an
-        # array of word/ruleNames and an array of only words
-        words = []
-        fullResults = []
-        wordsByRule = {}
         if self.doOnlyGotResultsObject:
             # can switch on in gotResultsObject, so rest of processing is not done.
             # grammar kaiser_dictation, (voicedictation with exclusive mode catching)
             # QH (dec, 2009)
             #print 'skip rest of resultsCallback'
             return
-        for x in wordsAndNums:
-            word, ruleNumber = x
-            words.append( word )
-            # the numbering of some rules appears to be different in NatSpeak10, catch with try:
-            if DNSVersion >= 15:
-                ruleNumber += 1
-            try:
-                ruleName = self.ruleMap[ruleNumber]
-            except KeyError:
-                if ruleNumber in (1000000, 1000001) and 'dgndictation' in self.ruleMap.values():
-                    ruleName = 'dgndictation'
-                elif ruleNumber in (1000001, 1000002) and 'dgnletters' in self.ruleMap.values():
-                    ruleName = 'dgnletters'
-                else:
-                    print '='*50
-                    print 'wordsAndNums: %s'% wordsAndNums
-                    print 'ruleMap: %s'% `self.ruleMap`
-                    mess =  'Invalid key %s for ruleMap'% ruleNumber
-                    raise KeyError(mess)
 
-            fullResults.append( ( word, ruleName ) )
-            wordsByRule.setdefault(ruleName, []).append(word)
-                
-        # we also compute a list similar to fullResults except that we group
-        # all words which are sequential and in the same rule together in a
-        # sublist. For example:
+        # we convert the passed array of word/ruleNumbers into an array of
+        # word/ruleNames and an array of only words, in one pass over the
+        # results.  Rule numbers are looked up in the dispatch table built at
+        # load time (the numbering of some rules differs from NatSpeak 15 on,
+        # this is folded into the table).
+        # In the same pass we compute a list similar to fullResults except that
+        # we group all words which are sequential and in the same rule together
+        # in a sublist. For example:
         #   [ ('red','color'), ('blue','color'), ('and','conj'), ('green','color') ]
         # Becomes:
         #   [ (['red','blue'],'color'), (['and'],'conj'), (['green'],'color') ]
+        dispatch = self.ruleDispatch
+        words = []
+        fullResults = []
+        wordsByRule = {}
         seqsAndRules = []
-        for x in fullResults:
-            if len(seqsAndRules) > 0 and seqsAndRules[-1:][0][1] == x[1]:
-                # duplicate rule, append previous entry
-                seqsAndRules[-1:][0][0].append(x[0])
+        prevRuleName = None
+        for word, ruleNumber in wordsAndNums:
+            try:
+                ruleName = dispatch[ruleNumber]
+            except KeyError:
+                print '='*50
+                print 'wordsAndNums: %s'% wordsAndNums
+                print 'ruleMap: %s'% `self.ruleMap`
+                if DNSVersion >= 15:
+                    ruleNumber += 1
+                mess =  'Invalid key %s for ruleMap'% ruleNumber
+                raise KeyError(mess)
+            words.append( word )
+            fullResults.append( ( word, ruleName ) )
+            if ruleName in wordsByRule:
+                wordsByRule[ruleName].append(word)
             else:
-                seqsAndRules.append( ([x[0]], x[1]) )
+                wordsByRule[ruleName] = [word]
+            if ruleName == prevRuleName:
+                # same rule, append to previous entry
+                seqsAndRules[-1][0].append(word)
+            else:
+                seqsAndRules.append( ([word], ruleName) )
+                prevRuleName = ruleName
+
         # provide fullResults and seqsAndRules also as instance variables:
         self.fullResults = fullResults
         self.seqsAndRules = seqsAndRules
@@ -699,24 +745,24 @@ class GrammarBase(GramClassBase):
         
         Also give self.nextRule (the name) self.nextWords, self.prevRule, self.prevWords
         so the result of the adjacent rules are known
+
+        The gotResults_<rule> functions are looked up on each result, so
+        handlers set or replaced after the load are called too.  Each function
+        gets its own copy of the words list, so changing it does not affect
+        self.seqsAndRules or the prev/next words.
         """
-        ruleName, ruleWords = None, None
-        lenSeqsAndRules = len(seqsAndRules)
+        lastIndex = len(seqsAndRules) - 1
+        self.prevRule, self.prevWords = None, []
         for i, x in enumerate(seqsAndRules):
-            if i == 0:
-                self.prevRule, self.prevWords = None, []
-            else:
-                Prev = copy.copy(seqsAndRules[i-1])
-                self.prevRule, self.prevWords = Prev[1], Prev[0]
-            
-            if i == lenSeqsAndRules - 1:
+            if i == lastIndex:
                 self.nextRule, self.nextWords = None, []
-            else:                
-                Next = copy.copy(seqsAndRules[i+1])
-                self.nextRule, self.nextWords = Next[1], Next[0]
-            
-            ruleName, ruleWords = x[1], copy.copy(x[0])    
-            self.callIfExists( 'gotResults_'+ruleName, (ruleWords, fullResults) )
+            else:
+                self.nextRule, self.nextWords = seqsAndRules[i+1][1], seqsAndRules[i+1][0]
+            ruleWords, ruleName = x
+            func = getattr(self, 'gotResults_'+ruleName, None)
+            if func:
+                func(ruleWords[:], fullResults)
+            self.prevRule, self.prevWords = ruleName, ruleWords
 
 
 #---------------------------------------------------------------------------
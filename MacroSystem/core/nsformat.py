@@ -12,6 +12,7 @@ __version__ = "$Revision: 105 $, $Date: 2008-12-04 12:47:13 +0100 (do, 04 dec 20
 #
 
 import string, types, copy
+from collections import OrderedDict
 import natlink
 import natlinkmain
 
@@ -113,6 +114,8 @@ propDict['uppercase-letter'] = (flag_no_space_next,)
 #
 # If you already have the wordInfo for each word, you can pass in a list of
 # tuples of (wordName,wordInfo) instead of just the list of words.
+#
+# The wordInfo of the other words is taken from wordInfoCache (see below).
 
 def formatWords(wordList,state=None):
     global flags_like_period
@@ -120,15 +123,12 @@ def formatWords(wordList,state=None):
     if language != 'enx':
         flags_like_period = (4, 21, 17) # one space after period.
         
-    # get the getWordsInfo function, now returning a tuple of properties
+    # the word flags come from the cache, as bit masks
     DNSVersion = natlinkmain.DNSVersion
-    if DNSVersion >= 11:
-        gwi = getWordInfo11
-    else:
-        gwi = getWordInfo10
+    wordInfoCache.checkUser()
 
-    output = ''
-    emptySet = set( () )
+    output = []
+    stateMask = None
     for entry in wordList:
         if DNSVersion >= 11 and entry == 'space':
             entry = r'\space-bar\space-bar'
@@ -136,34 +136,37 @@ def formatWords(wordList,state=None):
             assert( len(entry)==2 )
             wordName = entry[0]
             wordInfo = entry[1]
+            if not isinstance(wordInfo, (set, frozenset)):
+                wordInfo = wordInfoToFlags(wordInfo)
+            wordMask = flagsToMask(wordInfo)
         else:
             if entry.find('\\letter\\') > 0:
                 entry = entry.lower()  # letters lowercase...
             wordName = entry
-            wordInfo = gwi(wordName)
-        if wordInfo is None:
-            wordInfo = set()
-        if type(wordInfo) != type(emptySet):
-            wordInfo = wordInfoToFlags(wordInfo)
-
-        # init state to a set:
-        if state == 0:
-            state = set([])
-        elif state == -1:
-            #print "no space next at start"
-            state = set([flag_no_space_next])
-        elif state is None:
-            state = set([flag_no_space_next, flag_active_cap_next])
-        elif type(state) in (types.ListType, types.TupleType):
-            state = set(state)
-        elif type(state) != type(emptySet):
-            state = wordInfoToFlags(state)
-            #print 'formatWords starting with: %s'% state
-
-        newText, state = formatWord(wordName,wordInfo,state)
-        output = output + newText
-
-    return output, state
+            wordMask = wordInfoCache.getMask(wordName)
+
+        if stateMask is None:
+            # init state to a set:
+            if state == 0:
+                state = set([])
+            elif state == -1:
+                #print "no space next at start"
+                state = set([flag_no_space_next])
+            elif state is None:
+                state = set([flag_no_space_next, flag_active_cap_next])
+            elif type(state) in (types.ListType, types.TupleType):
+                state = set(state)
+            elif type(state) != set:
+                state = wordInfoToFlags(state)
+                #print 'formatWords starting with: %s'% state
+            stateMask = flagsToMask(state)
+
+        newText, stateMask = formatWordMask(wordName, wordMask, stateMask)
+        output.append(newText)
+
+    if stateMask is not None:
+        state = maskToFlags(stateMask)
+    return ''.join(output), state
 
 def formatLetters(wordList):
     """this is more tricks, formats dngletters input
@@ -186,7 +189,6 @@ def formatLetters(wordList):
 # This code was adapted from shared\resobj.cpp
 def formatWord(wordName,wordInfo=None,stateFlags=None, gwi=None):
     ##adapted: wordInfo and stateFlags are now sets of state flags
-    emptySet = set()
     if gwi is None:
         # get the proper getWordInfo function
         DNSVersion = natlinkmain.DNSVersion
@@ -196,21 +198,18 @@ def formatWord(wordName,wordInfo=None,stateFlags=None, gwi=None):
             gwi = getWordInfo10
     #-----
     # Preparation
-    # assume wordInfo is a set already
-    if type(wordInfo) == type(emptySet):
+    # assume wordInfo is a set (or frozenset) already
+    if isinstance(wordInfo, (set, frozenset)):
         wordFlags = wordInfo
     else:
         # should not come here:
         wordFlags = gwi(wordName)
 
-    if wordFlags == set(flags_like_open_quote):
-        pass
-
     # for faster lookup in Python, we convert the bit arrays am array of
     # bits that are set:
     # uncomment when more info is wanted:
     #print 'wordFlags of |%s| are: %s (%s)'% (wordName, `wordFlags`, `showStateFlags(wordFlags)`)
-    if type(stateFlags) == type(emptySet):
+    if type(stateFlags) == set:
         pass
     else:
         # for testing only, this function should not be called direct, but this is
@@ -229,137 +228,199 @@ def formatWord(wordName,wordInfo=None,stateFlags=None, gwi=None):
         stateFlags = copy.copy(state)
 
         
+    output, stateMask = formatWordMask(wordName, flagsToMask(wordFlags),
+                                       flagsToMask(stateFlags))
+    # the state flags are changed in place:
+    stateFlags.clear()
+    stateFlags.update(maskToFlags(stateMask))
+    return output, stateFlags
+
+#---------------------------------------------------------------------------
+# The state machine of formatWord, with the word and state flags as bit masks
+# (bit n for flag n).  For each different word mask the state transitions
+# are compiled into a table once (see makeWordTable), so formatting a word
+# is a few table lookups.
+
+def flagsToMask(flags):
+    """convert a set (or tuple) of flags into a bit mask"""
+    mask = 0
+    for flag in flags:
+        mask |= 1<<flag
+    return mask
+
+def maskToFlags(mask):
+    """convert a bit mask into a set of flags"""
+    flags = set()
+    flag = 0
+    while mask:
+        if mask & 1:
+            flags.add(flag)
+        mask >>= 1
+        flag += 1
+    return flags
+
+def formatWordMask(wordName, wordMask, stateMask):
+    """format wordName, return the output and the new state mask"""
+    try:
+        prefix, spacing, textOps, keepMask, setMask = wordTables[wordMask]
+    except KeyError:
+        prefix, spacing, textOps, keepMask, setMask = \
+                wordTables[wordMask] = makeWordTable(wordMask)
+
     # get the written form
     if wordName[:2] == '\\\\':
         wordName = '\\'
     else:
         wordName = wordName.split('\\')[0]
+    if textOps:
+        for op in textOps[stateMask & textStateMask]:
+            wordName = op(wordName)
+    return (prefix + spacing[stateMask & spacingStateMask] + wordName,
+            (stateMask & keepMask) | setMask)
+
+def maskOf(*flags):
+    return flagsToMask(flags)
+
+# the state flags which decide the leading spacing and the changes of the text:
+spacingStateMask = maskOf(flag_no_space_next, flag_no_space_all,
+                          flag_cond_no_space, flag_two_spaces_next)
+textStateMask = maskOf(flag_no_space_all, flag_lowercase_all, flag_uppercase_all,
+                       flag_cap_all, flag_passive_cap_next, flag_lowercase_next,
+                       flag_uppercase_next, flag_active_cap_next,
+                       flag_beginning_title_mode)
+
+# these flags just get copied from the word to the state
+copyMask = maskOf(flag_active_cap_next, flag_passive_cap_next,
+         flag_uppercase_next, flag_lowercase_next, flag_no_space_next,
+         flag_two_spaces_next, flag_cond_no_space, flag_cap_all,
+         flag_uppercase_all, flag_lowercase_all, flag_no_space_all,
+         flag_swallow_period, flag_beginning_title_mode)
+
+def subMasks(mask):
+    """all masks with a subset of the bits of mask"""
+    masks = [0]
+    for flag in maskToFlags(mask):
+        masks = masks + [m | (1<<flag) for m in masks]
+    return masks
+
+def removeSpaces(wordName):
+    return ''.join(wordName.split())
+
+def capitalizeAll(wordName):
+    return ' '.join([w.capitalize() for w in wordName.split()])
+
+def lowerFirst(wordName):
+    words = wordName.split()
+    words[0] = words[0].lower()
+    return ' '.join(words)
+
+def upperFirst(wordName):
+    words = wordName.split()
+    words[0] = words[0].upper()
+    return ' '.join(words)
+
+def makeSpacingTable(wordMask):
+    """the leading spacing for each state (masked with spacingStateMask)"""
+    table = {}
+    for state in subMasks(spacingStateMask):
+        if wordMask & maskOf(flag_no_formatting, flag_no_space_before):
+            spacing = ''
+        elif ( state & maskOf(flag_no_space_next, flag_no_space_all) or
+               state & wordMask & maskOf(flag_cond_no_space) ):
+            spacing = ''
+        elif state & maskOf(flag_two_spaces_next):
+            spacing = '  '
+        else:
+            spacing = ' '
+        table[state] = spacing
+    return table
 
-    #-----
-    # Compute the output string
-    output = ''
+def makeTextTable(wordMask):
+    """the functions changing the text for each state (masked with textStateMask)
 
+    None if the word has no formatting
+    """
+    if wordMask & maskOf(flag_no_formatting):
+        return None
+    table = {}
+    for state in subMasks(textStateMask):
+        ops = []
+        # the no space all flag is used so we can remove the spaces from a phase
+        # which may have imbeded spaces
+        if state & maskOf(flag_no_space_all):
+            ops.append(removeSpaces)
+
+        # compute the capitalization by looking at the long term flags; this
+        # effects all the words in the phrase
+        if state & maskOf(flag_lowercase_all):
+            ops.append(string.lower)
+        elif state & maskOf(flag_uppercase_all):
+            ops.append(string.upper)
+        elif state & maskOf(flag_cap_all) and not wordMask & maskOf(flag_title_mode):
+            ops.append(capitalizeAll)
+        elif state & maskOf(flag_passive_cap_next):
+            ops.append(string.capitalize)
+
+        # compute the capitalization for the first word in the phrase which
+        # overrides the long term capitalization state
+        if state & maskOf(flag_lowercase_next):
+            ops.append(lowerFirst)
+        elif state & maskOf(flag_uppercase_next):
+            ops.append(upperFirst)
+        elif state & maskOf(flag_active_cap_next, flag_beginning_title_mode):
+            ops.append(string.capitalize)
+        table[state] = tuple(ops)
+    return table
+
+def makeWordTable(wordMask):
+    """return the prefix, spacing table, text table, keep mask and set mask
+
+    the new state is (state & keep mask) | set mask
+    """
     # compute the number of CRLF's
-    if flag_new_line in wordFlags:
-        output = output + '\r\n'
-    elif flag_new_paragraph in wordFlags:
-        output = output + '\r\n\r\n'
-    elif flag_space_bar in wordFlags:  # fix QH, oct 2011
-        output = output + ' '
-
-    # compute the leading spacing
-    if ( flag_no_formatting in wordFlags or
-          flag_no_space_next in stateFlags or
-          flag_no_space_all in stateFlags or
-          flag_no_space_before in wordFlags or
-          flag_cond_no_space in stateFlags and flag_cond_no_space in wordFlags ):
-        # no leading space
-        pass
-    elif flag_two_spaces_next in stateFlags:
-        output = output + '  '
+    if wordMask & maskOf(flag_new_line):
+        prefix = '\r\n'
+    elif wordMask & maskOf(flag_new_paragraph):
+        prefix = '\r\n\r\n'
+    elif wordMask & maskOf(flag_space_bar):  # fix QH, oct 2011
+        prefix = ' '
     else:
-        output = output + ' '
-
-    # the no space all flag is used so we can remove the spaces from a phase
-    # which may have imbeded spaces
-
-    if not flag_no_formatting in wordFlags and flag_no_space_all in stateFlags:
-        wordName = ''.join(wordName.split())
-
-    # compute the capitalization by looking at the long term flags; this
-    # effects all the words in the phrase
-
-    if flag_no_formatting in wordFlags:
-        # no capitalization change
-        pass
-    elif flag_lowercase_all in stateFlags:
-        wordName = wordName.lower()
-    elif flag_uppercase_all in stateFlags:
-        wordName = wordName.upper()
-    elif flag_cap_all in stateFlags and not flag_title_mode in wordFlags:
-        words = string.split(wordName)
-        words = [w.capitalize() for w in wordName.split()]
-        wordName = ' '.join(words)
-    elif flag_passive_cap_next in stateFlags:
-        wordName = wordName.capitalize()
-
-    # compute the capitalization for the first word in the phrase which
-    # overrides the long term capitalization state
-
-    if flag_no_formatting in wordFlags:
-        # no capitalization change
-        pass
-    elif flag_lowercase_next in stateFlags:
-        words = wordName.split()
-        words[0] = words[0].lower()
-        wordName= ' '.join(words)
-    elif flag_uppercase_next in stateFlags:
-        words = wordName.split()
-        words[0] = words[0].upper()
-        wordName= ' '.join(words)
-    elif flag_active_cap_next in stateFlags:
-        wordName = wordName.capitalize()
-    elif flag_beginning_title_mode in stateFlags:
-        wordName = wordName.capitalize()
-
-    output = output + wordName
-
-    #-----
-    # compute the new state flags
+        prefix = ''
 
+    keepMask = ~0
     # clear out the capitalization
-    if not flag_no_cap_change in wordFlags:
-        stateFlags.discard(flag_active_cap_next)
-        stateFlags.discard(flag_passive_cap_next)
-        stateFlags.discard(flag_uppercase_next)
-        stateFlags.discard(flag_lowercase_next)
-        stateFlags.discard(flag_beginning_title_mode)
+    if not wordMask & maskOf(flag_no_cap_change):
+        keepMask &= ~maskOf(flag_active_cap_next, flag_passive_cap_next,
+                            flag_uppercase_next, flag_lowercase_next,
+                            flag_beginning_title_mode)
 
     # reset the state flags
-
-    if not flag_no_space_change in wordFlags:
-        stateFlags.discard(flag_no_space_next)
-        stateFlags.discard(flag_two_spaces_next)
-        # comment, experiment QH
-        #stateFlags.discard(flag_cond_no_space)
-    elif not flag_no_formatting in wordFlags:
-        stateFlags.discard(flag_no_space_next)
-        # comment, experiment QH
-        #stateFlags.discard(flag_cond_no_space)
+    if not wordMask & maskOf(flag_no_space_change):
+        keepMask &= ~maskOf(flag_no_space_next, flag_two_spaces_next)
+    elif not wordMask & maskOf(flag_no_formatting):
+        keepMask &= ~maskOf(flag_no_space_next)
     # try to keep numbers and point together with this flag (QH):
-    stateFlags.discard(flag_cond_no_space)
+    keepMask &= ~maskOf(flag_cond_no_space)
 
     # see if we need to reset the cap flags
-
-    if flag_reset_uc_lc_caps in wordFlags:
-        stateFlags.discard(flag_cap_all)
-        stateFlags.discard(flag_uppercase_all)
-        stateFlags.discard(flag_lowercase_all)
+    if wordMask & maskOf(flag_reset_uc_lc_caps):
+        keepMask &= ~maskOf(flag_cap_all, flag_uppercase_all, flag_lowercase_all)
 
     # see if we need to reset the no space flags
+    if wordMask & maskOf(flag_reset_no_space):
+        keepMask &= ~maskOf(flag_no_space_all)
 
-    if flag_reset_no_space in wordFlags:
-        stateFlags.discard(flag_no_space_all)
+    if wordMask & maskOf(flag_cap_all):
+        keepMask &= ~maskOf(flag_beginning_title_mode)
 
-    if flag_cap_all in wordFlags:
-        stateFlags.discard(flag_beginning_title_mode)
+    setMask = wordMask & copyMask
+    if wordMask & maskOf(flag_new_paragraph) and wordMask & maskOf(flag_is_period):
+        setMask |= maskOf(flag_new_paragraph)
 
-    # these flags just get copied
-    copyList = [ flag_active_cap_next, flag_passive_cap_next,
-         flag_uppercase_next, flag_lowercase_next, flag_no_space_next,
-         flag_two_spaces_next, flag_cond_no_space, flag_cap_all,
-         flag_uppercase_all, flag_lowercase_all, flag_no_space_all,
-         flag_swallow_period, flag_beginning_title_mode ]
+    return (prefix, makeSpacingTable(wordMask), makeTextTable(wordMask),
+            keepMask, setMask)
 
-
-    for i in copyList:
-        if i in wordFlags:
-            stateFlags.add(i)
-
-    if flag_new_paragraph in wordFlags and flag_is_period in wordFlags:
-        stateFlags.add(flag_new_paragraph)
-
-    return output, stateFlags
+wordTables = {}   # word mask: table made by makeWordTable
 
 def getWordInfo11(word):
     """new getWordInfo function, extracts the word flags from
@@ -428,8 +489,8 @@ def wordInfoToFlags(wordInfo):
                 pass # wordInfo == 0
     elif type(wordInfo) in (types.TupleType, types.ListType):
         wordFlags = set(wordInfo)
-    elif type(wordInfo) == type(emptySet):
-        wordFlags = copy.copy(wordInfo)
+    elif isinstance(wordInfo, (set, frozenset)):
+        wordFlags = set(wordInfo)
     return wordFlags
 
 def showStateFlags(state):
@@ -440,6 +501,108 @@ def showStateFlags(state):
     return tuple([flagNames[num] for num in state])
 
 
+#---------------------------------------------------------------------------
+# Word info cache
+#
+# Dictation repeats the same words over and over, so formatWords keeps the
+# flags (and their bit mask) of the most recently used words in
+# wordInfoCache, instead of getting the word info again for each word of
+# each phrase (natlink.getWordInfo before Dragon 11, splitting the
+# properties off the word from 11 on).
+#
+# The flags are kept as frozensets, so they cannot be changed by accident.
+# The cache is for one user, it is cleared when the user changes.  Changes
+# of the vocabulary cannot be seen from here: after adding, deleting or
+# changing words call invalidateWordInfo(word), or invalidateWordInfo()
+# for all words.
+
+class WordInfoCache(object):
+    """the word flags of the most recently used words, for the current user
+
+    provider: function returning the word info of a word (a set, tuple or
+              number of flags, or None); None for getWordInfo11 or
+              getWordInfo10, depending on the Dragon version.
+    maxSize:  the number of words kept, with 0 nothing is cached.
+    """
+    def __init__(self, provider=None, maxSize=2000):
+        self.provider = provider
+        self.maxSize = maxSize
+        self.words = OrderedDict()   # word: (frozenset of flags, mask), oldest first
+        self.userName = None
+        self.resetStats()
+
+    def setProvider(self, provider):
+        """use another word info function (None for the default)"""
+        self.provider = provider
+        self.invalidate()
+
+    def getProvider(self):
+        if self.provider:
+            return self.provider
+        if natlinkmain.DNSVersion >= 11:
+            return getWordInfo11
+        return getWordInfo10
+
+    def checkUser(self):
+        """clear the cache if another user is opened"""
+        userName = getattr(natlinkmain, 'userName', None)
+        if userName != self.userName:
+            if self.words:
+                self.invalidate()
+            self.userName = userName
+
+    def getFlags(self, word):
+        """return the flags of word as a frozenset"""
+        return self.lookup(word)[0]
+
+    def getMask(self, word):
+        """return the flags of word as a bit mask"""
+        return self.lookup(word)[1]
+
+    def lookup(self, word):
+        words = self.words
+        try:
+            entry = words.pop(word)
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            flags = frozenset(wordInfoToFlags(self.getProvider()(word)))
+            entry = (flags, flagsToMask(flags))
+            if self.maxSize <= 0:
+                return entry
+            if len(words) >= self.maxSize:
+                words.popitem(last=False)
+        words[word] = entry
+        return entry
+
+    def invalidate(self, word=None):
+        """forget the flags of word, or of all words"""
+        if word is None:
+            self.words.clear()
+        else:
+            self.words.pop(word, None)
+        self.invalidations += 1
+
+    def getStats(self):
+        """return a dict with the hits, misses, invalidations, size and hitRate"""
+        lookups = self.hits + self.misses
+        if lookups:
+            hitRate = float(self.hits) / lookups
+        else:
+            hitRate = 0.0
+        return dict(hits=self.hits, misses=self.misses,
+                    invalidations=self.invalidations, size=len(self.words),
+                    hitRate=hitRate)
+
+    def resetStats(self):
+        self.hits = self.misses = self.invalidations = 0
+
+wordInfoCache = WordInfoCache()
+
+def invalidateWordInfo(word=None):
+    """call after changing word (or the vocabulary, with word None)"""
+    wordInfoCache.invalidate(word)
+
 #---------------------------------------------------------------------------
 
 def testSubroutine(state,input,output):
@@ -79,14 +79,28 @@
 #   included in the NIST wave header.  The dateTime should be a standard
 #   Python time value (seconds since EPOC).
 #
-# loadNistFile(fileName)
+# sampleChecksum(samples)
+#   returns the NIST sample_checksum of a string (or buffer) of 16 bit
+#   samples: their sum modulo 65536.
+#
+# loadNistFile(fileName,copyData=1)
 #   Opens a NIST wave file and returns a list of NistWave objects
-#   which correspond to the contents of the file.
+#   which correspond to the contents of the file.  The file is memory
+#   mapped and the data of the waves are copied into strings.  With
+#   copyData=0 the data are buffer objects into that mapping instead, and
+#   the file stays mapped while any of them is referenced: do not save
+#   over that file then (on Windows this fails, elsewhere Python crashes).
+#
+# iterNistFile(fileName,copyData=1)
+#   Same as loadNistFile, but yields the NistWave objects one at a time.
 #
 # saveNistFile(fileName,waves)
 #   Creates a new NIST wave file and writes out the NistWave objects.
 #   This is the reverse of loadNistFile.  Warning: the header fields
 #   may be written in a different order then when they were loaded.
+#   The waves can be any iterable (for example iterNistFile of another
+#   file); each wave is written as it comes, the output is not collected
+#   in memory.
 #
 # class NistWave
 #   Class which encapuslates a NIST wave header and data.  An instance
@@ -105,14 +119,16 @@
 #   Access these data members using dictionary lookup.  For example:
 #       value = nist['channel_count']
 #
-#   The binary data is stored in a string attribute called "data".
+#   The binary data is stored in a string (or buffer) attribute called
+#   "data".
 #
 #   You can create a NistWave object from a binary string using the
 #   load function.  Pass in a binary buffer with offset to the start
 #   of the data.  This function returns an offset past the data used.
 #
 #   Use the dump() function to get a binary string which represents
-#   the Nist wave data for writing into a file.
+#   the Nist wave data for writing into a file, or write(file) to write
+#   it to a file without building that string.
 #   
 
 import re
@@ -120,6 +136,8 @@ import time
 import string
 import struct
 import cStringIO
+import array
+import mmap
 
 #---------------------------------------------------------------------------
 # Convert word from SAPI format with embeded spaces to SDAPI format with
@@ -159,14 +177,13 @@ def formatNistWave(waveData,transcript=None,speaker=None,dateTime=None):
     # decode the riff wave header.  It is enough to know that the riff wave
     # header is 44 bytes long and that the data at offset 40 is a unsigned
     # long which is the length of the wave data
-    dataLength = int(struct.unpack("L",waveData[40:44])[0])
-    waveData = waveData[44:]
+    dataLength = int(struct.unpack("<L",waveData[40:44])[0])
+    if len(waveData) < 44+dataLength:
+        raise struct.error,'wave data is shorter than its header says'
+    waveData = buffer(waveData,44,dataLength)
 
     # calculate the checksum
-    checksum = 0
-    for i in range(dataLength/2):
-        checksum = checksum + struct.unpack('h',waveData[i*2:i*2+2])[0]
-	checksum = checksum & 0xFFFF
+    checksum = sampleChecksum(waveData)
 
     # make sure the transcript and speaker names are not too long; this
     # ensures that the NIST header does not get too long
@@ -208,10 +225,19 @@ def formatNistWave(waveData,transcript=None,speaker=None,dateTime=None):
     outBuf.write('\0'*(1024-curSize))
 
     # write out the data
-    outBuf.write(waveData[:dataLength])
+    outBuf.write(waveData)
 
     return outBuf.getvalue()
 
+#---------------------------------------------------------------------------
+# The NIST sample checksum is the sum of the 16 bit samples modulo 65536.
+# The samples are summed in bulk, rather than unpacking them one by one.
+
+def sampleChecksum(samples):
+    samplesArray = array.array('h')
+    samplesArray.fromstring(buffer(samples,0,len(samples) & ~1))
+    return sum(samplesArray) & 0xFFFF
+
 #---------------------------------------------------------------------------
 
 class NistWave:
@@ -221,8 +247,9 @@ class NistWave:
         self.data = None
 
     # load the data from a binary buffer, return an offset just past the end
-    # of the data used.
-    def load(self,dataIn,headerStart):
+    # of the data used.  With copyData false the data is a buffer object
+    # into dataIn (for example a memory mapped file) instead of a copy.
+    def load(self,dataIn,headerStart,copyData=1):
         # The start of the NIST wave header should be NIST_1A followed by
         # the size of the header
         res = re.match('NIST_1A\n\\s*(\\d+)\n',dataIn[headerStart:headerStart+32])
@@ -258,11 +285,25 @@ class NistWave:
                    self.fields.get('sample_count',1) * \
                    self.fields.get('sample_n_bytes',1)
 
-        self.data = dataIn[headerStart+headerSize:headerStart+headerSize+dataSize]
-        return headerStart+headerSize+dataSize
+        dataStart = headerStart+headerSize
+        if copyData:
+            self.data = dataIn[dataStart:dataStart+dataSize]
+        else:
+            self.data = buffer(dataIn,dataStart,dataSize)
+        return dataStart+dataSize
 
     # Return a binary string which represents the NistWave data.
     def dump(self):
+        return self.dumpHeader() + str(self.data)
+
+    # Write the NistWave to an open file, without building a string of
+    # header and data.
+    def write(self,file):
+        file.write(self.dumpHeader())
+        file.write(self.data)
+
+    # Return a binary string of the header, padded with zeros.
+    def dumpHeader(self):
         if not self.data:
             raise ValueError,'No data has been loaded'
     
@@ -284,12 +325,9 @@ class NistWave:
                 outBuf.write('%s -i %s\n'%(key,value))
         outBuf.write('end_head\n')
         
-        # pad the header with zeros
+        # pad the header with zeros and return
         curSize = len(outBuf.getvalue())
         outBuf.write('\0'*(headerSize-curSize))
-
-        # add the data and return
-        outBuf.write(self.data)
         return outBuf.getvalue()
 
     def __getitem__(self,item):
@@ -303,23 +341,34 @@ class NistWave:
 
 #---------------------------------------------------------------------------
 
-def loadNistFile(fileName):
-    allData = open(fileName,'rb').read()
-    output = []
+def loadNistFile(fileName,copyData=1):
+    return list(iterNistFile(fileName,copyData))
+
+def iterNistFile(fileName,copyData=1):
+    file = open(fileName,'rb')
+    try:
+        try:
+            allData = mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ)
+        except ValueError:
+            return          # an empty file cannot be mapped
+    finally:
+        # the mapping stays valid after closing the file
+        file.close()
     dataStart = 0
     while dataStart < len(allData):
         nistWave = NistWave()
-        dataStart = nistWave.load(allData,dataStart)
-        output.append(nistWave)
-    return output
+        dataStart = nistWave.load(allData,dataStart,copyData)
+        yield nistWave
 
 #---------------------------------------------------------------------------
 
 def saveNistFile(fileName,waves):
     file = open(fileName,'wb')
-    for wave in waves:
-        file.write(wave.dump())
-    file.close() 
+    try:
+        for wave in waves:
+            wave.write(file)
+    finally:
+        file.close() 
 
 #---------------------------------------------------------------------------
 # The code below here is used to test the functionality of this module.
@@ -330,7 +379,71 @@ def testConvertWord(word):
     if word != convertBack(convertWord(word)):
         raise TestError,'Convertion of "%s" is not reversable'%word
     
+# the checksum as it was computed before, one sample at a time
+def refChecksum(samples):
+    checksum = 0
+    for i in range(len(samples)/2):
+        checksum = checksum + struct.unpack('h',samples[i*2:i*2+2])[0]
+        checksum = checksum & 0xFFFF
+    return checksum
+
+def makeRiffWave(samples):
+    data = array.array('h',samples).tostring()
+    return 'RIFF' + '\0'*36 + struct.pack("<L",len(data)) + data
+
+def testChecksum(samples):
+    data = array.array('h',samples).tostring()
+    if sampleChecksum(data) != refChecksum(data):
+        raise TestError,'Checksum differs for %d samples'%len(samples)
+
+def testLoadSave():
+    import os, tempfile
+    riffWaves = [makeRiffWave(range(-3000,3000,7)),
+                 makeRiffWave([32767]*1000 + [-32768]*999),
+                 makeRiffWave([1])]
+    nistData = ''
+    for riffWave in riffWaves:
+        nistData = nistData + formatNistWave(riffWave,'hello there','speaker',0)
+    handle,fileName = tempfile.mkstemp('.nwv')
+    os.close(handle)
+    handle,copyName = tempfile.mkstemp('.nwv')
+    os.close(handle)
+    try:
+        open(fileName,'wb').write(nistData)
+        for copyData in 0, 1:
+            waves = loadNistFile(fileName,copyData)
+            if len(waves) != len(riffWaves):
+                raise TestError,'Wrong number of waves loaded'
+            for wave,riffWave in map(None,waves,riffWaves):
+                if str(wave.data) != riffWave[44:] or \
+                   wave['sample_checksum'] != refChecksum(riffWave[44:]) or \
+                   wave['recognized_text'] != 'hello there':
+                    raise TestError,'Loaded wave differs from saved wave'
+            saveNistFile(copyName,iter(waves))
+            copy = loadNistFile(copyName,1)
+            if [str(w.data) for w in copy] != [str(w.data) for w in waves] or \
+               [w.fields for w in copy] != [w.fields for w in waves]:
+                raise TestError,'Saved file differs from loaded file'
+            del waves, wave, copy
+
+        # saved to the file it was loaded from (copied by default):
+        waves = loadNistFile(copyName)
+        saveNistFile(copyName,waves)
+        copy = loadNistFile(copyName)
+        if [str(w.data) for w in copy] != [str(w.data) for w in waves] or \
+           [w.fields for w in copy] != [w.fields for w in waves]:
+            raise TestError,'File saved over itself differs'
+    finally:
+        for name in fileName, copyName:
+            if os.path.exists(name):
+                os.remove(name)
+
 def test():
+    testChecksum([])
+    testChecksum([1,2,3])
+    testChecksum([32767]*10 + [-32768]*11)
+    testChecksum(range(-32768,32768,3))
+    testLoadSave()
     testConvertWord('hello')
     testConvertWord('New York')
     testConvertWord('_\\underscore')
@@ -0,0 +1,135 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# benchmarkLazyLoading.py
+#   Measures the cold start of natlinkmain.findAndLoadFiles (as after a user
+#   switch) with and without lazy loading (natlinkmain.setLazyLoading), on a
+#   temporary directory with generated global grammar files, which are all
+#   listed in the manifest (natlinkmain.manifestFileName).  Reports the time,
+#   the growth of the resident memory, and the time of loading a deferred
+#   module at the first utterance in its application.
+#
+#   Each mode runs in a separate python process, with fakenatlink standing
+#   in for natlink (NatSpeak need not be running, but natlinkmain needs a
+#   configured NatLink).  The grammar cache is switched off, so each
+#   grammar is parsed.  Start with:
+#       python benchmarkLazyLoading.py [number of grammar files]
+#
+
+import sys, os, os.path
+import time
+import shutil
+import tempfile
+import subprocess
+
+thisDir = os.path.dirname(os.path.abspath(__file__))
+
+def residentMemory():
+    """the resident memory (working set) of this process in bytes, or 0"""
+    try:
+        from ctypes import windll, Structure, c_ulong, c_size_t, sizeof, byref
+        class PROCESS_MEMORY_COUNTERS(Structure):
+            _fields_ = [('cb', c_ulong), ('PageFaultCount', c_ulong),
+                        ('PeakWorkingSetSize', c_size_t), ('WorkingSetSize', c_size_t),
+                        ('QuotaPeakPagedPoolUsage', c_size_t), ('QuotaPagedPoolUsage', c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', c_size_t), ('QuotaNonPagedPoolUsage', c_size_t),
+                        ('PagefileUsage', c_size_t), ('PeakPagefileUsage', c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = sizeof(counters)
+        windll.psapi.GetProcessMemoryInfo(windll.kernel32.GetCurrentProcess(),
+                                          byref(counters), sizeof(counters))
+        return counters.WorkingSetSize
+    except (ImportError, AttributeError):
+        try:
+            return int(open('/proc/self/statm').read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (IOError, OSError):
+            return 0
+
+grammarTemplate = '''
+import natlink
+from natlinkutils import *
+
+class ThisGrammar(GrammarBase):
+    gramSpec = """
+        <start> exported = %(app)s (%(rules)s);
+        %(ruleDefs)s
+    """
+    def initialize(self):
+        self.load(self.gramSpec)
+        self.activateAll()
+
+thisGrammar = ThisGrammar()
+thisGrammar.initialize()
+
+def unload():
+    global thisGrammar
+    if thisGrammar: thisGrammar.unload()
+    thisGrammar = None
+'''
+
+def makeGrammarFiles(directory, number):
+    manifest = open(os.path.join(directory, 'natlinkmanifest.txt'), 'w')
+    for i in range(number):
+        app = 'app%s'% i
+        rules = ['rule%s'% j for j in range(30)]
+        ruleDefs = ['<%s> = %s;'% (r, ' | '.join(['%s word%s'% (r, k) for k in range(20)]))
+                    for r in rules]
+        source = grammarTemplate% dict(app=app, rules=' | '.join(['<%s>'% r for r in rules]),
+                                       ruleDefs='\n        '.join(ruleDefs))
+        open(os.path.join(directory, '_%s.py'% app), 'w').write(source)
+        manifest.write('_%s: %s\n'% (app, app))
+    manifest.close()
+
+def measure(directory, lazy):
+    """run in the child process, print the results"""
+    import fakenatlink
+    fakenatlink.install()
+    try:
+        import natlinkmain
+    except ImportError:
+        sys.path.append(os.path.join(thisDir, '..', 'MacroSystem', 'core'))
+        import natlinkmain
+    import gramcache
+    gramcache.setCacheDirectory(None)
+    natlinkmain.status.UnimacroIsEnabled = lambda: 0
+    natlinkmain.baseDirectory = directory
+    natlinkmain.userDirectory = natlinkmain.unimacroDirectory = ''
+    natlinkmain.searchImportDirs = [directory]
+    natlinkmain.vocolaEnabled = 0
+    sys.path.insert(0, directory)
+    natlinkmain.setLazyLoading(lazy)
+
+    memory = residentMemory()
+    t0 = time.clock()
+    natlinkmain.findAndLoadFiles()
+    elapsed = time.clock() - t0
+    memory = residentMemory() - memory
+    loaded = len([x for x in natlinkmain.loadedFiles.values() if x])
+    t0 = time.clock()
+    natlinkmain.beginCallback((os.path.join(directory, 'app1.exe'), 'app one', 1))
+    switch = time.clock() - t0
+    stats = natlinkmain.getLazyStats()
+    print '    cold start:      %8.1f ms'% (elapsed*1e3)
+    print '    resident memory: %8.0f KB more'% (memory/1024.)
+    print '    loaded %s modules, %s deferred'% (loaded, stats['deferred'])
+    print '    first utterance in app1: %8.1f ms (%s loaded lazily)'% (switch*1e3, stats['loadedLazily'])
+
+def benchmark(number):
+    directory = tempfile.mkdtemp()
+    try:
+        makeGrammarFiles(directory, number)
+        for mode in 'eager', 'lazy':
+            print '%s loading of %s grammar files:'% (mode, number)
+            sys.stdout.flush()
+            subprocess.call([sys.executable, os.path.abspath(__file__), '-measure', mode, directory])
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '-measure':
+        measure(sys.argv[3], sys.argv[2] == 'lazy')
+    else:
+        number = 150
+        if len(sys.argv) > 1:
+            number = int(sys.argv[1])
+        benchmark(number)
@@ -0,0 +1,214 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# benchmarkNsformat.py
+#   Times nsformat.formatWords on dictated phrases, with a fake vocabulary
+#   as word info provider (word infos as natlink.getWordInfo returns them):
+#   - without and with the word info cache, reporting the formatting cost
+#     per word and the hit rate of the cache,
+#   - on a stream of 10000 words, against the previous state machine, which
+#     tested the flags as sets and concatenated the output.
+#
+#   The formatted text must be the same; fakenatlink stands in for natlink,
+#   so NatSpeak need not be running (natlinkmain needs a configured NatLink,
+#   as for replayRecognitions.py).
+#   Start with:
+#       python benchmarkNsformat.py [number of repetitions]
+#
+
+import sys, os, os.path
+import time
+import random
+
+import fakenatlink
+fakenatlink.install()
+try:
+    import nsformat
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '..', 'MacroSystem', 'core'))
+    import nsformat
+from nsformat import *
+
+def bits(*flags):
+    info = 0
+    for flag in flags:
+        info |= 1<<flag
+    return info
+
+def makeVocabulary(size):
+    vocabulary = {}
+    for i in range(size):
+        vocabulary['word%s'% i] = bits(nsformat.flag_useradded)
+    vocabulary['.\\period'] = bits(*nsformat.flags_like_period)
+    vocabulary[',\\comma'] = bits(*nsformat.flags_like_comma)
+    vocabulary['-\\hyphen'] = bits(*nsformat.flags_like_hyphen)
+    return vocabulary
+
+def makePhrases(vocabulary, number, length):
+    """phrases of words from the vocabulary, the common words more often"""
+    words = sorted(vocabulary.keys())
+    random.seed(1)
+    phrases = []
+    for i in range(number):
+        phrase = [words[int(random.paretovariate(1.2)) % len(words)]
+                  for j in range(length)]
+        phrases.append(phrase + ['.\\period'])
+    return phrases
+
+def formatPhrases(phrases):
+    state = None
+    result = []
+    for phrase in phrases:
+        text, state = nsformat.formatWords(phrase, state)
+        result.append(text)
+    return result
+
+def timeIt(phrases, repeat):
+    t0 = time.clock()
+    for i in range(repeat):
+        result = formatPhrases(phrases)
+    nWords = sum([len(p) for p in phrases])
+    return result, (time.clock() - t0) / repeat / nWords
+
+#---------------------------------------------------------------------------
+# formatWords and formatWord as they were before, kept as reference (with
+# the word flags and state as sets)
+
+def oldFormatWords(wordFlagsList, state):
+    output = ''
+    for wordName, wordFlags in wordFlagsList:
+        newText, state = oldFormatWord(wordName, wordFlags, state)
+        output = output + newText
+    return output, state
+
+def oldFormatWord(wordName, wordFlags, stateFlags):
+    stateFlags = set(stateFlags)
+    if wordName[:2] == '\\\\':
+        wordName = '\\'
+    else:
+        wordName = wordName.split('\\')[0]
+    output = ''
+    if flag_new_line in wordFlags:
+        output = output + '\r\n'
+    elif flag_new_paragraph in wordFlags:
+        output = output + '\r\n\r\n'
+    elif flag_space_bar in wordFlags:
+        output = output + ' '
+    if ( flag_no_formatting in wordFlags or
+          flag_no_space_next in stateFlags or
+          flag_no_space_all in stateFlags or
+          flag_no_space_before in wordFlags or
+          flag_cond_no_space in stateFlags and flag_cond_no_space in wordFlags ):
+        pass
+    elif flag_two_spaces_next in stateFlags:
+        output = output + '  '
+    else:
+        output = output + ' '
+    if not flag_no_formatting in wordFlags and flag_no_space_all in stateFlags:
+        wordName = ''.join(wordName.split())
+    if flag_no_formatting in wordFlags:
+        pass
+    elif flag_lowercase_all in stateFlags:
+        wordName = wordName.lower()
+    elif flag_uppercase_all in stateFlags:
+        wordName = wordName.upper()
+    elif flag_cap_all in stateFlags and not flag_title_mode in wordFlags:
+        wordName = ' '.join([w.capitalize() for w in wordName.split()])
+    elif flag_passive_cap_next in stateFlags:
+        wordName = wordName.capitalize()
+    if flag_no_formatting in wordFlags:
+        pass
+    elif flag_lowercase_next in stateFlags:
+        words = wordName.split()
+        words[0] = words[0].lower()
+        wordName= ' '.join(words)
+    elif flag_uppercase_next in stateFlags:
+        words = wordName.split()
+        words[0] = words[0].upper()
+        wordName= ' '.join(words)
+    elif flag_active_cap_next in stateFlags:
+        wordName = wordName.capitalize()
+    elif flag_beginning_title_mode in stateFlags:
+        wordName = wordName.capitalize()
+    output = output + wordName
+    if not flag_no_cap_change in wordFlags:
+        stateFlags.discard(flag_active_cap_next)
+        stateFlags.discard(flag_passive_cap_next)
+        stateFlags.discard(flag_uppercase_next)
+        stateFlags.discard(flag_lowercase_next)
+        stateFlags.discard(flag_beginning_title_mode)
+    if not flag_no_space_change in wordFlags:
+        stateFlags.discard(flag_no_space_next)
+        stateFlags.discard(flag_two_spaces_next)
+    elif not flag_no_formatting in wordFlags:
+        stateFlags.discard(flag_no_space_next)
+    stateFlags.discard(flag_cond_no_space)
+    if flag_reset_uc_lc_caps in wordFlags:
+        stateFlags.discard(flag_cap_all)
+        stateFlags.discard(flag_uppercase_all)
+        stateFlags.discard(flag_lowercase_all)
+    if flag_reset_no_space in wordFlags:
+        stateFlags.discard(flag_no_space_all)
+    if flag_cap_all in wordFlags:
+        stateFlags.discard(flag_beginning_title_mode)
+    copyList = [ flag_active_cap_next, flag_passive_cap_next,
+         flag_uppercase_next, flag_lowercase_next, flag_no_space_next,
+         flag_two_spaces_next, flag_cond_no_space, flag_cap_all,
+         flag_uppercase_all, flag_lowercase_all, flag_no_space_all,
+         flag_swallow_period, flag_beginning_title_mode ]
+    for i in copyList:
+        if i in wordFlags:
+            stateFlags.add(i)
+    if flag_new_paragraph in wordFlags and flag_is_period in wordFlags:
+        stateFlags.add(flag_new_paragraph)
+    return output, stateFlags
+
+def benchmarkStream(vocabulary, repeat):
+    """format a stream of 10000 words, with the word flags given"""
+    stream = []
+    for phrase in makePhrases(vocabulary, 1000, 9):
+        stream.extend([(word, nsformat.wordInfoToFlags(vocabulary[word]))
+                       for word in phrase])
+    state = set([nsformat.flag_no_space_next, nsformat.flag_active_cap_next])
+    print 'stream of %s words'% len(stream)
+    expected = oldFormatWords(stream, state)
+    if nsformat.formatWords(stream, set(state)) != expected:
+        print 'DIFFERENT formatting of the stream'
+        sys.exit(1)
+    for name, func in [('previous formatWords:', oldFormatWords),
+                       ('formatWords:', nsformat.formatWords)]:
+        t0 = time.clock()
+        for i in range(repeat):
+            func(stream, set(state))
+        elapsed = (time.clock() - t0) / repeat
+        print '    %-22s %8.2f ms, %6.2f us per word'% (name, elapsed*1e3, elapsed/len(stream)*1e6)
+
+def benchmark(repeat):
+    vocabulary = makeVocabulary(1000)
+    phrases = makePhrases(vocabulary, 200, 10)
+    saved = nsformat.wordInfoCache
+    try:
+        cache = nsformat.wordInfoCache = nsformat.WordInfoCache(vocabulary.get)
+        print '%s phrases of %s words'% (len(phrases), len(phrases[0]))
+        cache.maxSize = 0
+        expected, before = timeIt(phrases, repeat)
+        print '    not cached:  %8.2f us per word'% (before*1e6)
+        cache.maxSize = saved.maxSize
+        cache.invalidate()
+        cache.resetStats()
+        result, after = timeIt(phrases, repeat)
+        if result != expected:
+            print 'DIFFERENT formatting with the cache'
+            sys.exit(1)
+        print '    cached:      %8.2f us per word'% (after*1e6)
+        print '    cache stats: %s'% cache.getStats()
+        benchmarkStream(vocabulary, repeat)
+    finally:
+        nsformat.wordInfoCache = saved
+
+if __name__ == "__main__":
+    repeat = 20
+    if len(sys.argv) > 1:
+        repeat = int(sys.argv[1])
+    benchmark(repeat)
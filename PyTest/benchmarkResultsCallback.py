@@ -0,0 +1,171 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# benchmarkResultsCallback.py
+#   Replays recorded wordsAndNums lists through GrammarBase.resultsCallback,
+#   via the dispatch table built at load time (the current path) and via the
+#   previous implementation (ruleMap lookup per word, DNS15 offset in the loop,
+#   callIfExists per rule and copy.copy of the neighbouring entries).
+#
+#   Both paths must give the same fullResults, seqsAndRules, wordsByRule and
+#   the same gotResults_<rule> calls; the timings per recognition are printed.
+#
+#   NatSpeak must be running (a GramObj is needed), start with:
+#       python benchmarkResultsCallback.py [number of replays]
+#
+
+import sys
+import copy
+import time
+
+import natlink
+from natlinkutils import *
+
+gramSpec = """
+<dgndictation> imported;
+<start> exported = <color>+ and <shape> [with <number>] [<dgndictation>];
+<color> = red | blue | green | yellow;
+<shape> = circle | square | triangle;
+<number> = one | two | three | four | five;
+"""
+
+class BenchGrammar(GrammarBase):
+
+    def initialize(self):
+        self.load(gramSpec)
+        self.calls = []
+
+    def gotResults_start(self, words, fullResults):
+        self.calls.append(('start', words))
+
+    def gotResults_color(self, words, fullResults):
+        self.calls.append(('color', words))
+
+    def gotResults_shape(self, words, fullResults):
+        self.calls.append(('shape', words))
+
+    def gotResults_number(self, words, fullResults):
+        self.calls.append(('number', words))
+
+    def gotResults_dgndictation(self, words, fullResults):
+        self.calls.append(('dgndictation', words))
+
+def oldResultsCallback(gram, wordsAndNums, resObj):
+    """the previous implementation of GrammarBase.resultsCallback, kept here as reference
+    """
+    words = []
+    fullResults = []
+    wordsByRule = {}
+    for x in wordsAndNums:
+        word, ruleNumber = x
+        words.append( word )
+        if DNSVersion >= 15:
+            ruleNumber += 1
+        try:
+            ruleName = gram.ruleMap[ruleNumber]
+        except KeyError:
+            if ruleNumber in (1000000, 1000001) and 'dgndictation' in gram.ruleMap.values():
+                ruleName = 'dgndictation'
+            elif ruleNumber in (1000001, 1000002) and 'dgnletters' in gram.ruleMap.values():
+                ruleName = 'dgnletters'
+            else:
+                raise KeyError('Invalid key %s for ruleMap'% ruleNumber)
+        fullResults.append( ( word, ruleName ) )
+        wordsByRule.setdefault(ruleName, []).append(word)
+    seqsAndRules = []
+    for x in fullResults:
+        if len(seqsAndRules) > 0 and seqsAndRules[-1:][0][1] == x[1]:
+            seqsAndRules[-1:][0][0].append(x[0])
+        else:
+            seqsAndRules.append( ([x[0]], x[1]) )
+    gram.fullResults = fullResults
+    gram.seqsAndRules = seqsAndRules
+    gram.wordsByRule = wordsByRule
+    gram.callIfExists( 'gotResultsInit', (words, fullResults) )
+    lenSeqsAndRules = len(seqsAndRules)
+    for i, x in enumerate(seqsAndRules):
+        if i == 0:
+            gram.prevRule, gram.prevWords = None, []
+        else:
+            Prev = copy.copy(seqsAndRules[i-1])
+            gram.prevRule, gram.prevWords = Prev[1], Prev[0]
+        if i == lenSeqsAndRules - 1:
+            gram.nextRule, gram.nextWords = None, []
+        else:
+            Next = copy.copy(seqsAndRules[i+1])
+            gram.nextRule, gram.nextWords = Next[1], Next[0]
+        ruleName, ruleWords = x[1], copy.copy(x[0])
+        gram.callIfExists( 'gotResults_'+ruleName, (ruleWords, fullResults) )
+    gram.callIfExists( 'gotResults', (words, fullResults) )
+
+def recordedResults(gram):
+    """return wordsAndNums lists as NatSpeak passes them to the grammar
+    """
+    if DNSVersion >= 15:
+        offset = 1
+    else:
+        offset = 0
+    num = {}
+    for number, ruleName in gram.ruleMap.items():
+        num[ruleName] = number - offset
+    dictation = 1000000 - offset
+    return [
+        [('red', num['color']), ('and', num['start']), ('circle', num['shape'])],
+        [('red', num['color']), ('blue', num['color']), ('green', num['color']),
+         ('and', num['start']), ('square', num['shape']), ('with', num['start']),
+         ('three', num['number'])],
+        [('yellow', num['color']), ('and', num['start']), ('triangle', num['shape']),
+         ('with', num['start']), ('five', num['number']),
+         ('hello', dictation), ('world', dictation), ('again', dictation)],
+        ]
+
+def replay(callback, gram, recorded, count):
+    t0 = time.clock()
+    for i in xrange(count):
+        for wordsAndNums in recorded:
+            callback(gram, wordsAndNums, None)
+    return time.clock() - t0
+
+def newResultsCallback(gram, wordsAndNums, resObj):
+    gram.resultsCallback(wordsAndNums, resObj)
+
+def run(count=10000):
+    gram = BenchGrammar()
+    gram.initialize()
+    try:
+        recorded = recordedResults(gram)
+        # check the two paths give the same results:
+        for wordsAndNums in recorded:
+            gram.calls = []
+            oldResultsCallback(gram, wordsAndNums, None)
+            old = (gram.calls, gram.fullResults, gram.seqsAndRules, gram.wordsByRule)
+            gram.calls = []
+            newResultsCallback(gram, wordsAndNums, None)
+            new = (gram.calls, gram.fullResults, gram.seqsAndRules, gram.wordsByRule)
+            if old != new:
+                raise ValueError('results differ for %s:\nold: %s\nnew: %s'% (wordsAndNums, old, new))
+
+        n = count*len(recorded)
+        gram.calls = []
+        tOld = replay(oldResultsCallback, gram, recorded, count)
+        gram.calls = []
+        tNew = replay(newResultsCallback, gram, recorded, count)
+        gram.calls = []
+        print 'replayed %s recognitions (%s words each on average)'% \
+              (n, sum(map(len, recorded))/len(recorded))
+        print 'old path: %.2f microseconds per recognition'% (tOld*1e6/n)
+        print 'new path: %.2f microseconds per recognition'% (tNew*1e6/n)
+        print 'speedup: %.2f'% (tOld/tNew)
+    finally:
+        gram.unload()
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    else:
+        count = 10000
+    try:
+        natlink.natConnect()
+        run(count)
+    finally:
+        natlink.natDisconnect()
@@ -0,0 +1,85 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# benchmarkSendDragonKeys.py
+#   Times ExtendedSendDragonKeys (MacroSystem/core) on long literal text and
+#   on short command strings sent over and over:
+#   - parse_into_chords against the previous implementation, which sliced
+#     the rest of the specification off after each chord,
+#   - senddragonkeys_to_events with and without the event cache.
+#
+#   The chords and events must be the same; no input is sent.
+#
+#   Windows only (the module uses the keyboard layout), start with:
+#       python benchmarkSendDragonKeys.py [number of repetitions]
+#
+
+import sys, os, os.path
+import time
+
+try:
+    import ExtendedSendDragonKeys
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '..', 'MacroSystem', 'core'))
+    import ExtendedSendDragonKeys
+
+def oldParseIntoChords(specification):
+    """parse_into_chords as it was before, kept as reference"""
+    chords = []
+    while len(specification) > 0:
+        m = ExtendedSendDragonKeys.chord_pattern.match(specification)
+        if m:
+            modifiers = m.group(1)
+            if modifiers: modifiers = modifiers[:-1]  # remove final "+"
+            chords += [[modifiers, m.group(2), m.group(3), m.group(0)]]
+            specification = specification[m.end():]
+        else:
+            char = specification[0]
+            chords += [[None, char, None, char]]
+            specification = specification[1:]
+    return chords
+
+longText = ("The quick brown fox {shift+tab} jumps over the lazy dog, "
+            "{ctrl+a}{{}braces{}} and {Enter}") * 200
+commandStrings = ["{ctrl+c}", "{ctrl+v}", "{alt+f4}", "{shift+left_10}",
+                  "{home}{shift+end}", "{esc}", "{ctrl+s}", "{f5}",
+                  "{ctrl+shift+tab}", "{tab_3}{Enter}"]
+
+def timeIt(func, args, repeat):
+    t0 = time.clock()
+    for i in range(repeat):
+        for arg in args:
+            func(arg)
+    return (time.clock() - t0) / repeat / len(args)
+
+def eventBytes(events):
+    return [str(buffer(e)) for e in events]
+
+def benchmark(repeat):
+    ESDK = ExtendedSendDragonKeys
+    for name, inputs in [('long literal text (%s chars)'% len(longText), [longText]),
+                         ('%s command strings'% len(commandStrings), commandStrings)]:
+        print name
+        for spec in inputs:
+            if oldParseIntoChords(spec) != ESDK.parse_into_chords(spec):
+                print 'DIFFERENT chords for: %r'% spec[:60]
+                sys.exit(1)
+            ESDK.clear_event_cache()
+            if eventBytes(ESDK.senddragonkeys_to_events(spec)) != \
+                   eventBytes(ESDK.build_events(spec)):
+                print 'DIFFERENT events for: %r'% spec[:60]
+                sys.exit(1)
+
+        print '    previous parse_into_chords:  %10.1f us'% (timeIt(oldParseIntoChords, inputs, repeat)*1e6)
+        print '    parse_into_chords:           %10.1f us'% (timeIt(ESDK.parse_into_chords, inputs, repeat)*1e6)
+        print '    events, not cached:          %10.1f us'% (timeIt(ESDK.build_events, inputs, repeat)*1e6)
+        ESDK.clear_event_cache()
+        print '    events, cached:              %10.1f us'% (timeIt(ESDK.senddragonkeys_to_events, inputs, repeat)*1e6)
+        print '    cache stats: %s'% ESDK.Event_cache_stats
+
+if __name__ == "__main__":
+    repeat = 20
+    if len(sys.argv) > 1:
+        repeat = int(sys.argv[1])
+    benchmark(repeat)
@@ -0,0 +1,120 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# benchmarkVocolaActions.py
+#   Times the gotResults functions of Vocola commands of several kinds as
+#   vcl2py generates them now (text known when converting added at once,
+#   buffers of such text flushed with keys converted when converting) and
+#   as before (vcl2py.emit.Precompute_actions off: a += per word action and
+#   convert_keys at each flush), with fakenatlink standing in for natlink.
+#   The EvalTemplate command is also timed with the template cache of
+#   VocolaUtils emptied before each call.
+#
+#   Both must play the same keys and run the same scripts; the time per
+#   command is printed.
+#
+#   natlinkmain needs a configured NatLink (as for replayRecognitions.py),
+#   start with:
+#       python benchmarkVocolaActions.py [number of repetitions]
+#
+
+import sys, os, os.path
+import time
+import imp
+import shutil
+import tempfile
+
+thisDir = os.path.dirname(os.path.abspath(__file__))
+import fakenatlink
+fakenatlink.install()
+import natlink
+sys.path.append(os.path.join(thisDir, '..', 'MacroSystem', 'core'))
+sys.path.append(os.path.join(thisDir, '..', 'Vocola', 'exec'))
+import VocolaUtils
+import vcl2py.main
+import vcl2py.emit
+
+# (kind, command, words spoken); command N is gotResults_N
+commands = [
+    ('fixed keys', 'save all = {Ctrl+x}{Ctrl+s} {Alt+f}s{Enter};',
+     ['save', 'all']),
+    ('keys and a number', 'down <n> = {Down_$1}{Home}{Shift+End};',
+     ['down', '5']),
+    ('menu with actions', 'go <direction> = {Esc} $1 {Enter};',
+     ['go', 'left']),
+    ('keys around a Dragon call',
+     'next window = {Esc}{Esc_2} SendSystemKeys("{Alt+Tab}") {Home} {End};',
+     ['next', 'window']),
+    ('Repeat', 'tab <n> = Repeat($1, {Tab}{Space}) {Enter};',
+     ['tab', '3']),
+    ('EvalTemplate', 'line <n> = {Ctrl+g} EvalTemplate("%i * 10 + 1", $1) {Enter};',
+     ['line', '4']),
+]
+
+definitions = '''<n> := 1..20;
+<direction> := (left = {Left_2} | right = {Right_2} | up = {Up} | down = {Down});
+'''
+
+def convert(folder, precompute):
+    vcl2py.emit.Precompute_actions = precompute
+    out_folder = os.path.join(folder, precompute and 'new' or 'old')
+    os.mkdir(out_folder)
+    diagnostics, log, rebuilt = vcl2py.main.compile(
+        os.path.join(folder, 'bench.vcl'), out_folder,
+        {'force': True, 'ignore_INI_file': True, 'ast_cache_size': 0})
+    if diagnostics:
+        print 'converting failed:', log
+        sys.exit(1)
+    path = os.path.join(out_folder, 'bench_vcl.py')
+    module = imp.load_source(precompute and 'bench_new' or 'bench_old', path)
+    return module.thisGrammar
+
+def run(grammar, number, words, repeat, clearTemplates=0):
+    function = getattr(grammar, 'gotResults_%s'% number)
+    fullResults = [(word, str(number)) for word in words]
+    del fakenatlink.played[:]
+    del fakenatlink.scripts[:]
+    t0 = time.clock()
+    for i in range(repeat):
+        if clearTemplates:
+            VocolaUtils.template_cache.clear()
+        grammar.firstWord = 0
+        function(words, list(fullResults))
+    elapsed = (time.clock() - t0) / repeat
+    return elapsed, list(fakenatlink.played), list(fakenatlink.scripts)
+
+def benchmark(repeat):
+    VocolaUtils.Language = 'enx'
+    folder = tempfile.mkdtemp()
+    try:
+        out = open(os.path.join(folder, 'bench.vcl'), 'w')
+        out.write(definitions)
+        for kind, command, words in commands:
+            out.write(command + '\n')
+        out.close()
+        if not vcl2py.main.lex.Token_properties:
+            vcl2py.main.initialize_token_properties()
+        old = convert(folder, 0)
+        new = convert(folder, 1)
+
+        for number, (kind, command, words) in enumerate(commands):
+            number += 1
+            oldTime, oldPlayed, oldScripts = run(old, number, words, repeat)
+            newTime, newPlayed, newScripts = run(new, number, words, repeat)
+            if oldPlayed != newPlayed or oldScripts != newScripts:
+                print 'DIFFERENT output for: %s'% command
+                sys.exit(1)
+            print '%-28s previous: %7.1f us   now: %7.1f us'% \
+                  (kind, oldTime*1e6, newTime*1e6)
+            if kind == 'EvalTemplate':
+                clearedTime = run(new, number, words, repeat, 1)[0]
+                print '%-28s template compiled each time: %7.1f us'% ('', clearedTime*1e6)
+    finally:
+        vcl2py.emit.Precompute_actions = True
+        shutil.rmtree(folder)
+
+if __name__ == "__main__":
+    repeat = 10000
+    if len(sys.argv) > 1:
+        repeat = int(sys.argv[1])
+    benchmark(repeat)
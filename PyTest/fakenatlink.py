@@ -0,0 +1,223 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# fakenatlink.py
+#   An in-memory stand-in for the natlink module (natlink.pyd), so grammar
+#   modules can be loaded and driven through their callbacks without
+#   NatSpeak.  Nothing is recognized and no keys are sent:
+#   - GramObj keeps the loaded grammar, the active rules and the callbacks,
+#   - playString, execScript and playEvents are recorded in played, scripts
+#     and events,
+#   - simulateBegin and simulateResults make the callbacks as NatSpeak would.
+#
+#   Call install() before importing natlinkutils or a grammar module, so
+#   their "import natlink" gets this module.  natlinkmain (imported by
+#   natlinkutils) still needs a configured NatLink for its status.
+#
+#   Used by replayRecognitions.py.
+
+import sys
+
+class NatError(Exception): pass
+class BadGrammar(NatError): pass
+class BadWindow(NatError): pass
+class DataMissing(NatError): pass
+class InvalidWord(NatError): pass
+class MimicFailed(NatError): pass
+class OutOfRange(NatError): pass
+class UnknownName(NatError): pass
+class UserExists(NatError): pass
+class WrongState(NatError): pass
+class WrongType(NatError): pass
+
+#---------------------------------------------------------------------------
+# state of the fake NatSpeak
+
+currentModule = ('', '', 0)   # (module path, window title, window handle)
+currentUser = ('', '')        # (user name, user directory)
+micState = 'off'
+callbackDepth = 0
+beginCallback = None          # set by natlink.setBeginCallback (natlinkmain)
+changeCallback = None
+timerCallback = None
+loadedGrammars = []           # the GramObjs which are loaded, in load order
+
+played = []                   # the keys of playString
+scripts = []                  # the scripts of execScript
+events = []                   # the events of playEvents
+
+def install():
+    """make "import natlink" give this module"""
+    sys.modules['natlink'] = sys.modules[__name__]
+
+def reset():
+    """forget the recorded output and the loaded grammars"""
+    global callbackDepth
+    del played[:]
+    del scripts[:]
+    del events[:]
+    del loadedGrammars[:]
+    callbackDepth = 0
+
+#---------------------------------------------------------------------------
+# the natlink functions
+
+def natConnect(threading=0): pass
+def natDisconnect(): pass
+def isNatSpeakRunning(): return 0
+def displayText(text, isError=0):
+    sys.__stdout__.write(text)
+
+def getCurrentModule(): return currentModule
+def getCurrentUser(): return currentUser
+def getCallbackDepth(): return callbackDepth
+def getMicState(): return micState
+def setMicState(state):
+    global micState
+    micState = state
+def getCursorPos(): return (0, 0)
+def getScreenSize(): return (1024, 768)
+def getClipboard(): return ''
+
+def playString(keys, hooks=0):
+    played.append(keys)
+def execScript(script, args=None):
+    scripts.append(script)
+def playEvents(eventList):
+    events.extend(eventList)
+
+def recognitionMimic(words):
+    raise MimicFailed('recognitionMimic is not available without NatSpeak')
+
+def setBeginCallback(callback):
+    global beginCallback
+    beginCallback = callback
+def setChangeCallback(callback):
+    global changeCallback
+    changeCallback = callback
+def setTimerCallback(callback, interval=0):
+    global timerCallback
+    timerCallback = callback
+def setTrayIcon(*args): pass
+
+#---------------------------------------------------------------------------
+# GramObj and ResObj
+
+class GramObj(object):
+    def __init__(self):
+        self.loaded = 0
+        self.gramBin = None
+        self.allResults = self.hypothesis = 0
+        self.activeRules = {}    # rule name: window
+        self.exclusive = 0
+        self.lists = {}          # list name: [words]
+        self.beginCallback = self.resultsCallback = self.hypothesisCallback = None
+        self.context = ('', '')
+        self.selectText = ''
+
+    def load(self, gramBin, allResults=0, hypothesis=0):
+        if self.loaded:
+            raise WrongState('grammar is already loaded')
+        self.loaded = 1
+        self.gramBin = gramBin
+        self.allResults, self.hypothesis = allResults, hypothesis
+        loadedGrammars.append(self)
+
+    def unload(self):
+        if self.loaded:
+            loadedGrammars.remove(self)
+        self.loaded = 0
+        self.activeRules = {}
+        self.lists = {}
+
+    def checkLoaded(self):
+        if not self.loaded:
+            raise NatError('grammar is not loaded')
+
+    def activate(self, ruleName, window=0):
+        self.checkLoaded()
+        self.activeRules[ruleName] = window
+
+    def deactivate(self, ruleName):
+        self.checkLoaded()
+        if ruleName not in self.activeRules and ruleName:
+            raise WrongState('rule %s is not active'% ruleName)
+        if ruleName:
+            del self.activeRules[ruleName]
+        else:
+            self.activeRules = {}
+
+    def setExclusive(self, exclusive):
+        self.checkLoaded()
+        self.exclusive = exclusive
+
+    def emptyList(self, listName):
+        self.checkLoaded()
+        self.lists[listName] = []
+
+    def appendList(self, listName, word):
+        self.checkLoaded()
+        self.lists.setdefault(listName, []).append(word)
+
+    def setBeginCallback(self, callback):
+        self.beginCallback = callback
+    def setResultsCallback(self, callback):
+        self.resultsCallback = callback
+    def setHypothesisCallback(self, callback):
+        self.hypothesisCallback = callback
+
+    def setContext(self, beforeText='', afterText=''):
+        self.context = (beforeText, afterText)
+    def setSelectText(self, text):
+        self.selectText = text
+    def getSelectText(self):
+        return self.selectText
+
+class ResObj(object):
+    """the results object of one recognition (only one choice)"""
+    def __init__(self, wordsAndNums):
+        self.wordsAndNums = wordsAndNums
+
+    def getResults(self, choice):
+        if choice:
+            raise OutOfRange('only one choice in a replayed recognition')
+        return list(self.wordsAndNums)
+
+    def getWords(self, choice):
+        return [word for word, number in self.getResults(choice)]
+
+    def correction(self, words):
+        return 0
+
+class DictObj(GramObj):
+    pass
+
+#---------------------------------------------------------------------------
+# the callbacks, as NatSpeak makes them
+
+def simulateBegin(moduleInfo):
+    """the begin of an utterance in the window moduleInfo"""
+    global currentModule, callbackDepth
+    currentModule = moduleInfo
+    callbackDepth += 1
+    try:
+        if beginCallback:
+            beginCallback(moduleInfo)
+        for gramObj in loadedGrammars[:]:
+            if gramObj.beginCallback:
+                gramObj.beginCallback(moduleInfo)
+    finally:
+        callbackDepth -= 1
+
+def simulateResults(gramObj, wordsAndNums):
+    """a recognition of gramObj; the grammars with allResults get 'other'"""
+    global callbackDepth
+    resObj = ResObj(wordsAndNums)
+    callbackDepth += 1
+    try:
+        gramObj.resultsCallback(wordsAndNums, resObj)
+        for other in loadedGrammars[:]:
+            if other is not gramObj and other.allResults and other.resultsCallback:
+                other.resultsCallback('other', resObj)
+    finally:
+        callbackDepth -= 1
@@ -0,0 +1,239 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# replayRecognitions.py
+#   Replays recorded begin and results callbacks through grammar modules
+#   (SampleMacros, Vocola _vcl outputs, ...) with fakenatlink standing in
+#   for natlink, and reports the time per callback stage (p50, p99, mean):
+#   - beginCallback: the begin of an utterance, for all loaded grammars,
+#   - gotBegin: the gotBegin of a grammar,
+#   - resultsCallback: GrammarBase.resultsCallback of the grammar recognized,
+#   - gotResults_<rule>: the rule functions.
+#
+#   Start with:
+#       python replayRecognitions.py [-n repeat] [-r recording] [grammar module.py ...]
+#
+#   Without grammar modules the scenario of testGrammar in testnatlink.py is
+#   replayed.  A recording has one callback per line (# starts a comment):
+#       ('begin', ('C:\\Windows\\notepad.exe', 'Untitled - Notepad', 1234))
+#       ('results', [('demo', 'start'), ('sample', 'start'), ('one', 'start')])
+#       ('results', [('red', 'color'), ...], '_sample2')
+#   The words come with their rule names; the grammar recognized is the
+#   first one knowing all these rules (or the grammar of the module given).
+#
+#   NatSpeak need not be running, but natlinkmain needs a configured NatLink.
+#
+
+import sys, os, os.path
+import time
+import imp
+import getopt
+from ast import literal_eval
+
+thisDir = os.path.dirname(os.path.abspath(__file__))
+import fakenatlink
+fakenatlink.install()
+import natlink
+try:
+    import natlinkutils
+except ImportError:
+    sys.path.append(os.path.join(thisDir, '..', 'MacroSystem', 'core'))
+    import natlinkutils
+from natlinkutils import *
+
+#---------------------------------------------------------------------------
+# the scenario of testGrammar in testnatlink.py
+
+testGrammarSpec = """
+    <other> exported = one [two];
+    <inner> = see <other>;
+    <start> exported = I <inner> now;
+    <hello> exported = hello there;
+"""
+
+class TestGrammar(GrammarBase):
+
+    def initialize(self):
+        self.load(testGrammarSpec)
+        self.activateAll()
+
+    def gotBegin(self, moduleInfo):
+        self.moduleInfo = moduleInfo
+
+    def gotResults_hello(self, words, fullResults):
+        natlink.playString('hello there')
+
+    def gotResults_start(self, words, fullResults):
+        pass
+
+    def gotResults_inner(self, words, fullResults):
+        pass
+
+    def gotResults_other(self, words, fullResults):
+        natlink.execScript('AppBringUp "calc"')
+
+calcModule = ('C:\\Windows\\system32\\calc.exe', 'Calculator', 1234)
+testScenario = [
+    ('begin', calcModule),
+    ('results', [('hello', 'hello'), ('there', 'hello')]),
+    ('begin', calcModule),
+    ('results', [('I', 'start'), ('see', 'inner'), ('one', 'other'), ('now', 'start')]),
+    ('begin', calcModule),
+    ('results', [('I', 'start'), ('see', 'inner'), ('one', 'other'), ('two', 'other'),
+                 ('now', 'start')]),
+    ]
+
+#---------------------------------------------------------------------------
+
+def readRecording(path):
+    """return the callbacks of a recording file"""
+    recording = []
+    for line in open(path):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            recording.append(literal_eval(line))
+    return recording
+
+def loadGrammarModule(path):
+    """import a grammar module, return the module and its grammars"""
+    directory, fileName = os.path.split(os.path.abspath(path))
+    if directory not in sys.path:
+        sys.path.append(directory)
+    moduleName = os.path.splitext(fileName)[0]
+    module = imp.load_source(moduleName, path)
+    grammars = [value for value in module.__dict__.values()
+                if isinstance(value, GramClassBase)]
+    return module, grammars
+
+def percentile(sortedTimes, p):
+    return sortedTimes[int(round(p*(len(sortedTimes)-1)))]
+
+class StageTimer(object):
+    """collects the times of the callback stages"""
+
+    def __init__(self):
+        self.times = {}   # stage: [seconds]
+
+    def add(self, stage, elapsed):
+        self.times.setdefault(stage, []).append(elapsed)
+
+    def wrap(self, stage, func):
+        def timed(*args):
+            t0 = time.clock()
+            try:
+                return func(*args)
+            finally:
+                self.add(stage, time.clock() - t0)
+        timed.timedFunction = func
+        return timed
+
+    def report(self):
+        print '%-28s %8s %10s %10s %10s'% ('stage', 'calls', 'p50 (us)', 'p99 (us)', 'mean (us)')
+        for stage in sorted(self.times.keys()):
+            times = sorted(self.times[stage])
+            print '%-28s %8d %10.1f %10.1f %10.1f'% (stage, len(times),
+                        percentile(times, 0.5)*1e6, percentile(times, 0.99)*1e6,
+                        sum(times)/len(times)*1e6)
+
+def instrument(grammar, timer):
+    """time gotBegin, resultsCallback and the gotResults_<rule> functions
+
+    the timed functions are put on the instance (where resultsCallback finds
+    the rule functions first), see uninstrument
+    """
+    gotBegin = getattr(grammar, 'gotBegin', None)
+    if gotBegin:
+        grammar.gotBegin = timer.wrap('gotBegin', gotBegin)
+    grammar.gramObj.setResultsCallback(timer.wrap('resultsCallback', grammar.resultsCallback))
+    if isinstance(grammar, GrammarBase):
+        for ruleName in set(grammar.ruleMap.values()):
+            funcName = 'gotResults_' + ruleName
+            func = getattr(grammar, funcName, None)
+            if func:
+                setattr(grammar, funcName, timer.wrap(funcName, func))
+
+def uninstrument(grammar):
+    for name, value in grammar.__dict__.items():
+        if hasattr(value, 'timedFunction'):
+            delattr(grammar, name)
+    grammar.gramObj.setResultsCallback(grammar.resultsCallback)
+
+def ruleNumbers(grammar):
+    """rule name: rule number as NatSpeak passes it to the grammar"""
+    numbers = {}
+    for number, ruleName in grammar.ruleDispatch.items():
+        numbers.setdefault(ruleName, number)
+    return numbers
+
+def findGrammar(grammars, ruleNames, moduleName=None):
+    for grammar, module in grammars:
+        if moduleName and module != moduleName:
+            continue
+        if isinstance(grammar, GrammarBase) and \
+               not [r for r in ruleNames if r not in grammar.ruleDispatch.values()]:
+            return grammar
+    raise ValueError('no grammar for the rules %s'% ruleNames)
+
+def replay(grammars, recording, repeat, timer):
+    """replay the recording repeat times through grammars [(grammar, module name)]"""
+    # look up the grammars and rule numbers once:
+    callbacks = []
+    for entry in recording:
+        if entry[0] == 'begin':
+            callbacks.append(('begin', tuple(entry[1])))
+        elif entry[0] == 'results':
+            ruleNames = [ruleName for word, ruleName in entry[1]]
+            grammar = findGrammar(grammars, ruleNames, *entry[2:])
+            numbers = ruleNumbers(grammar)
+            wordsAndNums = [(word, numbers[ruleName]) for word, ruleName in entry[1]]
+            callbacks.append(('results', (grammar.gramObj, wordsAndNums)))
+        else:
+            raise ValueError('invalid callback in recording: %s'% repr(entry))
+
+    simulateBegin = timer.wrap('beginCallback', fakenatlink.simulateBegin)
+    simulateResults = fakenatlink.simulateResults
+    for i in range(repeat):
+        for kind, args in callbacks:
+            if kind == 'begin':
+                simulateBegin(args)
+            else:
+                simulateResults(*args)
+
+def run(modulePaths, recording, repeat):
+    fakenatlink.reset()
+    timer = StageTimer()
+    grammars = []
+    if modulePaths:
+        for path in modulePaths:
+            module, moduleGrammars = loadGrammarModule(path)
+            grammars.extend([(g, module.__name__) for g in moduleGrammars])
+    else:
+        grammar = TestGrammar()
+        grammar.initialize()
+        grammars.append((grammar, __name__))
+        if recording is None:
+            recording = testScenario
+    if recording is None:
+        print 'no recording to replay'
+        return
+    for grammar, module in grammars:
+        instrument(grammar, timer)
+    try:
+        replay(grammars, recording, repeat, timer)
+    finally:
+        for grammar, module in grammars:
+            uninstrument(grammar)
+    print 'replayed %s callbacks %s times through %s grammars'% (len(recording), repeat, len(grammars))
+    print 'played %s strings, executed %s scripts'% (len(fakenatlink.played), len(fakenatlink.scripts))
+    timer.report()
+
+if __name__ == "__main__":
+    opts, args = getopt.getopt(sys.argv[1:], 'n:r:')
+    repeat = 1000
+    recording = None
+    for opt, value in opts:
+        if opt == '-n':
+            repeat = int(value)
+        elif opt == '-r':
+            recording = readRecording(value)
+    run(args, recording, repeat)
@@ -0,0 +1,143 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# unittestGramcache.py
+#   Tests of the gramcache module (on-disk cache of packed grammars), which
+#   do not need NatSpeak.  Each test uses its own temporary cache directory.
+#
+# run directly with python, the MacroSystem/core folder is added to the path
+# if needed.
+
+import sys, unittest
+import os, os.path
+import time
+import marshal
+import shutil
+import tempfile
+from cStringIO import StringIO
+
+try:
+    import gramcache
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '..', 'MacroSystem', 'core'))
+    import gramcache
+import gramparser
+
+def parse(gramSpec):
+    """return (gramSpec as lines, gramBin, parser) as GrammarBase.load has them"""
+    lines = [gramSpec]
+    gramparser.splitApartLines(lines)
+    parser = gramparser.GramParser(lines)
+    parser.doParse()
+    parser.checkForErrors()
+    return lines, gramparser.packGrammar(parser), parser
+
+def makeGramSpec(i):
+    return """
+        <start%s> exported = hello %s <inner>;
+        <inner> = (one | two | three) [four];
+    """% (i, i)
+
+class UnittestGramcache(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = gramcache.cacheDirectory, gramcache.maxCacheSize
+        self.directory = tempfile.mkdtemp()
+        gramcache.setCacheDirectory(self.directory)
+        gramcache.resetCacheStats()
+
+    def tearDown(self):
+        gramcache.setCacheDirectory(self.saved[0])
+        gramcache.maxCacheSize = self.saved[1]
+        shutil.rmtree(self.directory, 1)
+
+    def cacheFiles(self):
+        return sorted([name for name in os.listdir(self.directory)
+                       if name.endswith(gramcache.cacheExtension)])
+
+    def testOffByDefault(self):
+        # (until natlinkmain sets a directory)
+        self.assertEqual(None, self.saved[0])
+
+    def testGetPut(self):
+        lines, gramBin, parser = parse(makeGramSpec(1))
+        self.assertEqual(None, gramcache.get(lines))
+        gramcache.put(lines, gramBin, parser)
+        self.assertEqual(1, len(self.cacheFiles()))
+        self.assertEqual((gramBin, parser.knownRules, parser.exportRules, parser.knownLists),
+                         gramcache.get(lines))
+        otherLines = parse(makeGramSpec(2))[0]
+        self.assertEqual(None, gramcache.get(otherLines))
+        stats = gramcache.getCacheStats()
+        self.assertEqual((1, 2, 1, 0), (stats['hits'], stats['misses'],
+                                        stats['stores'], stats['errors']))
+
+    def testSwitchedOff(self):
+        lines, gramBin, parser = parse(makeGramSpec(1))
+        gramcache.setCacheDirectory(None)
+        gramcache.put(lines, gramBin, parser)
+        self.assertEqual(None, gramcache.get(lines))
+        self.assertEqual([], os.listdir(self.directory))
+
+    def testVersionMismatch(self):
+        lines, gramBin, parser = parse(makeGramSpec(1))
+        gramcache.put(lines, gramBin, parser)
+        filepath = gramcache.getCacheFile(lines)
+        data = marshal.dumps(('0.0', gramBin, parser.knownRules,
+                              parser.exportRules, parser.knownLists))
+        open(filepath, 'wb').write(data)
+        self.assertEqual(None, gramcache.get(lines))
+        self.assertFalse(os.path.exists(filepath))
+        self.assertEqual(1, gramcache.getCacheStats()['errors'])
+
+    def testDamagedFileRemoved(self):
+        lines, gramBin, parser = parse(makeGramSpec(1))
+        gramcache.put(lines, gramBin, parser)
+        filepath = gramcache.getCacheFile(lines)
+        data = open(filepath, 'rb').read()
+        open(filepath, 'wb').write(data[:len(data)//2])
+        self.assertEqual(None, gramcache.get(lines))
+        self.assertFalse(os.path.exists(filepath))
+        # stored again after the next parse:
+        gramcache.put(lines, gramBin, parser)
+        self.assertEqual(gramBin, gramcache.get(lines)[0])
+
+    def testLeastRecentlyUsedEvicted(self):
+        grammars = [parse(makeGramSpec(i)) for i in range(4)]
+        now = time.time()
+        for i, (lines, gramBin, parser) in enumerate(grammars[:3]):
+            gramcache.put(lines, gramBin, parser)
+            t = now - 100 + i*10      # grammar 0 is the oldest
+            os.utime(gramcache.getCacheFile(lines), (t, t))
+        size = os.path.getsize(gramcache.getCacheFile(grammars[0][0]))
+        gramcache.maxCacheSize = 3*size + size//2
+
+        gramcache.get(grammars[0][0])   # now the most recently used
+        lines, gramBin, parser = grammars[3]
+        gramcache.put(lines, gramBin, parser)
+
+        self.assertEqual(3, len(self.cacheFiles()))
+        self.assertEqual(None, gramcache.get(grammars[1][0]))
+        for i in (0, 2, 3):
+            self.assertNotEqual(None, gramcache.get(grammars[i][0]))
+        self.assertEqual(1, gramcache.getCacheStats()['evictions'])
+
+    def testWriteErrorPrintedOnce(self):
+        # a file where the cache directory should be, so it cannot be made:
+        blocked = os.path.join(self.directory, 'blocked')
+        open(blocked, 'w').close()
+        gramcache.setCacheDirectory(blocked)
+        saved = sys.stdout
+        sys.stdout = output = StringIO()
+        try:
+            for i in range(3):
+                lines, gramBin, parser = parse(makeGramSpec(i))
+                gramcache.put(lines, gramBin, parser)
+        finally:
+            sys.stdout = saved
+        self.assertEqual(1, output.getvalue().count('could not write cache file'))
+        self.assertEqual(3, gramcache.getCacheStats()['errors'])
+
+if __name__ == "__main__":
+    unittest.main()
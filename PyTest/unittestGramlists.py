@@ -0,0 +1,140 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# unittestGramlists.py
+#   Tests of gramlists.ListManager (the list handling of GrammarBase), with a
+#   stand-in for the natlink GramObj, so NatSpeak is not needed.
+#
+# run directly with python, the MacroSystem/core folder is added to the path
+# if needed.
+
+import sys, unittest
+import os, os.path
+
+try:
+    import gramlists
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '..', 'MacroSystem', 'core'))
+    import gramlists
+
+class FakeGramObj(object):
+    """stand-in for natlink.GramObj, only the list functions
+
+    keeps the lists and a log of the calls
+    """
+    def __init__(self):
+        self.lists = {}
+        self.calls = []
+
+    def emptyList(self, listName):
+        self.calls.append(('emptyList', listName))
+        self.lists[listName] = []
+
+    def appendList(self, listName, word):
+        if type(word) != type(""):
+            raise TypeError('appendList, word must be a string, not: %s'% repr(word))
+        self.calls.append(('appendList', listName, word))
+        self.lists.setdefault(listName, []).append(word)
+
+class FakeBatchGramObj(FakeGramObj):
+    """stand-in for a grammar object which can append several words in one call"""
+    def appendListWords(self, listName, words):
+        self.calls.append(('appendListWords', listName, tuple(words)))
+        self.lists.setdefault(listName, []).extend(words)
+
+class UnittestGramlists(unittest.TestCase):
+
+    def setUp(self):
+        self.gramObj = FakeGramObj()
+        self.manager = gramlists.ListManager(self.gramObj)
+
+    def checkList(self, listName, words):
+        self.assertEqual(sorted(self.gramObj.lists[listName]), sorted(words))
+        self.assertEqual(sorted(self.manager.getList(listName)), sorted(words))
+
+    def testSetListFirstTime(self):
+        self.gramObj.lists['files'] = ['left over']
+        self.manager.setList('files', ['a', 'b'])
+        self.assertEqual(self.gramObj.calls, [('emptyList', 'files'),
+                                              ('appendList', 'files', 'a'),
+                                              ('appendList', 'files', 'b')])
+        self.checkList('files', ['a', 'b'])
+
+    def testSetListUnchanged(self):
+        words = ['word%s'% i for i in range(1000)]
+        self.manager.setList('files', words)
+        self.gramObj.calls = []
+        self.manager.setList('files', words)
+        self.manager.setList('files', tuple(words))
+        self.manager.setList('files', list(reversed(words)))
+        self.assertEqual(self.gramObj.calls, [])
+        self.checkList('files', words)
+        self.assertEqual(self.manager.stats['unchanged'], 3)
+
+    def testSetListAdditions(self):
+        self.manager.setList('files', ['a', 'b'])
+        self.gramObj.calls = []
+        self.manager.setList('files', ['c', 'a', 'b', 'd'])
+        self.assertEqual(self.gramObj.calls, [('appendList', 'files', 'c'),
+                                              ('appendList', 'files', 'd')])
+        self.checkList('files', ['a', 'b', 'c', 'd'])
+        self.assertEqual(self.manager.stats['incremental'], 1)
+
+    def testSetListRemovals(self):
+        self.manager.setList('files', ['a', 'b', 'c'])
+        self.gramObj.calls = []
+        self.manager.setList('files', ['a', 'c', 'e'])
+        self.assertEqual(self.gramObj.calls[0], ('emptyList', 'files'))
+        self.checkList('files', ['a', 'c', 'e'])
+        self.assertEqual(self.manager.stats['rebuilt'], 1)
+
+    def testSetListString(self):
+        self.manager.setList('files', 'single')
+        self.checkList('files', ['single'])
+        self.gramObj.calls = []
+        self.manager.setList('files', 'single')
+        self.assertEqual(self.gramObj.calls, [])
+
+    def testAppendAndEmpty(self):
+        self.manager.emptyList('files')
+        self.manager.appendList('files', 'a')
+        self.manager.appendList('files', ['b', 'c'])
+        self.checkList('files', ['a', 'b', 'c'])
+        self.gramObj.calls = []
+        self.manager.setList('files', ['a', 'b', 'c'])
+        self.assertEqual(self.gramObj.calls, [])
+        self.manager.emptyList('files')
+        self.checkList('files', [])
+
+    def testAppendUnknownList(self):
+        """appending to a list that was not set or emptied leaves the contents unknown"""
+        self.manager.appendList('files', ['a'])
+        self.assertEqual(self.manager.getList('files'), None)
+        self.gramObj.calls = []
+        self.manager.setList('files', ['a'])
+        self.assertEqual(self.gramObj.calls, [('emptyList', 'files'), ('appendList', 'files', 'a')])
+
+    def testReset(self):
+        self.manager.setList('files', ['a'])
+        self.manager.reset()
+        self.gramObj.calls = []
+        self.manager.setList('files', ['a'])
+        self.assertEqual(self.gramObj.calls, [('emptyList', 'files'), ('appendList', 'files', 'a')])
+
+    def testBatchedAppend(self):
+        gramObj = FakeBatchGramObj()
+        manager = gramlists.ListManager(gramObj)
+        manager.setList('files', ['a', 'b'])
+        manager.setList('files', ['a', 'b', 'c', 'd'])
+        self.assertEqual(gramObj.calls, [('emptyList', 'files'),
+                                         ('appendListWords', 'files', ('a', 'b')),
+                                         ('appendListWords', 'files', ('c', 'd'))])
+        self.assertEqual(sorted(gramObj.lists['files']), ['a', 'b', 'c', 'd'])
+
+def run():
+    suite = unittest.makeSuite(UnittestGramlists, 'test')
+    unittest.TextTestRunner().run(suite)
+
+if __name__ == "__main__":
+    run()
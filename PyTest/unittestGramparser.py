@@ -0,0 +1,236 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# unittestGramparser.py
+#   Tests of the gramparser module which do not need NatSpeak.
+#
+#   packGrammar is compared byte for byte with the previous implementation
+#   (string concatenation, kept below as reference) over a corpus of grammars.
+#
+#   GramRegexScanner must give the same tokens and error positions as GramScanner.
+#
+# run directly with python, the MacroSystem/core folder is added to the path
+# if needed.  "python unittestGramparser.py benchmark" times both scanners.
+
+import sys, unittest, time
+import os, os.path
+from struct import pack
+
+try:
+    import gramparser
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '..', 'MacroSystem', 'core'))
+    import gramparser
+
+#---------------------------------------------------------------------------
+# reference implementation of the packing, as it was before the packing was
+# done in one preallocated buffer
+
+def refPackGrammar(parseObj):
+    output = ""
+    output = output + pack("LL", 0, 0)
+    if len(parseObj.exportRules):
+        output = output + refPackGrammarChunk(4, parseObj.exportRules)
+    if len(parseObj.importRules):
+        output = output + refPackGrammarChunk(5, parseObj.importRules)
+    if len(parseObj.knownLists):
+        output = output + refPackGrammarChunk(6, parseObj.knownLists)
+    if len(parseObj.knownWords):
+        output = output + refPackGrammarChunk(2, parseObj.knownWords)
+    if len(parseObj.ruleDefines):
+        output = output + refPackGrammarRules(3, parseObj.knownRules, parseObj.ruleDefines)
+    return output
+
+def refPackGrammarChunk(type,dict):
+    output = ""
+    totalLen = 0
+    for word in dict.keys():
+        paddedLen = ( len(word) + 4 ) & 0xFFFC
+        output = output + pack( "LL%ds" % paddedLen, paddedLen+8, dict[word], word )
+        totalLen = totalLen + paddedLen+8
+    return pack( "LL", type, totalLen ) + output
+
+def refPackGrammarRules(type,names,dict):
+    output = ""
+    totalLen = 0
+    elemType = { 'start':1, 'end':2, 'word':3, 'rule':4, 'list':6 }
+    for word in dict.keys():
+        ruleDef = ""
+        ruleLen = 0
+        for element in dict[word]:
+            ruleDef = ruleDef + pack( "HHL", elemType[element[0]], 0, element[1] )
+            ruleLen = ruleLen + 8
+        output = output + pack( "LL", ruleLen+8, names[word] ) + ruleDef
+        totalLen = totalLen + ruleLen+8
+    return pack( "LL", type, totalLen ) + output
+
+#---------------------------------------------------------------------------
+# corpus of grammars
+
+corpus = [
+    """<rule> exported = action;""",
+    """<start> exported = hello there;""",
+    """<dgndictation> imported;
+       <dgnletters> imported;
+       <start> exported = (spell <dgnletters> | say <dgndictation>) [please];""",
+    """<start> exported = <color>+ and <shape> [with {number}];
+       <color> = red | blue | green | yellow;
+       <shape> = circle | square | triangle;
+       <other> exported = "Word with spaces" {list_two} <color>;""",
+    """<a> exported = a [<b>] (<c> | <d>)+;
+       <b> = b1 | b2 [b3];
+       <c> = ((c1 c2) | [c3 c4]+)+;
+       <d> = {d} | <b>;""",
+    u"""<start> exported = caf\xe9 cr\xe8me br\xfbl\xe9e;""".encode('latin-1'),
+    ]
+
+def makeBigGrammar(nWords, nRules):
+    """generate a grammar with many words, rules and lists"""
+    lines = []
+    ruleNames = ['<r%s>'% i for i in range(nRules)]
+    lines.append('<start> exported = (%s)+;'% ' | '.join(ruleNames))
+    for i in range(nRules):
+        words = ['w%sx%s'% (i, j) for j in range(nWords/nRules)]
+        lines.append('<r%s> = %s [{list%s}] | (%s)+;'% (i, ' '.join(words[:5]), i,
+                                                      ' | '.join(words)))
+    return '\n'.join(lines)
+
+corpus.append(makeBigGrammar(200, 10))
+corpus.append(makeBigGrammar(5000, 50))
+
+# grammars with whitespace, comments and quoting, which should scan the same:
+scannerCorpus = [
+    """# comment line
+       <start> exported = 'single quoted' "double quoted"   # trailing comment
+       \t<other>\texported=a|b|c;""",
+    """<start> exported = "it's" 'say "hi"' {list} <rule>;#comment""",
+    """
+
+       <start>
+         exported =
+         word ;
+
+       # comment at the end
+    """,
+    ]
+
+# grammars with lexical or syntax errors:
+errorCorpus = [
+    """<start> exported = "not closed;""",
+    """<start> exported = 'not closed;""",
+    """<start exported = a;""",
+    """<start> exported = {list;""",
+    """<start> exported = a & b;""",
+    """<start> exported = a b c
+       <other> exported = d & e;""",
+    """<start> exported = a;\n<other> exported = \t\t"tab before";\n<last> = ;;""",
+    """<start> exported = (a | b;""",
+    """<start> exported = a; <start> = b; <x> imported = c;""",
+    ]
+
+def scanTokens(scannerClass, gramSpec):
+    """return the list of (token, value, line, start, char), plus the error if any"""
+    lines = [gramSpec]
+    gramparser.splitApartLines(lines)
+    scanObj = scannerClass(lines)
+    result = []
+    try:
+        while scanObj.token != '\0':
+            scanObj.getAnotherToken()
+            result.append( (scanObj.token, scanObj.value, scanObj.line, scanObj.start, scanObj.char) )
+    except gramparser.GrammarParserError, e:
+        result.append( (e.__class__.__name__, e.message, scanObj.line, scanObj.start, scanObj.char) )
+    return result
+
+def parseResult(scannerClass, gramSpec):
+    """return the parse results, or the error with the scanner position"""
+    lines = [gramSpec]
+    gramparser.splitApartLines(lines)
+    parser = gramparser.GramParser(lines, scannerClass=scannerClass)
+    try:
+        parser.doParse()
+        parser.checkForErrors()
+    except gramparser.GrammarParserError, e:
+        # (not str(e), which also dumps the error info to a file)
+        scanObj = e.scanObj
+        if scanObj.phase == 'scanning':
+            return (e.__class__.__name__, e.message, scanObj.phase,
+                    scanObj.line, scanObj.start, scanObj.char, scanObj.getError())
+        return e.__class__.__name__, e.message, scanObj.phase
+    return parser.knownRules, parser.knownWords, parser.knownLists, parser.ruleDefines
+
+def parseGrammar(gramSpec):
+    gramSpec = [gramSpec]
+    gramparser.splitApartLines(gramSpec)
+    parser = gramparser.GramParser(gramSpec)
+    parser.doParse()
+    parser.checkForErrors()
+    return parser
+
+class UnittestGramparser(unittest.TestCase):
+
+    def testPackGrammarIdentical(self):
+        """packGrammar must give the same binary as the reference implementation"""
+        for gramSpec in corpus:
+            parser = parseGrammar(gramSpec)
+            expected = refPackGrammar(parser)
+            got = gramparser.packGrammar(parser)
+            self.assertEqual(type(got), type(expected))
+            self.assertEqual(len(got), len(expected), 'length differs for grammar:\n%s'% gramSpec[:200])
+            self.assertEqual(got, expected, 'binary differs for grammar:\n%s'% gramSpec[:200])
+
+    def testPackGrammarChunkIdentical(self):
+        """packGrammarChunk is also used for the DictGramBase and SelectGramBase grammars"""
+        for wordDict in [{}, {'a':1}, {'through':1, 'until':2, 'select':3},
+                         dict([('word%s'% i, i) for i in range(1000)])]:
+            self.assertEqual(gramparser.packGrammarChunk(0x1017, wordDict),
+                             refPackGrammarChunk(0x1017, wordDict))
+
+    def testPackGrammarRulesIdentical(self):
+        for gramSpec in corpus:
+            parser = parseGrammar(gramSpec)
+            self.assertEqual(gramparser.packGrammarRules(3, parser.knownRules, parser.ruleDefines),
+                             refPackGrammarRules(3, parser.knownRules, parser.ruleDefines))
+
+    def testScannersSameTokens(self):
+        """GramRegexScanner must give the same tokens and positions as GramScanner"""
+        for gramSpec in corpus + scannerCorpus + errorCorpus:
+            self.assertEqual(scanTokens(gramparser.GramRegexScanner, gramSpec),
+                             scanTokens(gramparser.GramScanner, gramSpec),
+                             'tokens differ for grammar:\n%s'% gramSpec[:200])
+
+    def testScannersSameParse(self):
+        """parse results and error messages must be the same with both scanners"""
+        for gramSpec in corpus[:-1] + scannerCorpus + errorCorpus:
+            self.assertEqual(parseResult(gramparser.GramRegexScanner, gramSpec),
+                             parseResult(gramparser.GramScanner, gramSpec),
+                             'parse differs for grammar:\n%s'% gramSpec[:200])
+
+#---------------------------------------------------------------------------
+# benchmark of the scanners, parse time per KB of gramSpec
+
+def benchmark():
+    for nWords, nRules in [(1000, 10), (10000, 100), (50000, 200)]:
+        gramSpec = makeBigGrammar(nWords, nRules)
+        kb = len(gramSpec)/1024.0
+        print 'grammar of %s words, %s rules: %.1f KB'% (nWords, nRules, kb)
+        for scannerClass in gramparser.GramScanner, gramparser.GramRegexScanner:
+            lines = [gramSpec]
+            gramparser.splitApartLines(lines)
+            t0 = time.clock()
+            parser = gramparser.GramParser(lines, scannerClass=scannerClass)
+            parser.doParse()
+            parser.checkForErrors()
+            t1 = time.clock()
+            print '    %-16s: %7.2f ms per KB'% (scannerClass.__name__, (t1-t0)*1000/kb)
+
+def run():
+    suite = unittest.makeSuite(UnittestGramparser, 'test')
+    unittest.TextTestRunner().run(suite)
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['benchmark']:
+        benchmark()
+    else:
+        run()
@@ -0,0 +1,96 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# unittestResultsCallback.py
+#   Tests of GrammarBase.resultsCallback with fakenatlink standing in for
+#   natlink: the rule numbers are mapped to the rule names by the dispatch
+#   table built at load time, and the gotResults_<rule> functions are looked
+#   up at each recognition, so functions set or replaced after the load are
+#   called.
+#
+#   NatSpeak need not be running, but natlinkmain needs a configured NatLink
+#   (as for replayRecognitions.py), run directly with python.
+
+import sys, os, os.path
+import unittest
+
+thisDir = os.path.dirname(os.path.abspath(__file__))
+import fakenatlink
+fakenatlink.install()
+import natlink
+try:
+    import natlinkutils
+except ImportError:
+    sys.path.append(os.path.join(thisDir, '..', 'MacroSystem', 'core'))
+    import natlinkutils
+from natlinkutils import GrammarBase
+
+gramSpec = """
+    <a> exported = alpha <b>;
+    <b> = bravo | charlie;
+"""
+
+class TestGrammar(GrammarBase):
+
+    def initialize(self):
+        self.calls = []
+        self.load(gramSpec)
+        self.activateAll()
+
+    def gotResults_a(self, words, fullResults):
+        self.calls.append(('a', words))
+
+class UnittestResultsCallback(unittest.TestCase):
+
+    def setUp(self):
+        fakenatlink.reset()
+        self.grammar = TestGrammar()
+        self.grammar.initialize()
+
+    def tearDown(self):
+        self.grammar.unload()
+        if 'gotResults_b' in TestGrammar.__dict__:
+            del TestGrammar.gotResults_b
+        fakenatlink.reset()
+
+    def recognize(self, words):
+        """recognize words, [(word, rule name)]"""
+        numbers = {}
+        for number, ruleName in self.grammar.ruleDispatch.items():
+            numbers.setdefault(ruleName, number)
+        wordsAndNums = [(word, numbers[ruleName]) for word, ruleName in words]
+        fakenatlink.simulateResults(self.grammar.gramObj, wordsAndNums)
+
+    def testHandlersOfTheClass(self):
+        self.recognize([('alpha', 'a'), ('bravo', 'b')])
+        self.assertEqual([('a', ['alpha'])], self.grammar.calls)
+
+    def testHandlersReplacedAfterLoad(self):
+        calls = self.grammar.calls
+        self.grammar.gotResults_a = lambda words, fullResults: calls.append(('new a', words))
+        self.grammar.gotResults_b = lambda words, fullResults: calls.append(('new b', words))
+        self.recognize([('alpha', 'a'), ('charlie', 'b')])
+        self.assertEqual([('new a', ['alpha']), ('new b', ['charlie'])], calls)
+
+        del self.grammar.gotResults_a
+        del self.grammar.gotResults_b
+        del calls[:]
+        self.recognize([('alpha', 'a'), ('charlie', 'b')])
+        self.assertEqual([('a', ['alpha'])], calls)
+
+    def testHandlerAddedToTheClassAfterLoad(self):
+        def gotResults_b(self, words, fullResults):
+            self.calls.append(('class b', words))
+        TestGrammar.gotResults_b = gotResults_b
+        self.recognize([('alpha', 'a'), ('bravo', 'b')])
+        self.assertEqual([('a', ['alpha']), ('class b', ['bravo'])], self.grammar.calls)
+
+    def testEachHandlerGetsItsOwnWords(self):
+        def gotResults_a(words, fullResults):
+            words.append('changed')
+        self.grammar.gotResults_a = gotResults_a
+        self.recognize([('alpha', 'a'), ('bravo', 'b')])
+        self.assertEqual([(['alpha'], 'a'), (['bravo'], 'b')], self.grammar.seqsAndRules)
+
+if __name__ == "__main__":
+    unittest.main()
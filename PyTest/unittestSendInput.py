@@ -0,0 +1,122 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# unittestSendInput.py
+#   Tests of SendInput.send_input and its EventBuffers, with a stub for
+#   windll.user32.SendInput, so no input is sent.
+#
+#   The INPUT arrays must be byte for byte the same as those built by the
+#   previous implementation (an Input per event via to_input()).
+#
+#   Windows only (SendInput uses user32 for the scan codes); run directly
+#   with python, the MacroSystem/core folder is added to the path if needed.
+
+import sys, unittest
+import os, os.path
+import filecmp
+from ctypes import *
+
+thisDir = os.path.dirname(os.path.abspath(__file__))
+try:
+    import SendInput
+except ImportError:
+    sys.path.append(os.path.join(thisDir, '..', 'MacroSystem', 'core'))
+    import SendInput
+
+class StubSendInput(object):
+    """stand-in for windll.user32.SendInput, records the INPUT bytes of each call"""
+    def __init__(self, inserted=None):
+        self.calls = []
+        self.inserted = inserted   # number of events to report as inserted
+    def __call__(self, count, inputs, size):
+        self.calls.append(string_at(inputs.value, count*size))
+        if self.inserted is None:
+            return count
+        return self.inserted
+
+def refInputBytes(events):
+    """the INPUT array as send_input built it before"""
+    inputs = [e.to_input() for e in events]
+    array = (SendInput.Input * len(events))(*inputs)
+    return string_at(addressof(array), sizeof(array))
+
+def makeEvents(n):
+    events = []
+    for i in range(n):
+        events.append(SendInput.virtual_key_event(SendInput.VK_A + i%26, False))
+        events.append(SendInput.virtual_key_event(SendInput.VK_A + i%26, True))
+    events.append(SendInput.virtual_key_event(SendInput.GK_NUM_LEFT))
+    events.append(SendInput.mouse_button_event("left"))
+    events.append(SendInput.mouse_wheel_event(True, -2))
+    events.append(SendInput.mouse_move_event(10, 20, True))
+    events.append(SendInput.HardwareInput(1, 2, 3))
+    events.append(SendInput.Unicode_event(0x263A))
+    events.append(SendInput.virtual_key_event(SendInput.VK_RETURN).to_input())
+    return events
+
+class UnittestSendInput(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (SendInput.Win32SendInput, SendInput.Chunk_size)
+        self.stub = SendInput.Win32SendInput = StubSendInput()
+        SendInput.Event_buffer_cache.clear()
+
+    def tearDown(self):
+        SendInput.Win32SendInput, SendInput.Chunk_size = self.saved
+        SendInput.Event_buffer_cache.clear()
+
+    def testSameInputs(self):
+        """the INPUTs must be the same as before"""
+        for n in 0, 1, 10, 100:
+            events = makeEvents(n)
+            self.stub.calls = []
+            SendInput.send_input(events)
+            self.assertEqual(''.join(self.stub.calls), refInputBytes(events))
+
+    def testChunks(self):
+        SendInput.Chunk_size = 7
+        events = makeEvents(50)
+        SendInput.send_input(tuple(events))
+        self.assertEqual(len(self.stub.calls), (len(events)+6)/7)
+        size = sizeof(SendInput.Input)
+        self.assertEqual([len(c)/size for c in self.stub.calls[:-1]],
+                         [7]*(len(self.stub.calls)-1))
+        self.assertEqual(''.join(self.stub.calls), refInputBytes(events))
+
+    def testNothingToSend(self):
+        SendInput.send_input([])
+        self.assertEqual(self.stub.calls, [])
+
+    def testFailure(self):
+        SendInput.Win32SendInput = StubSendInput(inserted=0)
+        self.assertRaises(ValueError, SendInput.send_input, makeEvents(3))
+
+    def testCache(self):
+        """tuples are compiled once, lists each time"""
+        events = tuple(makeEvents(5))
+        buffer = SendInput.compile_events(events)
+        self.assert_(SendInput.compile_events(events) is buffer)
+        self.assert_(SendInput.compile_events(tuple(events)) is buffer)
+        self.assert_(SendInput.compile_events(list(events)) is not buffer)
+        SendInput.send_input(buffer)
+        SendInput.send_input(events)
+        self.assertEqual(self.stub.calls, [refInputBytes(events)]*2)
+
+    def testCacheBounded(self):
+        for i in range(SendInput.Event_buffer_cache_size + 10):
+            SendInput.compile_events(tuple(makeEvents(1)))
+        self.assertEqual(len(SendInput.Event_buffer_cache),
+                         SendInput.Event_buffer_cache_size)
+
+    def testCopiesIdentical(self):
+        """the Vocola extensions folder has a copy of SendInput.py"""
+        core = os.path.join(thisDir, '..', 'MacroSystem', 'core', 'SendInput.py')
+        extension = os.path.join(thisDir, '..', 'Vocola', 'extensions', 'SendInput.py')
+        self.assert_(filecmp.cmp(core, extension, shallow=False))
+
+def run():
+    suite = unittest.makeSuite(UnittestSendInput, 'test')
+    unittest.TextTestRunner().run(suite)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,58 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# unittestVocolaKeys.py
+#   vcl2py converts the key names of constant keys when converting a command
+#   file (Key_name_pattern in Vocola/exec/vcl2py/emit.py), the keys computed
+#   when a command is recognized are converted by VocolaUtils.convert_keys
+#   (key_name_pattern in MacroSystem/core/VocolaUtils.py).  The two patterns
+#   must stay the same, else precomputed keys would differ.
+#
+#   Uses fakenatlink, NatSpeak need not be running; run directly with python.
+
+import sys, os, os.path
+import unittest
+
+thisDir = os.path.dirname(os.path.abspath(__file__))
+import fakenatlink
+fakenatlink.install()
+try:
+    import VocolaUtils
+except ImportError:
+    sys.path.append(os.path.join(thisDir, '..', 'MacroSystem', 'core'))
+    import VocolaUtils
+sys.path.append(os.path.join(thisDir, '..', 'Vocola', 'exec'))
+import vcl2py.emit
+
+keys = ["{Left_3}", "{Ctrl+Shift+Tab 2}", "{a_1}", "{}_2}", "{Down_}",
+        "{Alt+f}s{Enter}", "{Home}{Shift+End_10}", "{\xe9_2}", "{Ctrl+\xc4_3}",
+        "{NumKey+_4}", "{x_3 }", "text {Tab_2} more {Esc}", "{Ctrl+c_02}"]
+
+class UnittestVocolaKeys(unittest.TestCase):
+
+    def tearDown(self):
+        VocolaUtils.Language = None
+        fakenatlink.reset()
+
+    def testSamePattern(self):
+        self.assertEqual(VocolaUtils.key_name_pattern.pattern,
+                         vcl2py.emit.Key_name_pattern.pattern)
+        self.assertEqual(VocolaUtils.key_name_pattern.flags,
+                         vcl2py.emit.Key_name_pattern.flags)
+
+    def testSameConversion(self):
+        for key in keys:
+            self.assertEqual(VocolaUtils.convert_key_names(key),
+                             vcl2py.emit.convert_key_names(key))
+
+    def testPlayConvertedKeys(self):
+        VocolaUtils.Language = 'enx'
+        for key in keys:
+            fakenatlink.reset()
+            VocolaUtils.do_flush(False, key)
+            VocolaUtils.play_converted_keys(vcl2py.emit.convert_key_names(key))
+            self.assertEqual(2, len(fakenatlink.played))
+            self.assertEqual(fakenatlink.played[0], fakenatlink.played[1])
+
+if __name__ == "__main__":
+    unittest.main()
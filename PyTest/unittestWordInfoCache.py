@@ -0,0 +1,121 @@
+#
+# Python Macro Language for Dragon NaturallySpeaking
+#
+# unittestWordInfoCache.py
+#   Tests of the word info cache of nsformat, with a fake vocabulary as word
+#   info provider and fakenatlink standing in for natlink, so NatSpeak need
+#   not be running (natlinkmain needs a configured NatLink, as for
+#   replayRecognitions.py).
+#
+#   Run directly with python, the MacroSystem/core folder is added to the
+#   path if needed.
+
+import sys, unittest
+import os, os.path
+
+thisDir = os.path.dirname(os.path.abspath(__file__))
+import fakenatlink
+fakenatlink.install()
+try:
+    import nsformat
+except ImportError:
+    sys.path.append(os.path.join(thisDir, '..', 'MacroSystem', 'core'))
+    import nsformat
+import natlinkmain
+
+class FakeVocabulary(object):
+    """word infos as natlink.getWordInfo returns them (numbers), counts lookups"""
+    def __init__(self, words):
+        self.words = dict(words)
+        self.lookups = []
+    def __call__(self, word):
+        self.lookups.append(word)
+        return self.words.get(word)
+
+def bits(*flags):
+    info = 0
+    for flag in flags:
+        info |= 1<<flag
+    return info
+
+vocabulary = {'hello': 0,
+              'world': 0,
+              '.\\period': bits(*nsformat.flags_like_period),
+              ',\\comma': bits(*nsformat.flags_like_comma),
+              '-\\hyphen': bits(*nsformat.flags_like_hyphen)}
+
+class UnittestWordInfoCache(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = nsformat.wordInfoCache, getattr(natlinkmain, 'userName', None)
+        natlinkmain.userName = 'testuser'
+        self.vocabulary = FakeVocabulary(vocabulary)
+        self.cache = nsformat.wordInfoCache = nsformat.WordInfoCache(self.vocabulary, maxSize=3)
+
+    def tearDown(self):
+        nsformat.wordInfoCache, natlinkmain.userName = self.saved
+
+    def testFrozenFlags(self):
+        flags = self.cache.getFlags('.\\period')
+        self.assert_(isinstance(flags, frozenset))
+        self.assertEqual(flags, set(nsformat.flags_like_period))
+        self.assertEqual(self.cache.getFlags('unknown'), frozenset())
+
+    def testHitsAndMisses(self):
+        for word in ['hello', 'world', 'hello', 'hello']:
+            self.cache.getFlags(word)
+        self.assertEqual(self.vocabulary.lookups, ['hello', 'world'])
+        stats = self.cache.getStats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (2, 2, 2))
+        self.assertEqual(stats['hitRate'], 0.5)
+
+    def testLeastRecentlyUsedDropped(self):
+        for word in ['hello', 'world', '.\\period', 'hello', ',\\comma']:
+            self.cache.getFlags(word)
+        self.assertEqual(list(self.cache.words), ['.\\period', 'hello', ',\\comma'])
+        self.cache.getFlags('world')
+        self.assertEqual(self.vocabulary.lookups[-1], 'world')
+
+    def testNotCached(self):
+        self.cache.maxSize = 0
+        self.cache.getFlags('hello')
+        self.cache.getFlags('hello')
+        self.assertEqual(self.vocabulary.lookups, ['hello', 'hello'])
+        self.assertEqual(len(self.cache.words), 0)
+
+    def testInvalidate(self):
+        self.cache.getFlags('hello')
+        self.cache.getFlags('world')
+        self.vocabulary.words['hello'] = bits(nsformat.flag_no_space_before)
+        nsformat.invalidateWordInfo('hello')
+        self.assertEqual(self.cache.getFlags('hello'), set([nsformat.flag_no_space_before]))
+        self.assertEqual(self.vocabulary.lookups, ['hello', 'world', 'hello'])
+        nsformat.invalidateWordInfo()
+        self.assertEqual(len(self.cache.words), 0)
+        self.assertEqual(self.cache.getStats()['invalidations'], 2)
+
+    def testUserChange(self):
+        nsformat.formatWords(['hello', 'world'])
+        nsformat.formatWords(['hello', 'world'])
+        self.assertEqual(len(self.vocabulary.lookups), 2)
+        natlinkmain.userName = 'otheruser'
+        nsformat.formatWords(['hello', 'world'])
+        self.assertEqual(len(self.vocabulary.lookups), 4)
+
+    def testFormatWords(self):
+        """the result must be the same with and without the cache"""
+        words = ['hello', ',\\comma', 'world', '-\\hyphen', 'hello', '.\\period',
+                 'hello', 'world', '.\\period']
+        for maxSize in 0, 3, 100:
+            self.cache.maxSize = maxSize
+            self.cache.invalidate()
+            text, state = nsformat.formatWords(words)
+            self.assertEqual(text, 'Hello, world-hello.  Hello world.')
+            self.assertEqual(state, set(nsformat.flags_like_period) - set([21, 17]))
+
+def run():
+    suite = unittest.makeSuite(UnittestWordInfoCache, 'test')
+    unittest.TextTestRunner().run(suite)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,81 @@
+# benchmark_ast_cache:  Time converting a folder of .vcl files with -f
+#                       without, then with the persistent cache of parsed
+#                       statements (vcl2py.astcache)
+#
+# Usage: python benchmark_ast_cache.py [<number of .vcl files>]
+#
+# Uses the files of benchmark_includes; the first conversion with the cache
+# fills it, the second one only emits.  Then the files are edited and
+# converted without -f, without and with the cache (which saves no entries
+# for edited files).  Checks the outputs and the log are the same each time.
+#
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import vcl2py.main as main
+import vcl2py.astcache as astcache
+from benchmark_includes import write_includes, write_files
+
+def convert(folder, out_folder, cache_size, force=True):
+    start = time.clock()
+    diagnostics, log, rebuilt = main.compile(folder, out_folder,
+                                             {"force": force,
+                                              "ignore_INI_file": True,
+                                              "ast_cache_size": cache_size})
+    elapsed = time.clock() - start
+    outputs = {}
+    for name in os.listdir(out_folder):
+        if name.endswith(".py"):
+            text = open(os.path.join(out_folder, name)).read()
+            outputs[name] = re.sub(r"Generated by .*", "", text)
+    return elapsed, outputs, log
+
+  # changes the text of the .vcl files, which are then newer than the outputs
+def edit_files(folder, edit):
+    later = time.time() + 10 + edit
+    for name in os.listdir(folder):
+        if name.endswith(".vcl"):
+            path = os.path.join(folder, name)
+            open(path, "a").write("# edit %d\n" % edit)
+            os.utime(path, (later, later))
+
+def main_routine():
+    count = 80
+    if len(sys.argv) > 1: count = int(sys.argv[1])
+    folder     = tempfile.mkdtemp()
+    out_folder = tempfile.mkdtemp()
+    try:
+        write_includes(folder)
+        write_files(folder, count)
+        size = main.Default_ast_cache_size
+        results = [convert(folder, out_folder, 0),
+                   convert(folder, out_folder, size),
+                   convert(folder, out_folder, size)]
+        saved = astcache.Ast_cache_stats["SAVED"]
+        edit_files(folder, 1)
+        results.append(convert(folder, out_folder, 0, False))
+        edit_files(folder, 2)
+        results.append(convert(folder, out_folder, size, False))
+        for elapsed, outputs, log in results[1:]:
+            if outputs != results[0][1] or log != results[0][2]:
+                print "DIFFERENT outputs"
+                sys.exit(1)
+        print "same outputs for %d files" % len(results[0][1])
+        print "without the cache:      %.2f seconds" % results[0][0]
+        print "filling the cache:      %.2f seconds" % results[1][0]
+        print "from the cache:         %.2f seconds" % results[2][0]
+        print "edited, without cache:  %.2f seconds" % results[3][0]
+        print "edited, with the cache: %.2f seconds (%d entries saved)" % \
+              (results[4][0], astcache.Ast_cache_stats["SAVED"] - saved)
+        print "cache: %s" % astcache.Ast_cache_stats
+    finally:
+        shutil.rmtree(folder)
+        shutil.rmtree(out_folder)
+
+if __name__ == "__main__":
+    main_routine()
@@ -0,0 +1,125 @@
+# benchmark_contexts:  Compare the window title matching generated by vcl2py
+#                      (one combined pattern, see emit.build_context_matcher)
+#                      with the previous string.find per context string
+#
+# Usage: python benchmark_contexts.py [<number of contexts>]
+#
+# Generates contexts with overlapping strings, checks both methods activate
+# the same rules for a set of titles, times them, and runs vcl2py on a
+# generated .vcl file with these contexts.
+#
+
+import os
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+from vcl2py.emit import build_context_matcher
+
+Words = ["edit", "file", "message", "mail", "project", "notes", "shell",
+         "compile", "view", "print", "preview", "contact", "calendar", "doc"]
+Extensions = [".py", ".pl", ".pm", ".h", ".htm", ".html", ".cpp", ".vcl", ".txt"]
+
+def make_contexts(count, rng):
+    contexts = []
+    for i in range(count):
+        strings = []
+        for j in range(rng.randint(1, 3)):
+            if rng.random() < 0.3:
+                strings.append(rng.choice(Extensions))
+            else:
+                strings.append(" ".join(rng.sample(Words, rng.randint(1, 2))) +
+                               str(rng.randint(0, count)))
+        contexts.append({"STRINGS": strings,
+                         "RULENAMES": ["sequence_set" + str(i+2)]})
+    return contexts
+
+def make_titles(contexts, count, rng):
+    all_strings = [s for context in contexts for s in context["STRINGS"]]
+    titles = []
+    for i in range(count):
+        parts = [rng.choice(Words) for k in range(rng.randint(2, 6))]
+        for k in range(rng.randint(0, 3)):
+            parts.insert(rng.randint(0, len(parts)), rng.choice(all_strings))
+        titles.append(string.lower(" - ".join(parts)))
+    return titles
+
+def old_matching(contexts, title):
+    # as generated before: one string.find per context string
+    result = {}
+    for context in contexts:
+        status = False
+        for target in context["STRINGS"]:
+            if string.find(title, target) >= 0:
+                status = True
+                break
+        result[context["RULENAMES"][0]] = status
+    return result
+
+def new_matching(contexts, compiled, context_rules, always, title):
+    # as generated now: one pass over the title
+    matched = {}
+    for target in compiled.findall(title):
+        for rule in context_rules[target]: matched[rule] = True
+    result = {}
+    for context in contexts:
+        name = context["RULENAMES"][0]
+        result[name] = (name in always) or (name in matched)
+    return result
+
+def write_vcl(contexts, path):
+    out = open(path, "w")
+    for context in contexts:
+        out.write(" | ".join(context["STRINGS"]) + ":\n")
+        out.write("    command " + context["RULENAMES"][0][len("sequence_set"):] +
+                  " = {Enter};\n")
+    out.close()
+
+def main():
+    import re
+    count = 150
+    if len(sys.argv) > 1: count = int(sys.argv[1])
+    rng = random.Random(1)
+    contexts = make_contexts(count, rng)
+    titles = make_titles(contexts, 2000, rng)
+
+    pattern, context_rules, always = build_context_matcher(contexts)
+    compiled = re.compile(pattern)
+    for title in titles:
+        if old_matching(contexts, title) != \
+               new_matching(contexts, compiled, context_rules, always, title):
+            print "DIFFERENT results for title: " + repr(title)
+            sys.exit(1)
+    print "same results for %d contexts and %d titles" % (count, len(titles))
+
+    start = time.clock()
+    for title in titles: old_matching(contexts, title)
+    old_time = time.clock() - start
+    start = time.clock()
+    for title in titles:
+        new_matching(contexts, compiled, context_rules, always, title)
+    new_time = time.clock() - start
+    print "string.find per string: %.1f microseconds per title" % \
+          (old_time * 1e6 / len(titles))
+    print "combined pattern:       %.1f microseconds per title" % \
+          (new_time * 1e6 / len(titles))
+
+    # the generated file must compile:
+    folder = tempfile.mkdtemp()
+    try:
+        write_vcl(contexts, os.path.join(folder, "some_app_name.vcl"))
+        vcl2py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vcl2py.py")
+        subprocess.call([sys.executable, vcl2py, "-f", "-q", "-log_stdout",
+                         os.path.join(folder, "some_app_name.vcl"), folder])
+        output = os.path.join(folder, "some_app_name_vcl.py")
+        compile(open(output).read(), output, "exec")
+        print "generated %s compiles" % os.path.basename(output)
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == "__main__":
+    main()
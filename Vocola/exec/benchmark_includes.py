@@ -0,0 +1,87 @@
+# benchmark_includes:  Time converting many .vcl files which include the same
+#                      large include files, with and without the cache of
+#                      parsed include files (vcl2py.parse.Include_cache)
+#
+# Usage: python benchmark_includes.py [<number of .vcl files>]
+#
+# Generates a folder of .vcl files each including the same 3 include files,
+# converts them with vcl2py.main.compile with and without the cache, and
+# checks the outputs and the log are the same.
+#
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import vcl2py.main as main
+import vcl2py.parse as parse
+
+def write_includes(folder):
+    out = open(os.path.join(folder, "keys.vch"), "w")
+    out.write("<n> := 1..99;\n")
+    for i in range(300):
+        out.write("key%d <n> = {ctrl+%d_$1};\n" % (i, i % 10))
+    out.close()
+
+    out = open(os.path.join(folder, "string.vch"), "w")
+    for i in range(100):
+        out.write("Function%d(a, b) := $a Wait(%d) $b;\n" % (i, i))
+        out.write("<list%d> := (one | two | three | four | five%d);\n" % (i, i))
+    out.close()
+
+    out = open(os.path.join(folder, "Unimacro.vch"), "w")
+    for i in range(300):
+        out.write("unimacro %d <list%d> = Function%d($1, {tab});\n" %
+                  (i, i % 100, i % 100))
+    out.close()
+
+def write_files(folder, count):
+    for i in range(count):
+        out = open(os.path.join(folder, "app%d.vcl" % i), "w")
+        out.write("include keys.vch;\ninclude string.vch;\n"
+                  "include Unimacro.vch;\n")
+        out.write("app%d: command <n> = {Enter_$1};\n" % i)
+        out.close()
+
+def convert(folder, cache):
+    parse.Cache_includes = cache
+    out_folder = tempfile.mkdtemp()
+    try:
+        start = time.clock()
+        diagnostics, log, rebuilt = main.compile(folder, out_folder,
+                                                 {"force": True,
+                                                  "ignore_INI_file": True})
+        elapsed = time.clock() - start
+        outputs = {}
+        for name in os.listdir(out_folder):
+            if name.endswith(".py"):
+                text = open(os.path.join(out_folder, name)).read()
+                outputs[name] = re.sub(r"Generated by .*", "", text)
+        return elapsed, outputs, log
+    finally:
+        shutil.rmtree(out_folder)
+
+def main_routine():
+    count = 80
+    if len(sys.argv) > 1: count = int(sys.argv[1])
+    folder = tempfile.mkdtemp()
+    try:
+        write_includes(folder)
+        write_files(folder, count)
+        old_time, old_outputs, old_log = convert(folder, False)
+        new_time, new_outputs, new_log = convert(folder, True)
+        if old_outputs != new_outputs or old_log != new_log:
+            print "DIFFERENT outputs"
+            sys.exit(1)
+        print "same outputs for %d files" % len(new_outputs)
+        print "parsing each include:   %.2f seconds" % old_time
+        print "cached includes:        %.2f seconds" % new_time
+        print "cache: %s" % parse.Include_cache_stats
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == "__main__":
+    main_routine()
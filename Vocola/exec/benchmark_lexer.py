@@ -0,0 +1,121 @@
+# benchmark_lexer:  Compare the vcl2py tokenizer (vcl2py.lex.Lexer, tokens in
+#                   parallel arrays, line numbers by binary search) with the
+#                   previous one (a list per token, line numbers by counting
+#                   the newlines from the start of the text)
+#
+# Usage: python benchmark_lexer.py [<number of commands>]
+#
+# Generates a large .vcl text, checks both tokenizers give the same tokens,
+# and times tokenizing, the size of the tokens, and converting positions to
+# line numbers (as each error message and command does).
+#
+
+import random
+import sys
+import time
+
+import vcl2py.lex as lex
+from vcl2py.lex import initialize_token_properties, Lexer
+
+def old_tokenize(text):
+    # as before: [[kind, token text, offset in text of token start]*]
+    properties               = lex.Token_properties
+    token_bare_properties    = properties["b"]
+    token_context_properties = properties[":"]
+    pseudo                   = lex.Pseudo
+
+    tokens          = []
+    start           = 0
+    statement_start = 0
+    while True:
+        match = pseudo.match(text, start)
+        if not match:
+            tokens.append([properties["EOF"], "", len(text)])
+            return tokens
+
+        start = match.end(0)
+        token = match.group(1)
+        kind  = properties.get(token[-2:], token_bare_properties)
+        tokens.append([kind, token, match.start(1)])
+
+        if token == ";":
+            statement_start = len(tokens)
+        elif kind == token_context_properties:
+            beginning = tokens[statement_start][2]
+            token     = text[beginning:start]
+            tokens[statement_start:] = [[kind, token, beginning]]
+            statement_start = len(tokens)
+
+def old_line_number(text, text_offset):
+    # as before for a position not in the text being parsed
+    return text[:text_offset].count("\n") + 1
+
+def make_text(count, rng):
+    lines = []
+    for i in range(count):
+        if i % 50 == 0:
+            lines.append("notepad | edit %d: # context %d" % (i, i))
+        if i % 7 == 0:
+            lines.append("# a comment about command %d" % i)
+        lines.append("command %d (one | two | three) [more] = "
+                     "{ctrl+%d} 'can''t' \"%d\" Repeat(2, {tab});"
+                     % (i, rng.randint(0, 9), i))
+    return "\n".join(lines) + "\n"
+
+def old_size(tokens):
+    size = sys.getsizeof(tokens)
+    for token in tokens:
+        size += sys.getsizeof(token) + sys.getsizeof(token[1])
+    return size
+
+def new_size(lexer):
+    size = 0
+    for column in lexer.kinds, lexer.starts, lexer.ends, lexer.line_starts:
+        size += column.buffer_info()[1] * column.itemsize
+    return size
+
+def main():
+    count = 20000
+    if len(sys.argv) > 1: count = int(sys.argv[1])
+    rng = random.Random(1)
+    initialize_token_properties()
+    text = make_text(count, rng)
+
+    tokens = old_tokenize(text)
+    lexer  = Lexer(text)
+    if tokens != [[lexer.kinds[i], lexer.token_text(i), lexer.starts[i]]
+                  for i in xrange(len(lexer.kinds))]:
+        print "DIFFERENT tokens"
+        sys.exit(1)
+    print "same %d tokens for %d lines (%d bytes)" % \
+          (len(tokens), text.count("\n"), len(text))
+
+    start = time.clock()
+    old_tokenize(text)
+    old_time = time.clock() - start
+    start = time.clock()
+    Lexer(text)
+    new_time = time.clock() - start
+    print "tokenizing, list per token:    %8.1f ms, %8d bytes of tokens" % \
+          (old_time * 1e3, old_size(tokens))
+    print "tokenizing, parallel arrays:   %8.1f ms, %8d bytes of tokens" % \
+          (new_time * 1e3, new_size(lexer))
+
+    offsets = [rng.choice(lexer.starts) for i in range(200)]
+    for offset in offsets:
+        if old_line_number(text, offset) != lexer.get_line_number(offset):
+            print "DIFFERENT line number for offset %d" % offset
+            sys.exit(1)
+    start = time.clock()
+    for offset in offsets: old_line_number(text, offset)
+    old_time = time.clock() - start
+    start = time.clock()
+    for offset in offsets: lexer.get_line_number(offset)
+    new_time = time.clock() - start
+    print "line number, counting:         %8.1f microseconds per position" % \
+          (old_time * 1e6 / len(offsets))
+    print "line number, binary search:    %8.1f microseconds per position" % \
+          (new_time * 1e6 / len(offsets))
+
+if __name__ == "__main__":
+    main()
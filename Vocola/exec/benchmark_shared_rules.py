@@ -0,0 +1,110 @@
+# benchmark_shared_rules:  Compare the size of the grammars of converted files
+#                          with and without shared rule bodies
+#                          (-no_shared_rules)
+#
+# Usage: python benchmark_shared_rules.py [<number of .vcl files>]
+#
+# Generates a folder of .vcl files including include files which each define
+# their own variable for the same number range and have commands of the form
+# "<verb> <n> <unit>", converts it both ways, checks the Python code after the
+# grammars is the same, and parses and packs the grammars with the NatLink
+# grammar parser (MacroSystem/core/gramparser.py) as loading them does.
+#
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import vcl2py.main as main
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "..", "MacroSystem", "core"))
+import gramparser
+
+Units = ["Words", "Lines", "Characters", "Paragraphs", "Items", "Pages"]
+Verbs = ["Kill", "Copy", "Select", "Delete", "Move", "Mark", "Cut", "Yank"]
+
+def write_includes(folder):
+    for name in ["edit", "move", "select"]:
+        out = open(os.path.join(folder, name + ".vch"), "w")
+        out.write("<%s_count> := 1..100;\n" % name)
+        out.write("<%s_direction> := (Left | Right | Up | Down | Back | "
+                  "Forward);\n" % name)
+        for verb in Verbs:
+            for unit in Units:
+                out.write("%s %s <%s_count> %s = {%s_$1};\n" %
+                          (name, verb, name, unit, verb.lower()))
+                out.write("%s %s <%s_count> <%s_direction> %s = "
+                          "{%s_$1} {$2};\n" %
+                          (name, verb, name, name, unit, verb.lower()))
+        out.close()
+
+def write_files(folder, count):
+    for i in range(count):
+        out = open(os.path.join(folder, "app%d.vcl" % i), "w")
+        out.write("include edit.vch;\ninclude move.vch;\n"
+                  "include select.vch;\n")
+        out.write("app%d: command <edit_count> = {Enter_$1};\n" % i)
+        out.close()
+
+def convert(folder, share_rules):
+    out_folder = tempfile.mkdtemp()
+    try:
+        diagnostics, log, rebuilt = main.compile(folder, out_folder,
+                                                 {"force": True,
+                                                  "ignore_INI_file": True,
+                                                  "ast_cache_size": 0,
+                                                  "share_rules": share_rules})
+        grammars = {}
+        code     = {}
+        for name in os.listdir(out_folder):
+            if name.endswith(".py"):
+                text = open(os.path.join(out_folder, name)).read()
+                text = re.sub(r"Generated by .*", "", text)
+                start = text.index('gramSpec = """') + len('gramSpec = """')
+                end   = text.index('"""', start)
+                grammars[name] = text[start:end]
+                code[name]     = text[end:]
+        return grammars, code, log
+    finally:
+        shutil.rmtree(out_folder)
+
+def load(grammars):
+    size  = 0
+    start = time.clock()
+    for name, grammar in grammars.items():
+        lines = [grammar]
+        gramparser.splitApartLines(lines)
+        parser = gramparser.GramParser(lines, grammarName=name)
+        parser.doParse()
+        parser.checkForErrors()
+        size += len(gramparser.packGrammar(parser))
+    return size, time.clock() - start
+
+def main_routine():
+    count = 20
+    if len(sys.argv) > 1: count = int(sys.argv[1])
+    folder = tempfile.mkdtemp()
+    try:
+        write_includes(folder)
+        write_files(folder, count)
+        old_grammars, old_code, old_log = convert(folder, False)
+        new_grammars, new_code, new_log = convert(folder, True)
+        if old_code != new_code or old_log != new_log:
+            print "DIFFERENT outputs"
+            sys.exit(1)
+        print "same actions for %d files" % len(new_code)
+        for label, grammars in [["separate rule bodies:", old_grammars],
+                                ["shared rule bodies:  ", new_grammars]]:
+            text_size = sum([len(grammar) for grammar in grammars.values()])
+            binary_size, elapsed = load(grammars)
+            print "%s %8d bytes of gramSpec, %8d bytes packed, " \
+                  "%.2f seconds to parse and pack" % \
+                  (label, text_size, binary_size, elapsed)
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == "__main__":
+    main_routine()
@@ -3,7 +3,10 @@
 #
 # Usage: python vcl2py.py [<option>...] <inputFileOrFolder> <outputFolder>
 # Where <option> can be:
-#   -debug <n>             -- specify debugging level 
+#   -ast_cache_size <KB>   -- maximum size of the cache of parsed files in the
+#                             output folder (default 16384, 0 = no cache);
+#                             filled by -f and rebuilds, not by edited files
+#   -debug <n>             -- specify debugging level
 #                               (0 = no info, 1 = show statements, 
 #                                2 = detailed info)
 #   -extensions <filename> -- specify filename containing extension interface 
@@ -13,6 +16,10 @@
 #   -log_file <filename>   -- specify filename to log to
 #   -log_stdout            -- log to standard out instead of a file
 #   -max_commands <n>      -- specify maximum number of commands per utterance
+#   -no_shared_rules       -- emit the full body of each rule instead of
+#                             referring to an earlier rule with the same body
+#   -parallel <n>          -- convert files using <n> processes (0 = one per
+#                             CPU); only used when several files are out of date
 #   -numbers <s0>,<s1>,<s2>,...
 #                          -- use spoken form <s0> instead of "0" in ranges,
 #                             <s1> instead of "1" in ranges, etc.
@@ -120,6 +127,8 @@ from vcl2py.main import main_routine
 # ---------------------------------------------------------------------------
 # Okay, let's run!
 
-main_routine();
+# (the guard is needed for the worker processes of -parallel on Windows)
+if __name__ == "__main__":
+    main_routine();
 #import profile
 #profile.run('main_routine()')
@@ -0,0 +1,5 @@
+#
+# In-process interface, see main.compile
+#
+
+from vcl2py.main import compile
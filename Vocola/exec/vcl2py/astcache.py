@@ -0,0 +1,181 @@
+#
+# Persistent cache of parsed and transformed statements, across runs
+#
+# Converting a .vcl file that was converted before with the same text,
+# include files, extensions, and version of vcl2py (e.g., with -f, or
+# when the output files are rebuilt for a new user) only needs the
+# emitting: the statements after transform are saved in a cache folder
+# in the output folder and loaded instead of parsing the file again.
+#
+# Each entry is a file named by its key, a hash of the compiler version,
+# the canonical path of the input file, the text of the .vcl file, and
+# the extensions:
+#
+#   [[[included file path, hash of its text]*], environment, payload]
+#
+# zlib compressed cPickle'd, where environment maps the environment
+# variables the include directives refer to to their values; the entry
+# is only used if these files and variables are unchanged.  The payload
+# is whatever convert_file saves; the lexers its positions refer to are
+# loaded as None (positions are only used for error messages, which cached
+# files have none).  The included files are hashed once per run (see
+# clear_hash_cache).
+#
+# Only conversions without any errors or warnings are saved.  The
+# entries of older texts of a .vcl file remain until trim_ast_cache
+# removes the least recently used entries to bring the size of the cache
+# below its maximum.
+#
+
+import os
+import sys
+import zlib
+import cPickle
+import hashlib
+from cStringIO import StringIO
+
+from vcl2py.lex import Lexer
+from vcl2py.log import *
+
+
+Ast_cache_folder = "vcl2py_ast_cache"
+Entry_suffix     = ".ast"
+
+  # changed whenever the payload or the parse trees change:
+Cache_format = "2"
+
+Ast_cache_stats = {"HITS": 0, "MISSES": 0, "SAVED": 0, "EVICTED": 0,
+                   "SIZE": 0}
+
+
+def get_cache_folder(out_folder):
+    return os.path.join(out_folder, Ast_cache_folder)
+
+  # input_path is the canonical path of the input file
+def ast_cache_key(compiler_version, input_path, text, extension_functions):
+    key = hashlib.sha1()
+    for part in [Cache_format, compiler_version, sys.version,
+                 input_path, repr(sorted(extension_functions.items()))]:
+        key.update(part)
+        key.update("\0")
+    key.update(text)
+    return key.hexdigest()
+
+  # maps the paths hashed during this run to their hashes:
+File_hashes = {}
+
+def clear_hash_cache():
+    global File_hashes
+    File_hashes = {}
+
+def hash_file(path):
+    global File_hashes
+    if path in File_hashes: return File_hashes[path]
+    try:
+        hash = hashlib.sha1(open(path, "rb").read()).hexdigest()
+    except (IOError, OSError):
+        hash = None
+    File_hashes[path] = hash
+    return hash
+
+
+  # returns the payload of entry key, or None
+def load_ast(cache_folder, key):
+    global Ast_cache_stats
+    path = os.path.join(cache_folder, key + Entry_suffix)
+    try:
+        data = zlib.decompress(open(path, "rb").read())
+        unpickler = cPickle.Unpickler(StringIO(data))
+        unpickler.persistent_load = lambda id: None
+        hashes, environment, payload = unpickler.load()
+    except (IOError, OSError):
+        Ast_cache_stats["MISSES"] += 1
+        return None
+    except Exception, e:    # damaged entry
+        remove_entry(path)
+        Ast_cache_stats["MISSES"] += 1
+        return None
+
+    for included, hash in hashes:
+        if hash_file(included) != hash:
+            Ast_cache_stats["MISSES"] += 1
+            return None
+    for variable, value in environment.items():
+        if os.environ.get(variable) != value:
+            Ast_cache_stats["MISSES"] += 1
+            return None
+
+    Ast_cache_stats["HITS"] += 1
+    try:
+        os.utime(path, None)    # for trim_ast_cache
+    except OSError:
+        pass
+    return payload
+
+  # included lists the canonical paths of the files included
+def save_ast(cache_folder, key, included, environment, payload):
+    global Ast_cache_stats
+    hashes = [[path, hash_file(path)] for path in included]
+
+    buffer = StringIO()
+    pickler = cPickle.Pickler(buffer, 2)
+    # positions refer to the lexer of their text, which is not saved
+    # (unlike persistent_id, inst_persistent_id is not called for lists,
+    # dictionaries, strings, and numbers):
+    pickler.inst_persistent_id = lambda object: \
+        isinstance(object, Lexer) and "lexer" or None
+    pickler.dump([hashes, environment, payload])
+    data = zlib.compress(buffer.getvalue(), 1)
+
+    path = os.path.join(cache_folder, key + Entry_suffix)
+    try:
+        if not os.path.isdir(cache_folder): os.makedirs(cache_folder)
+        output = open(path + ".tmp", "wb")
+        output.write(data)
+        output.close()
+        # (rename does not replace an existing file on Windows)
+        if os.path.exists(path): os.remove(path)
+        os.rename(path + ".tmp", path)
+        Ast_cache_stats["SAVED"] += 1
+    except (IOError, OSError), e:
+        print_log("  Warning: unable to write AST cache entry '" + path +
+                  "': " + str(e))
+
+def remove_entry(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+  # removes the least recently used entries until the entries take at
+  # most maximum_size bytes; returns their size
+def trim_ast_cache(cache_folder, maximum_size):
+    global Ast_cache_stats
+    entries = []
+    size    = 0
+    try:
+        names = os.listdir(cache_folder)
+    except OSError:
+        names = []
+    for name in names:
+        path = os.path.join(cache_folder, name)
+        try:
+            if name.endswith(Entry_suffix):
+                entry_size = os.path.getsize(path)
+                entries.append([os.path.getmtime(path), entry_size, path])
+                size += entry_size
+            elif name.endswith(Entry_suffix + ".tmp"):
+                remove_entry(path)    # left by an interrupted save_ast
+        except OSError:
+            pass
+
+    entries.sort()
+    while size > maximum_size and len(entries) > 0:
+        time, entry_size, path = entries.pop(0)
+        remove_entry(path)
+        size -= entry_size
+        Ast_cache_stats["EVICTED"] += 1
+
+    Ast_cache_stats["SIZE"] = size
+    return size
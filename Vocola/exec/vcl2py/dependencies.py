@@ -0,0 +1,79 @@
+#
+# Dependencies of the output files, for incremental rebuilds
+#
+# For each output file, the dependencies file in the output folder lists
+# the files its conversion read -- the .vcl file, the files it included and
+# the extensions file if it calls extensions -- with their modification
+# times at the time of the conversion.  The output file must be rebuilt
+# when one of them is changed or removed, even if the .vcl file itself is
+# older than the output file.
+#
+# The dependencies file has one line per dependency:
+#   <output file name> TAB <modification time> TAB <canonical path>
+#
+
+import os
+
+from vcl2py.log import *
+
+
+Dependencies_file = "vcl2py_dependencies.txt"
+
+
+def load_dependencies(out_folder):  # -> {output file name: [[path, time]*]}
+    dependencies = {}
+    try:
+        input = open(os.path.join(out_folder, Dependencies_file))
+        for line in input:
+            fields = line.rstrip("\r\n").split("\t", 2)
+            if len(fields) != 3: continue
+            out_name, time, path = fields
+            try:
+                time = float(time)
+            except ValueError:
+                continue
+            dependencies.setdefault(out_name, []).append([path, time])
+        input.close()
+    except IOError:
+        pass
+    return dependencies
+
+  # records of output files which no longer exist are dropped
+def save_dependencies(out_folder, dependencies):
+    path = os.path.join(out_folder, Dependencies_file)
+    try:
+        output = open(path + ".tmp", "w")
+        for out_name in sorted(dependencies.keys()):
+            if not os.path.exists(os.path.join(out_folder, out_name)):
+                continue
+            for dependency, time in dependencies[out_name]:
+                output.write(out_name + "\t" + repr(time) + "\t" +
+                             dependency + "\n")
+        output.close()
+        # (rename does not replace an existing file on Windows)
+        if os.path.exists(path): os.remove(path)
+        os.rename(path + ".tmp", path)
+    except (IOError, OSError), e:
+        print_log("  Warning: unable to write dependencies file '" + path +
+                  "': " + str(e))
+
+
+def make_record(paths):  # -> [[path, time]*]
+    record = []
+    for path in paths:
+        record.append([path, get_time(path)])
+    return record
+
+  # returns the first dependency in record which was changed or removed
+  # since the record was made, or None
+def changed_dependency(record):
+    for path, time in record:
+        if get_time(path) != time:
+            return path
+    return None
+
+def get_time(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0    # removed
@@ -1,8 +1,13 @@
 import re
+from cStringIO import StringIO
 from vcl2py.ast import *
 
 log_error = None   # temporary kludge
 
+  # whether actions only using text known now are worked out here (see
+  # emit_flush) instead of when the command is recognized:
+Precompute_actions = True
+
 def output(out_file, statements,
            _VocolaVersion,
            _Should_emit_dictation_support,
@@ -10,14 +15,16 @@ def output(out_file, statements,
            _Number_words,
            _Definitions,
            _Maximum_commands,
-           _Extension_functions
+           _Extension_functions,
+           _Share_rules=True
            ):
     global NestedCallLevel
     global VocolaVersion, Should_emit_dictation_support
     global Module_name, Number_words, Definitions, Maximum_commands
-    global Extension_functions
+    global Extension_functions, Share_rules, Rule_bodies
 
     NestedCallLevel               = 0
+    Rule_bodies                   = {}
 
     VocolaVersion = _VocolaVersion
     Should_emit_dictation_support = _Should_emit_dictation_support
@@ -26,6 +33,7 @@ def output(out_file, statements,
     Definitions = _Definitions
     Maximum_commands = _Maximum_commands
     Extension_functions = _Extension_functions
+    Share_rules = _Share_rules
 
     emit_output(out_file, statements)
 
@@ -133,6 +141,16 @@ def emit_context_activations(contexts):
 
     emit_file_middle2()
 
+    # All context strings are matched in one pass over the title, see
+    # build_context_matcher
+    pattern, context_rules, always = build_context_matcher(contexts)
+    if pattern:
+        emit(1, "context_pattern = re.compile(" + repr(pattern) + ")\n")
+        emit(1, "context_rules = {\n")
+        for target in sorted(context_rules.keys()):
+            emit(2, repr(target) + ": " + repr(context_rules[target]) + ",\n")
+        emit(2, "}\n")
+
     emit(0, "\n    def gotBegin(self,moduleInfo):\n")
     emit(2, "self.firstWord = 0\n")
     if module_is_global:
@@ -140,13 +158,20 @@ def emit_context_activations(contexts):
     else:
         emit(2, "# Return if wrong application\n")
         executable = app
-        emit(2, "window = matchWindow(moduleInfo,'" + executable + "','')\n")
+        executables = [executable]
         while executable.find("_") != -1:
             match = re.match(r'^(.+?)_+[^_]*$', executable)
             if not match: break
             executable = match.group(1)
-            emit(2, "if not window: window = matchWindow(moduleInfo,'" + \
-                    executable + "','')\n")
+            executables.append(executable)
+        if len(executables) == 1:
+            emit(2, "window = matchWindow(moduleInfo,'" + app + "','')\n")
+        else:
+            # same as matchWindow for each executable in turn:
+            emit(2, "if len(moduleInfo)<3 or not moduleInfo[0]: return None\n")
+            emit(2, "if getBaseName(moduleInfo[0]).lower() not in " +
+                    repr(tuple(executables)) + ": return None\n")
+            emit(2, "window = moduleInfo[2]\n")
         emit(2, "if not window: return None\n")
 
     emit(2, "# Return if same window and title as before\n")
@@ -156,6 +181,10 @@ def emit_context_activations(contexts):
     # Emit code to activate the context's commands iff one of the context
     # strings matches the current window
     emit(2, "title = string.lower(moduleInfo[1])\n")
+    if pattern:
+        emit(2, "matched = {}\n")
+        emit(2, "for target in self.context_pattern.findall(title):\n")
+        emit(3, "for rule in self.context_rules[target]: matched[rule] = True\n")
     for context in contexts:
         names = context["RULENAMES"]
         if len(names) == 0: continue
@@ -163,21 +192,60 @@ def emit_context_activations(contexts):
         if targets[0] == "":
             if not module_is_global:
                 emit(2, "self.activate_rule('" + names[0] + "', moduleInfo[2], True)\n")
+        elif names[0] in always:
+            emit(2, "self.activate_rule('" + names[0] + "', moduleInfo[2], True)\n")
         else:
-            targets = [make_safe_python_string(target) for target in targets]
-            tests = " or ".join(["string.find(title,'" + target + "') >= 0" for target in targets])
-            emit(2, "status = (" + tests + ")\n")
-            emit(2, "self.activate_rule('" + names[0] + "', moduleInfo[2], status)\n")
+            emit(2, "self.activate_rule('" + names[0] + "', moduleInfo[2], '" +
+                    names[0] + "' in matched)\n")
     emit(0, "\n")
 
+def build_context_matcher(contexts):
+    # Returns (pattern, context_rules, always) for the contexts with strings:
+    #   - pattern finds at each position of the title the longest context
+    #     string starting there (a lookahead, so matches can overlap),
+    #   - context_rules maps each context string to the rule names of the
+    #     contexts having a string contained in it (a shorter string at the
+    #     same position, or anywhere inside it, is implied by the match),
+    #   - always lists the rule names of contexts with an empty string
+    #     among their strings, which match any title.
+    # A context matches iff one of its strings occurs in the title, as with
+    # a string.find per context string.
+    with_strings = []
+    always = []
+    for context in contexts:
+        names = context["RULENAMES"]
+        if len(names) == 0: continue
+        targets = context["STRINGS"]
+        if targets[0] == "": continue
+        if "" in targets:
+            always.append(names[0])
+        else:
+            with_strings.append((names[0], targets))
+
+    all_targets = {}
+    for name, targets in with_strings:
+        for target in targets: all_targets[target] = True
+    if not all_targets: return None, {}, always
+
+    ordered = sorted(all_targets.keys(), key=lambda t: (-len(t), t))
+    pattern = "(?=(" + "|".join([re.escape(t) for t in ordered]) + "))"
+    context_rules = {}
+    for target in ordered:
+        rules = []
+        for name, targets in with_strings:
+            for other in targets:
+                if other in target:
+                    rules.append(name)
+                    break
+        context_rules[target] = tuple(rules)
+    return pattern, context_rules, always
 
 def emit_dictation_grammar():
     emit(2, "<dgndictation> imported;\n")
 
 def emit_definition_grammar(definition):
-    emit(2, "<" + definition["NAME"] + "> = ")
-    emit_menu_grammar (definition["MENU"]["COMMANDS"])
-    emit(0, ";\n")
+    emit_shared_rule(definition["NAME"], emit_menu_grammar,
+                     definition["MENU"]["COMMANDS"])
 
 def emit_command_grammar(command):
     inline_a_term_if_nothing_concrete(command)
@@ -190,8 +258,9 @@ def emit_command_grammar(command):
     if first > 0: main_terms = [create_variable_node(name_a)] + main_terms
     if last < len(terms)-1: main_terms.append(create_variable_node(name_b))
     emit_rule(command["NAME"], "", main_terms)
-    if first > 0: emit_rule(name_a, "", terms[0:first])
-    if last < len(terms)-1: emit_rule(name_b, "", terms[last+1:])
+    if first > 0: emit_shared_rule(name_a, emit_command_terms, terms[0:first])
+    if last < len(terms)-1:
+        emit_shared_rule(name_b, emit_command_terms, terms[last+1:])
 
 def emit_rule(name, exported, terms):
     emit(2, "<" + name + ">" + exported + " = ")
@@ -256,13 +325,16 @@ def emit_number_words():
     emit(3, "return word\n\n")
 
 def emit_definition_actions(definition):
+    global Pending_text, Empty_buffers
+    Pending_text  = {}
+    Empty_buffers = {}
     emit(1,
          "def get_" + definition["NAME"] + "(self, list_buffer, functional, word):\n")
     emit_menu_actions("list_buffer", "functional", definition["MENU"], 2)
     emit(2, "return list_buffer\n\n")
 
 def emit_top_command_actions(command):
-    global Variable_terms, OUT
+    global Variable_terms, OUT, Pending_text, Empty_buffers
     terms = command["TERMS"]
     nterms = len(terms)
     function = "gotResults_" + command["NAME"]
@@ -279,7 +351,10 @@ def emit_top_command_actions(command):
     emit_optional_term_fixup(terms)
     emit(2, "try:\n")
     emit(3, "top_buffer = ''\n")
-    emit_actions("top_buffer", "False", command["ACTIONS"], 3)
+    Pending_text  = {}
+    Empty_buffers = {}
+    if Precompute_actions: Empty_buffers["top_buffer"] = True
+    emit_action_list("top_buffer", "False", command["ACTIONS"], 3)
     emit_flush("top_buffer", "False", 3)
     emit(3, "self.firstWord += " + str(nterms) + "\n")
 
@@ -298,9 +373,6 @@ def emit_top_command_actions(command):
     emit(3, "self.firstWord = -1\n")
     emit(0, "\n")
 
-def emit_flush(buffer, functional, indent):
-    emit(indent, buffer + " = do_flush(" + functional + ", " + buffer + ");\n")
-
 def has_variable_term(unnamed):
     for term in unnamed:
         if term["TYPE"] == "variable" or term["TYPE"] == "dictation": return 1
@@ -326,8 +398,24 @@ def emit_optional_term_fixup(unnamed):
             emit(3, "fullResults.insert(opt, ['', 'converted dgndictation'])\n")
 
 def emit_actions(buffer, functional, actions, indent):
+    global Empty_buffers
+    Empty_buffers.pop(buffer, None)
+    emit_action_list(buffer, functional, actions, indent)
+    if Pending_text.get(buffer) == "" and \
+            [a for a in actions if a["TYPE"] != "word"] == []:
+        emit(indent, "pass  # no actions\n")    # (only empty words)
+    emit_pending_text(buffer, indent)
+
+def emit_action_list(buffer, functional, actions, indent):
+    global Pending_text, Empty_buffers
     for action in actions:
         type = action["TYPE"]
+        if type == "word" and Precompute_actions:
+            Pending_text[buffer] = Pending_text.get(buffer, "") + action["TEXT"]
+            continue
+        flushes = (type == "call" and call_flushes(action))
+        if not flushes: emit_pending_text(buffer, indent)
+
         if type == "reference":
             emit_reference(buffer, functional, action, indent)
         elif type == "formalref":
@@ -339,6 +427,7 @@ def emit_actions(buffer, functional, actions, indent):
             emit_call(buffer, functional, action, indent)
         else:
             implementation_error("Unknown action type: '" + type + "'")
+        if not flushes: Empty_buffers.pop(buffer, None)
 
 def emit_reference(buffer, functional, action, indent):
     global Variable_terms
@@ -599,6 +688,95 @@ def inline_a_term(unnamed):
             inline_a_term(command)
     else: implementation_error("Inlining term of type '" + type + "'")
 
+# ---------------------------------------------------------------------------
+# Text known when converting
+#
+# The text of word actions is not added to the buffer when emitting the
+# action but kept in Pending_text[buffer] until an action using the
+# buffer (or the end of the block of actions), so adjacent word actions
+# are added at once.  Empty_buffers has the buffers known to be empty at
+# this point of the actions: at the start of the actions of the command,
+# and after a flush.  Flushing such a buffer (outside of a functional
+# context) just plays the pending text, with its keys converted now:
+#
+#    "{Ctrl+x}{Ctrl+s}"  -->  play_converted_keys('{Ctrl+x}{Ctrl+s}')
+#
+# A block of actions of a menu alternative, If, When or Repeat starts
+# with nothing known about the buffer, as it can follow other blocks.
+
+def emit_flush(buffer, functional, indent):
+    global Pending_text, Empty_buffers
+    text = Pending_text.pop(buffer, "")
+    if functional == "False" and Empty_buffers.has_key(buffer):
+        if text != "":
+            emit(indent, "play_converted_keys('" +
+                 make_safe_python_string(convert_key_names(text)) + "')\n")
+        return
+    emit_text(buffer, text, indent)
+    emit(indent, buffer + " = do_flush(" + functional + ", " + buffer + ");\n")
+    if Precompute_actions: Empty_buffers[buffer] = True
+
+def emit_pending_text(buffer, indent):
+    global Pending_text, Empty_buffers
+    text = Pending_text.pop(buffer, "")
+    if text != "":
+        emit_text(buffer, text, indent)
+        Empty_buffers.pop(buffer, None)
+
+def emit_text(buffer, text, indent):
+    if text != "":
+        emit(indent, buffer + " += '" + make_safe_python_string(text) + "'\n")
+
+  # copy of convert_key_names of VocolaUtils.py (the two must stay the same,
+  # see PyTest/unittestVocolaKeys.py):
+Key_name_pattern = re.compile(r"""(?x)
+                      \{ ( (?: [a-zA-Z\x80-\xff]+ \+ )*
+                           (?:[^}]|[-a-zA-Z0-9/*+.\x80-\xff]+) )
+                      [ _]
+                      (\d+) \}""")
+
+def convert_key_names(keys):
+    return Key_name_pattern.sub(r'{\1 \2}', keys)
+
+  # does the call flush the buffer (and leave it empty)?
+def call_flushes(call):
+    global Extension_functions
+    callType = call["CALLTYPE"]
+    if   callType == "dragon":    return True
+    elif callType == "extension": return Extension_functions[call["TEXT"]][2]
+    else: return callType == "vocola" and call["TEXT"] == "Unimacro"
+
+# ---------------------------------------------------------------------------
+# Shared rule bodies
+
+# Definitions and the <Na>/<Nb> rules of split commands often have the
+# same body, e.g. several include files each defining a variable as
+# 1..100.  Unless -no_shared_rules is given, only the first of the
+# rules with a body is emitted with it, the others refer to that rule:
+#
+#    <n> = (1 | 2 | ... | 100) ;
+#    <count> = <n> ;
+#
+# NatLink then reports the words of <count> as recognized by rule <n>,
+# which makes no difference as neither has a gotResults function; the
+# actions only look at the words.  Command rules and the terms of their
+# bodies (inline menus and ranges) are never shared: a gotResults_N
+# function must receive all the words of its rule in one run.
+
+def emit_shared_rule(name, emit_body, argument):
+    global OUT, Share_rules, Rule_bodies
+    out = OUT
+    OUT = StringIO()
+    emit_body(argument)
+    body = OUT.getvalue()
+    OUT = out
+    shared = Rule_bodies.get(body)
+    if Share_rules and shared and len(body) > len(shared) + 3:
+        body = "<" + shared + "> "
+    elif not shared:
+        Rule_bodies[body] = name
+    emit(2, "<" + name + "> = " + body + ";\n")
+
 # ---------------------------------------------------------------------------
 # Utilities used by "emit" methods
 
@@ -661,6 +839,7 @@ def emit_file_header():
     print >>OUT, "# coding: latin-1"
     print >>OUT, "# Generated by vcl2py " + VocolaVersion + ", " + now
     print >>OUT, '''
+import re
 import natlink
 from natlinkutils import *
 from VocolaUtils import *
@@ -1,4 +1,6 @@
 import re
+from array  import array
+from bisect import bisect_right
 
 log_error = None   # temporary kludge
 
@@ -102,108 +104,164 @@ def initialize_tokenizer(token_properties):
 
     Token_properties = properties
 
-  # requires: text ends in a newline
-  # requires: initialize_tokenizer(-) has already been called
-def tokenize(text):  # -> [[kind, token text, offset in text of token start]*]
-    global Token_properties, Pseudo
-    properties               = Token_properties
-    token_bare_properties    = properties["b"]
-    token_context_properties = properties[":"]
-    pseudo                   = Pseudo
-
-    tokens          = []
-    start           = 0
-    statement_start = 0
-    while True:
-        match = pseudo.match(text, start)
-        if not match:
-            tokens.append([properties["EOF"], "", len(text)])
-            return tokens
-
-        start = match.end(0)
-        token = match.group(1)
-        kind  = properties.get(token[-2:], token_bare_properties)
-        tokens.append([kind, token, match.start(1)])
-
-        if token == ";":
-            statement_start = len(tokens)
-        elif kind == token_context_properties:
-            beginning = tokens[statement_start][2]
-            token     = text[beginning:start]
-            tokens[statement_start:] = [[kind, token, beginning]]
-            statement_start = len(tokens)
+
+##
+## A Lexer holds the tokens of one text and the current position in them:
+##
+#   The tokens are kept in parallel arrays (columns) rather than as a
+# list per token: kinds has the kind of each token, starts and ends the
+# offsets in the text of its start and end; the token text is only
+# sliced out of the text when the token is eaten.  line_starts has the
+# offset of the start of each line, so a text offset is converted to a
+# line number by a binary search.
+#
+#   All the state of parsing a text is in its Lexer, so several texts
+# can be lexed at once (e.g., a file and its include files).  A
+# position is a list [lexer, token offset, text offset]; it stays valid
+# after its text has been closed.
+#
+
+class Lexer(object):
+
+      # requires: initialize_tokenizer(-) has already been called
+    def __init__(self, text):
+        if text[-1:] != "\n": text += "\n"
+
+        self.text        = text
+        self.kinds       = array('l')
+        self.starts      = array('l')
+        self.ends        = array('l')
+        self.line_starts = array('l', [0])
+        self.offset      = 0
+        self.peeks       = 0
+
+        self.tokenize()
+        self.index_lines()
+
+    def tokenize(self):
+        global Token_properties, Pseudo
+        properties               = Token_properties
+        token_bare_properties    = properties["b"]
+        token_context_properties = properties[":"]
+        pseudo                   = Pseudo
+        text                     = self.text
+        kinds, starts, ends      = self.kinds, self.starts, self.ends
+
+        start           = 0
+        statement_start = 0
+        while True:
+            match = pseudo.match(text, start)
+            if not match:
+                kinds.append(properties["EOF"])
+                starts.append(len(text))
+                ends.append(len(text))
+                return
+
+            start = match.end(0)
+            token = match.group(1)
+            kind  = properties.get(token[-2:], token_bare_properties)
+            kinds.append(kind)
+            starts.append(match.start(1))
+            ends.append(start)
+
+            if token == ";":
+                statement_start = len(kinds)
+            elif kind == token_context_properties:
+                # the tokens of the statement so far become one context
+                # statement token, starting where the first of them did:
+                del kinds[statement_start+1:]
+                del starts[statement_start+1:]
+                del ends[statement_start+1:]
+                kinds[statement_start] = kind
+                ends[statement_start]  = start
+                statement_start = len(kinds)
+
+    def index_lines(self):
+        text        = self.text
+        line_starts = self.line_starts
+        newline     = text.find("\n")
+        while newline != -1:
+            line_starts.append(newline + 1)
+            newline = text.find("\n", newline + 1)
+
+    def token_text(self, offset):
+        return self.text[self.starts[offset]:self.ends[offset]]
+
+    def peek(self, kind):
+        self.peeks |= kind
+        return self.kinds[self.offset] & kind
+
+    def eat(self, kind= -1):
+        offset = self.offset
+        if not (self.kinds[offset] & kind):
+            self.peeks |= kind
+            syntax_error(self.peeks, self.kinds[offset],
+                         self.token_text(offset), self.get_current_position())
+
+        self.peeks  = 0
+        self.offset = offset + 1
+        return self.text[self.starts[offset]:self.ends[offset]]
+
+    def get_current_position(self):
+        return [self, self.offset, self.starts[self.offset]]
+
+    def get_last_position(self):
+        if self.offset < 1:
+            implementation_error("get_last_position() called before eat")
+        return [self, self.offset-1, self.starts[self.offset-1]]
+
+    def rewind(self, position):
+        self.offset = position[1]
+        self.peeks  = 0
+
+    def get_line_number(self, text_offset):
+        return bisect_right(self.line_starts, text_offset)
+
+    def get_line_start(self, text_offset):
+        return self.line_starts[bisect_right(self.line_starts, text_offset)-1]
 
 
 ##
 ## Loading the tokens of a string for processing:
 ##
 
-  # (initial) tokenizer state:
-Text          = ""
-Tokens        = []
-Offset        = -1  # uninitialized state for implementation error detection
-Peeks         = 0
-Scan_limit    = 0
-Scan_newlines = 0
+  # (initial) tokenizer state: the Lexer of the text being parsed
+Current = None
 
 
   # requires: initialize_token_properties(-) has already been called
 def load_tokens(text):
-    global Text, Offset, Peeks, Tokens, Scan_limit, Scan_newlines
-
-    if text[-1:] != "\n": text += "\n"
-
-    Text          = text
-    Tokens        = tokenize(text)
-
-    Offset        = 0
-    Peeks         = 0
-    Scan_limit    = 0
-    Scan_newlines = 0
+    global Current
+    Current = Lexer(text)
 
 
 ##
-## Moving through the list of tokens:
+## Moving through the list of tokens of the current text:
 ##
 
 def peek(kind):
-    global Tokens, Offset, Peeks
-    Peeks |= kind
-    return Tokens[Offset][0] & kind
+    return Current.peek(kind)
 
 def eat(kind= -1):
-    global Tokens, Offset, Peeks
-
-    if not (Tokens[Offset][0] & kind):
-        Peeks |= kind
-        syntax_error(Peeks, Tokens[Offset][0], Tokens[Offset][1],
-                     get_current_position())
-
-    Peeks   = 0
-    Offset += 1
-    return Tokens[Offset-1][1]
+    return Current.eat(kind)
 
 def get_current_position():
-    global Text, Offset, Tokens
-    if Offset == -1:
+    if Current is None:
         implementation_error("get_current_position() called before open_text")
-    return [Text, Offset, Tokens[Offset][2]]
+    return Current.get_current_position()
 
 def get_last_position():
-    global Text, Offset, Tokens
-    if Offset < 1:
-        implementation_error("get_last_position() called before open_text/eat")
-    return [Text, Offset-1, Tokens[Offset-1][2]]
+    if Current is None:
+        implementation_error("get_last_position() called before open_text")
+    return Current.get_last_position()
 
 def adjust_position(position, amount):
-    text, tokens_offset, text_offset = position
-    return [text, tokens_offset, text_offset+amount]
+    lexer, tokens_offset, text_offset = position
+    return [lexer, tokens_offset, text_offset+amount]
 
-  # requires: load_tokens(-) has not been called since this position was captured
+  # requires: position is a position of the current text
 def rewind(position):
-    global Offset
-    Offset = position[1]
-    Peeks  = 0
+    Current.rewind(position)
 
 
 ##
@@ -211,37 +269,21 @@ def rewind(position):
 ##
 
 def get_line_number(position):
-    global Text, Scan_limit, Scan_newlines
-
-    text, dummy, text_offset = position
-
-    if text is Text:                  # compare by pointer values
-        if text_offset < Scan_limit:
-            Scan_limit = Scan_newlines = 0
-        Scan_newlines += text[Scan_limit:text_offset].count("\n")
-        Scan_limit = text_offset
-        return Scan_newlines + 1
-
-    return text[:text_offset].count("\n")+ 1
+    lexer, dummy, text_offset = position
+    return lexer.get_line_number(text_offset)
 
 def get_column_number(position):
-    text, dummy, text_offset = position
-
-    last_newline = text.rfind("\n", 0, text_offset)
-    line_start = last_newline + 1
-
-    return text_offset - line_start
+    lexer, dummy, text_offset = position
+    return text_offset - lexer.get_line_start(text_offset)
 
   # returns line without it's terminating newline:
 def get_line(position):
-    text, dummy, text_offset = position
-
-    last_newline = text.rfind("\n", 0, text_offset)
-    line_start = last_newline + 1
+    lexer, dummy, text_offset = position
 
-    line_end = text.find("\n", line_start)
+    line_start = lexer.get_line_start(text_offset)
+    line_end   = lexer.text.find("\n", line_start)
 
-    return text[line_start:line_end]
+    return lexer.text[line_start:line_end]
 
 def point_to_position(position):
     line   = get_line(position)
@@ -372,7 +414,7 @@ def decode_token_kinds(kind):
 def syntax_error(wanted, found, found_text, position):
     if found == TOKEN_ILLEGAL_WORD:
         log_error("Unterminated quotation: " + found_text[:-1],
-                  get_current_position())
+                  position)
         raise SyntaxError("Unterminated quotation: " + found_text[:-1])
 
     advice = ""
@@ -405,18 +447,24 @@ def syntax_error(wanted, found, found_text, position):
 ## Saving and restoring the token state:
 ##
 
-Token_state_stack = []
+Lexer_stack = []
 
   # requires: initialize_token_properties(-) has already been called
 def open_text(text):
-    global Token_state_stack, Text, Tokens, Offset, Peeks, Scan_limit
-    global Scan_newlines
-    token_state = [Text, Tokens, Offset, Peeks, Scan_limit, Scan_newlines]
-    Token_state_stack.append(token_state)
+    global Lexer_stack, Current
+    Lexer_stack.append(Current)
 
     load_tokens(text)
 
+  # opens the text of lexer again, starting at its first token:
+def open_lexer(lexer):
+    global Lexer_stack, Current
+    Lexer_stack.append(Current)
+
+    lexer.offset = 0
+    lexer.peeks  = 0
+    Current      = lexer
+
 def close_text():
-    global Token_state_stack, Text, Tokens, Offset, Peeks, Scan_limit, Scan_newlines
-    token_status = Token_state_stack.pop()
-    Text, Tokens, Offset, Peeks, Scan_limit, Scan_newlines = token_status
+    global Lexer_stack, Current
+    Current = Lexer_stack.pop()
@@ -1,7 +1,13 @@
+LOG = None
+
 def set_log(target):
     global LOG
     LOG = target
 
+def get_log():
+    global LOG
+    return LOG
+
 
 def print_log(message, no_newline=False):
     global LOG
@@ -10,6 +16,36 @@ def print_log(message, no_newline=False):
     else:
         print >>LOG, message
 
+def flush_log():
+    global LOG
+    LOG.flush()
+
+def write_log(text):
+    global LOG
+    LOG.write(text)
+
 def close_log():
     global LOG
     LOG.close()
+
+
+# Diagnostics: with start_diagnostics, each error logged by parse.log_error
+# is also collected as a dictionary with keys INPUT, FILE, LINE, MESSAGE and
+# TEXT (the message as written to the log):
+
+Diagnostics = None
+
+def start_diagnostics():
+    global Diagnostics
+    Diagnostics = []
+
+def add_diagnostic(diagnostic):
+    global Diagnostics
+    if Diagnostics is not None:
+        Diagnostics.append(diagnostic)
+
+def stop_diagnostics():
+    global Diagnostics
+    diagnostics = Diagnostics
+    Diagnostics = None
+    return diagnostics
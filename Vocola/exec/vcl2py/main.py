@@ -6,21 +6,35 @@ import os
 import re
 import sys
 
+from vcl2py.astcache  import *
+from vcl2py.dependencies import *
 from vcl2py.emit      import output
+import vcl2py.lex as lex
 from vcl2py.lex       import initialize_token_properties
 from vcl2py.log       import *
-from vcl2py.parse     import parse_input, check_forward_references
+from vcl2py.parse     import parse_input, check_forward_references, \
+                             get_dependencies, clear_include_cache, \
+                             get_environment_used, get_error_count
 from vcl2py.transform import transform
 
 
-VocolaVersion = "2.8.6"
+VocolaVersion = "2.8.7"
 
 
 # ---------------------------------------------------------------------------
 # Messages to standard error
 
 def fatal_error(message):
-    print >>sys.stderr, "vcl2py.py: Error: " + message
+    text = "vcl2py.py: Error: " + message
+    print >>sys.stderr, text
+
+    diagnostic = {}
+    diagnostic["INPUT"]   = None
+    diagnostic["FILE"]    = None
+    diagnostic["LINE"]    = None
+    diagnostic["MESSAGE"] = message
+    diagnostic["TEXT"]    = text
+    add_diagnostic(diagnostic)
     sys.exit(99)
 
 
@@ -32,9 +46,11 @@ def usage(message=""):
 
     print >>sys.stderr, '''
 Usage: python vcl2py.pl [<option>...] <inputFileOrFolder> <outputFolder>
-  where <option> ::= -debug <n> | -extensions <filename> | -f
+  where <option> ::= -ast_cache_size <KB> | -debug <n>
+                  | -extensions <filename> | -f
                   |-INI_file <filename> | -log_file <filename> | -log_stdout
-                  | -max_commands <n> | -q | -suffix <s>
+                  | -max_commands <n> | -no_shared_rules | -parallel <n>
+                  | -q | -suffix <s>
 
 '''
     print >>sys.stderr, "Vocola 2 version: " + VocolaVersion
@@ -47,7 +63,8 @@ Usage: python vcl2py.pl [<option>...] <inputFileOrFolder> <outputFolder>
 
 def main_routine():
     global Debug, Default_maximum_commands, Error_encountered, Force_processing, In_folder, Default_number_words
-    global Extension_functions
+    global Extension_functions, Extensions_file, Parallel_jobs, Ast_cache_size
+    global Share_rules
 
     # flush output after every print statement:
     #sys.stdout = os.fdopen(sys.stdout.fileno(), 'w', 0)    # <<<>>>
@@ -58,7 +75,9 @@ def main_routine():
     Error_encountered        = False
     Force_processing         = False
     Default_number_words     = {}
-
+    Parallel_jobs            = 1
+    Ast_cache_size           = Default_ast_cache_size
+    Share_rules              = True
 
     extensions_file          = ""
     ignore_INI_file          = False
@@ -75,26 +94,24 @@ def main_routine():
 
         if   option == "-f":          Force_processing = True; continue
         elif option == "-log_stdout": log_to_stdout    = True; continue
+        elif option == "-no_shared_rules": Share_rules = False; continue
         elif option == "-q":          ignore_INI_file  = True; continue
 
         if len(argv) == 0:
             usage("missing argument for option " + option)
         argument = argv.pop(0)
 
-        if   option == "-debug":        Debug           = safe_int(argument, 1)
+        if   option == "-ast_cache_size":
+            Ast_cache_size = safe_int(argument, Default_ast_cache_size)
+        elif option == "-debug":        Debug           = safe_int(argument, 1)
         elif option == "-extensions":   extensions_file = argument
         elif option == "-INI_file":     ini_file        = argument
         elif option == "-log_file":     log_file        = argument
         elif option == "-max_commands":
             Default_maximum_commands = safe_int(argument, 1)
         elif option == "-numbers":
-            Default_number_words = {}
-            numbers = re.split(r'\s*,\s*', argument.strip())
-            i = 0
-            for number in numbers:
-                if number != "":
-                    Default_number_words[i] = number
-                i = i + 1
+            Default_number_words = parse_number_words(argument)
+        elif option == "-parallel":     Parallel_jobs   = safe_int(argument, 1)
         elif option == "-suffix":       suffix                   = argument
         else:
             usage("unknown option: " + option)
@@ -134,6 +151,7 @@ def main_routine():
 
 
     if not ignore_INI_file:   read_ini_file(ini_file)
+    Extensions_file = extensions_file
     if extensions_file != "":
         Extension_functions = read_extensions_file(extensions_file)
     else:
@@ -152,12 +170,110 @@ def main_routine():
     else:
         sys.exit(1)
 
+# ---------------------------------------------------------------------------
+# In-process compilation
+#
+# compile(paths, out_folder, options) does what running vcl2py.py does,
+# without starting a new python process each time; _vocola_main uses it.
+# paths is a list of .vcl files and/or folders (or one of them).  options is
+# a dictionary with any of the keys (the command line options):
+#   ast_cache_size, debug, extensions, force, ignore_INI_file, INI_file,
+#   max_commands, numbers, parallel, share_rules, suffix
+#
+# Returns (diagnostics, log text, rebuilt): diagnostics has one dictionary
+# per error, see vcl2py.log.start_diagnostics.  The log text is what would
+# have been written to the log file.  rebuilt lists the .vcl files which
+# were converted, see convert_file.
+#
+# The token tables are only built by the first compile of the process.
+# The log is set back to what it was before when compile returns.
+
+def compile(paths, out_folder, options=None):
+    global Debug, Default_maximum_commands, Error_encountered, Force_processing, In_folder, Default_number_words
+    global Extension_functions, Extensions_file, Parallel_jobs, Rebuilt
+    global Ast_cache_size, Share_rules
+    from cStringIO import StringIO
+
+    if isinstance(paths, basestring): paths = [paths]
+    if options is None: options = {}
+
+    previous_log = get_log()
+    buffer = StringIO()
+    set_log(buffer)
+    start_diagnostics()
+    Rebuilt = []
+    try:
+        Debug            = options.get("debug", 0)
+        Force_processing = options.get("force", False)
+        Parallel_jobs    = options.get("parallel", 1)
+        Ast_cache_size   = options.get("ast_cache_size", Default_ast_cache_size)
+        Share_rules      = options.get("share_rules", True)
+        suffix           = options.get("suffix", "_vcl")
+        if options.get("numbers", "") != "":
+            Default_number_words = parse_number_words(options["numbers"])
+        else:
+            Default_number_words = {}
+        Extensions_file  = options.get("extensions", "")
+        if Extensions_file != "":
+            Extension_functions = read_extensions_file(Extensions_file)
+        else:
+            Extension_functions = {}
+
+        if not lex.Token_properties: initialize_token_properties()
+
+        Error_encountered = False
+        for path in paths:
+            try:
+                compile_path(path, out_folder, suffix, options)
+            except SystemExit:
+                Error_encountered = True  # diagnostic added by fatal_error
+    finally:
+        diagnostics = stop_diagnostics()
+        set_log(previous_log)
+    return diagnostics, buffer.getvalue(), Rebuilt
+
+def compile_path(path, out_folder, suffix, options):
+    global Debug, Default_maximum_commands, In_folder
+
+    in_file = ""
+    if os.path.isdir(path):
+        In_folder = path
+    elif os.path.exists(path):
+        In_folder, filename = os.path.split(path)
+        if In_folder == "": In_folder = "."
+        in_file, extension  = os.path.splitext(filename)
+        if not extension == ".vcl":
+            fatal_error("Input file '" + path + "' must end in '.vcl'")
+    else:
+        fatal_error("Nonexistent input filename '" + path + "'")
+
+    Default_maximum_commands = options.get("max_commands", 1)
+    if not options.get("ignore_INI_file", False):
+        ini_file = options.get("INI_file", "")
+        if ini_file == "": ini_file = In_folder + os.sep + "Vocola.INI"
+        read_ini_file(ini_file)
+    if Debug >= 1:
+        print_log("default maximum commands per utterance = " +
+                  str(Default_maximum_commands))
+
+    convert_files(in_file, out_folder, suffix)
+
 def safe_int(text, default=0):
     try:
         return int(text)
     except ValueError:
         return default
 
+def parse_number_words(text):
+    number_words = {}
+    numbers = re.split(r'\s*,\s*', text.strip())
+    i = 0
+    for number in numbers:
+        if number != "":
+            number_words[i] = number
+        i = i + 1
+    return number_words
+
 def read_ini_file(ini_file):
     global Debug, Default_maximum_commands
 
@@ -221,25 +337,181 @@ def expand_in_file(in_file, in_folder):
 
 
 def convert_files(in_file, out_folder, suffix):
-    global In_folder
+    global In_folder, Parallel_jobs, Minimum_parallel_files, Dependencies
+
+    Dependencies = load_dependencies(out_folder)
+    # include files are parsed once for all the files converted below:
+    clear_include_cache()
+    clear_hash_cache()
+    out_of_date = []
+    for in_file in expand_in_file(in_file, In_folder):
+        reason = needs_conversion(in_file, out_folder, suffix)
+        if reason: out_of_date.append((in_file, reason))
+    if len(out_of_date) == 0: return
+
+    if Parallel_jobs != 1 and len(out_of_date) >= Minimum_parallel_files:
+        convert_files_parallel(out_of_date, out_folder, suffix)
+    else:
+        for in_file, reason in out_of_date:
+            convert_file(in_file, out_folder, suffix, reason)
+    save_dependencies(out_folder, Dependencies)
+    if Ast_cache_size > 0:
+        trim_ast_cache(get_cache_folder(out_folder), Ast_cache_size*1024)
+
+
+# ---------------------------------------------------------------------------
+# Parallel conversion (-parallel <n>, 0 means one process per CPU)
+#
+# Each worker process has its own copy of the module globals of
+# parse/lex/emit and converts its files one at a time, exactly like the
+# sequential loop.  The log messages of each file are collected in the
+# worker and written to the log in the order of the files.
+
+# Starting the processes costs more than converting a few files:
+Minimum_parallel_files = 4
+
+def convert_files_parallel(files, out_folder, suffix):
+    global Parallel_jobs, Error_encountered, Dependencies, Rebuilt
+    import multiprocessing
+
+    jobs = Parallel_jobs
+    if jobs <= 0: jobs = multiprocessing.cpu_count()
+    jobs = min(jobs, len(files))
+    settings = (Debug, Force_processing, In_folder, Default_number_words,
+                Default_maximum_commands, Extension_functions,
+                Extensions_file, Ast_cache_size, Share_rules)
+    # else forked workers would write out the buffered log messages again:
+    flush_log()
+    pool = multiprocessing.Pool(jobs, initialize_worker, (settings,))
+    try:
+        results = pool.map(convert_file_in_worker,
+                           [(f, reason, out_folder, suffix)
+                            for f, reason in files], 1)
+    finally:
+        pool.close()
+        pool.join()
+    for (in_file, reason), result in zip(files, results):
+        log_text, error_encountered, diagnostics, rebuilt, record = result
+        write_log(log_text)
+        if error_encountered: Error_encountered = True
+        for diagnostic in diagnostics:
+            add_diagnostic(diagnostic)
+        Rebuilt += rebuilt
+        out_name = output_name(in_file, suffix)
+        if record is None:
+            Dependencies.pop(out_name, None)
+        else:
+            Dependencies[out_name] = record
+
+def initialize_worker(settings):
+    global Debug, Force_processing, In_folder, Default_number_words
+    global Default_maximum_commands, Extension_functions, Extensions_file
+    global Ast_cache_size, Share_rules
+
+    (Debug, Force_processing, In_folder, Default_number_words,
+     Default_maximum_commands, Extension_functions, Extensions_file,
+     Ast_cache_size, Share_rules) = settings
+    initialize_token_properties()
+
+def convert_file_in_worker(arguments):
+    global Error_encountered, Dependencies, Rebuilt
+    from cStringIO import StringIO
+
+    in_file, reason, out_folder, suffix = arguments
+    Error_encountered = False
+    Dependencies = {}
+    Rebuilt = []
+    buffer = StringIO()
+    set_log(buffer)
+    start_diagnostics()
+    convert_file(in_file, out_folder, suffix, reason)
+    record = Dependencies.get(output_name(in_file, suffix))
+    return buffer.getvalue(), Error_encountered, stop_diagnostics(), \
+           Rebuilt, record
+
+
+# ---------------------------------------------------------------------------
+# Deciding which files to convert
+#
+# Dependencies maps each output file name to the files its last conversion
+# read, see vcl2py.dependencies.  Rebuilt lists the [.vcl file name, reason,
+# changed file] of each conversion; the changed file is None unless an
+# included file or the extensions file caused the conversion.
+
+Dependencies    = {}
+Rebuilt         = []
+Extensions_file = ""
+
+def output_name(in_file, suffix):
+    return convert_filename(in_file) + suffix + ".py"
+
+  # returns why in_file must be converted: [reason, changed file], or None
+def needs_conversion(in_file, out_folder, suffix):
+    global Force_processing, In_folder, Dependencies
+
+    if Force_processing: return ["forced", None]
+    out_name = output_name(in_file, suffix)
+    out_file = out_folder + os.sep + out_name
+    in_path = In_folder + os.sep + in_file + ".vcl"
+    if not os.path.exists(in_path): return ["no such file", None]
+    if not os.path.exists(out_file): return ["no output file", None]
+    if not os.path.getmtime(in_path) < os.path.getmtime(out_file):
+        return ["changed", None]
+    if not Dependencies.has_key(out_name):
+        return ["no dependency information", None]
+    changed = changed_dependency(Dependencies[out_name])
+    if changed:
+        return ["'" + changed + "' changed", changed]
+    return None
+
+  # paths lists the .vcl file and the files it included
+def record_dependencies(in_file, suffix, paths, uses_extensions):
+    global Dependencies, Extensions_file
+
+    paths = list(paths)
+    if uses_extensions and Extensions_file != "":
+        paths.append(os.path.realpath(os.path.abspath(Extensions_file)))
+    Dependencies[output_name(in_file, suffix)] = make_record(paths)
+
+
+# ---------------------------------------------------------------------------
+# Persistent cache of the statements of converted files, see vcl2py.astcache
+# (-ast_cache_size <KB>, 0 switches the cache off)
+
+Default_ast_cache_size = 16384
+Ast_cache_size         = Default_ast_cache_size
+
+# Saving an entry costs more than parsing the file again, and an entry is
+# only loaded when an unchanged file is converted again: entries are saved
+# on runs that convert files which did not change (-f, or output files
+# removed for a new version or user), not for edited files.
+Ast_cache_save_reasons = ["forced", "no output file", "no dependency information"]
+
+  # returns the key of the cache entry of the input file, or None
+def get_ast_cache_key(in_path):
+    global Ast_cache_size, Debug, Extension_functions, VocolaVersion
+    if Ast_cache_size <= 0 or Debug > 0: return None
+    try:
+        text = open(in_path).read()
+    except (IOError, OSError), e:
+        return None    # (reported by the parser)
+    # (files of the same name in other folders may include other files)
+    in_path = os.path.normcase(os.path.realpath(os.path.abspath(in_path)))
+    return ast_cache_key(VocolaVersion, in_path, text, Extension_functions)
 
-    files = expand_in_file(in_file, In_folder)
-    for in_file in files:
-        convert_file(in_file, out_folder, suffix)
-    return
 
 # Convert one Vocola command file to a .py file
 
   # in_file is just the base name; actual pathname is
   # <In_folder>/<in_file>.vcl where / is the correct separator
-def convert_file(in_file, out_folder, suffix):
-    global Debug, Error_encountered
+def convert_file(in_file, out_folder, suffix, reason):
+    global Debug, Error_encountered, Dependencies, Rebuilt
     global Force_processing
     global In_folder
     global Input_name, Module_name
     global Default_number_words, Number_words
     global Default_maximum_commands, Maximum_commands
-    global Extension_functions
+    global Extension_functions, Share_rules
 
     out_file = convert_filename(in_file)
 
@@ -251,32 +523,43 @@ def convert_file(in_file, out_folder, suffix):
 
     out_file = out_folder + os.sep + out_file + suffix + ".py"
 
-    in_path = In_folder + os.sep + Input_name
-    if os.path.exists(in_path):
-        in_time  = os.path.getmtime(in_path)
-        out_time = 0
-        if os.path.exists(out_file): out_time = os.path.getmtime(out_file)
-        if in_time<out_time and not Force_processing:
-            return
-
-
     if Debug>=1: print_log("\n==============================")
-
-    statements, Definitions, Function_definitions, statement_count, \
-        error_count, should_emit_dictation_support, file_empty \
-        = parse_input(Input_name, In_folder, Extension_functions, Debug)
-    if error_count == 0:
-        check_forward_references()
-
-    # Prepend a "global" context statement if necessary
-    if len(statements) == 0 or statements[0]["TYPE"] != "context":
-        context            = {}
-        context["TYPE"]    = "context"
-        context["STRINGS"] = [""]
-        statements.insert(0, context)
-    #print_log(unparse_statements(statements), True)
-    statements = transform(statements, Function_definitions, statement_count)
-    #print_log(unparse_statements(statements), True)
+    if Debug>=1: print_log("Converting " + Input_name + ": " + reason[0])
+    Rebuilt.append([Input_name, reason[0], reason[1]])
+
+    cache_folder = get_cache_folder(out_folder)
+    key          = get_ast_cache_key(In_folder + os.sep + Input_name)
+    payload      = None
+    if key:
+        payload  = load_ast(cache_folder, key)
+    if payload:
+        statements, Definitions, should_emit_dictation_support, file_empty, \
+            included, uses_extensions = payload
+        error_count = 0
+    else:
+        statements, Definitions, Function_definitions, statement_count, \
+            error_count, should_emit_dictation_support, file_empty \
+            = parse_input(Input_name, In_folder, Extension_functions, Debug)
+        if error_count == 0:
+            check_forward_references()
+
+        # Prepend a "global" context statement if necessary
+        if len(statements) == 0 or statements[0]["TYPE"] != "context":
+            context            = {}
+            context["TYPE"]    = "context"
+            context["STRINGS"] = [""]
+            statements.insert(0, context)
+        #print_log(unparse_statements(statements), True)
+        statements = transform(statements, Function_definitions, statement_count)
+        #print_log(unparse_statements(statements), True)
+
+        included, uses_extensions = get_dependencies()
+        # (before output changes the statements)
+        if key and get_error_count() == 0 and \
+           reason[0] in Ast_cache_save_reasons:
+            save_ast(cache_folder, key, included[1:], get_environment_used(),
+                     [statements, Definitions, should_emit_dictation_support,
+                      file_empty, included, uses_extensions])
 
     # Handle $set directives:
     Maximum_commands = Default_maximum_commands
@@ -287,13 +570,7 @@ def convert_file(in_file, out_folder, suffix):
             if key == "MaximumCommands":
                 Maximum_commands = safe_int(statement["TEXT"], 1)
             elif key == "numbers":
-                Number_words = {}
-                numbers = re.split(r'\s*,\s*', statement["TEXT"].strip())
-                i = 0
-                for number in numbers:
-                    if number != "":
-                        Number_words[i] = number
-                    i = i + 1
+                Number_words = parse_number_words(statement["TEXT"])
 
     if error_count > 0:
         if error_count == 1:
@@ -302,6 +579,8 @@ def convert_file(in_file, out_folder, suffix):
             s = "s"
         print_log("  " + str(error_count) + " error" + s + " -- file not converted.")
         Error_encountered = True
+        # (converted again next time)
+        Dependencies.pop(output_name(in_file, suffix), None)
         return
     if file_empty:
         # Write empty output file, for modification time comparisons
@@ -312,6 +591,7 @@ def convert_file(in_file, out_folder, suffix):
             print_log("Couldn't open output file '" + out_file + "' for writing")
         print_log("Converting " + Input_name)
         print_log("  Warning: no commands in file.")
+        record_dependencies(in_file, suffix, included, uses_extensions)
         return
 
     from vcl2py.emit import output
@@ -321,7 +601,8 @@ def convert_file(in_file, out_folder, suffix):
            should_emit_dictation_support,
            Module_name,
            Number_words, Definitions, Maximum_commands,
-           Extension_functions)
+           Extension_functions, Share_rules)
+    record_dependencies(in_file, suffix, included, uses_extensions)
 
 #
 # Warning: this code is very subtle and has a matching inverse function in
@@ -18,7 +18,8 @@ def parse_input(in_file, in_folder, extension_functions, debug):
     global Included_files, Include_stack_file, Include_stack_line
     global Functions, Function_definitions, Definitions, Statement_count
     global Forward_references, Last_include_position, Error_count
-    global Should_emit_dictation_support, File_empty
+    global Should_emit_dictation_support, File_empty, Uses_extensions, Uses
+    global Environment_used
 
     Definitions                   = {}
     Functions                     = {}
@@ -33,6 +34,9 @@ def parse_input(in_file, in_folder, extension_functions, debug):
     File_empty                    = True
     Should_emit_dictation_support = False
     Statement_count               = 1
+    Uses_extensions               = False
+    Uses                          = []
+    Environment_used              = {}
 
     return parse_file(in_file), Definitions, Function_definitions, Statement_count, Error_count, Should_emit_dictation_support, File_empty
 
@@ -158,22 +162,60 @@ Dragon_functions = {
 # executed in this routine.
 
 def parse_file(in_file):    # returns a list of statements
-    global Include_stack_file, Included_files
+    global Include_stack_file, Included_files, Debug, Error_count
 
     short_name, canonical_path = canonicalize_in_file(in_file)
     Included_files.append(canonical_path)
 
-    text = read_file(canonical_path)
-    open_text(text)
+    # only include files are cached, each .vcl file is parsed once per run:
+    use_cache = Cache_includes and Debug == 0 and len(Include_stack_file) > 0
+    records   = None
+    if use_cache:
+        mtime = get_mtime(canonical_path)
+        entry = get_cached_include(canonical_path, mtime, short_name)
+        if entry:
+            lexer, records = entry[2], entry[3]
+            open_lexer(lexer)
+            try:
+                Include_stack_file.append(short_name)
+                return replay_statements(records)
+            finally:
+                close_text()
+                Include_stack_file.pop()
+        records     = []
+        error_count = Error_count
+
+    lexer = Lexer(read_file(canonical_path))
+    open_lexer(lexer)
     try:
         Include_stack_file.append(short_name)
-        statements = parse_statements()
+        statements = parse_statements(records)
     finally:
         close_text()
         Include_stack_file.pop()
 
+    if use_cache and Error_count == error_count and mtime is not None:
+        Include_cache[canonical_path] = [mtime, short_name, lexer, records]
     return statements
 
+# Returns the files the last parse_input read (canonical paths, the input
+# file first, then its include files) and whether it calls extensions:
+def get_dependencies():
+    global Included_files, Uses_extensions
+    return list(Included_files), Uses_extensions
+
+# Returns the environment variables the include directives of the last
+# parse_input referred to, with their values (None if not set):
+def get_environment_used():
+    global Environment_used
+    return dict(Environment_used)
+
+# Returns the number of errors logged since the last parse_input,
+# including those of check_forward_references:
+def get_error_count():
+    global Error_count
+    return Error_count
+
 def canonicalize_in_file(in_file):
     # allow \ as a file separator even on Linux:
     if os.sep == '/':
@@ -202,16 +244,120 @@ def read_file(in_file):
                   Last_include_position)
         return ""
 
+# ---------------------------------------------------------------------------
+# Cache of parsed include files
+#
+#   Include files shared by many .vcl files (e.g., a keys.vch) are only
+# read, tokenized, and parsed once per run (see clear_include_cache):
+# Include_cache maps the canonical path of an include file parsed
+# without errors to [modification time, short name, lexer, records]
+# with a record [statement, starting position, uses] per statement
+# (include directives included).  The uses of a statement are what its
+# parse looked up in or set in the state of the file being converted:
+#
+#     ["variable", name, position]   a reference to <name>
+#     ["call", name, formals]        a call of user function name()
+#     ["dictation"]                  set Should_emit_dictation_support
+#     ["extensions"]                 set Uses_extensions
+#
+#   Replaying the records of an include file has the same effects as
+# parsing it again, on copies of the statements.  When a statement
+# would be parsed differently in the file being converted (e.g., its
+# definition would be a redefinition), the rest of the include file is
+# parsed from the cached lexer, so errors are reported as before.
+
+Cache_includes      = True
+Include_cache       = {}
+Include_cache_stats = {"HITS": 0, "MISSES": 0, "REPARSED": 0}
+
+def clear_include_cache():
+    global Include_cache
+    Include_cache = {}
+
+def get_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except (IOError, OSError), e:
+        return None
+
+def get_cached_include(canonical_path, mtime, short_name):
+    global Include_cache, Include_cache_stats
+    entry = Include_cache.get(canonical_path)
+    if entry and entry[0] == mtime and entry[1] == short_name:
+        Include_cache_stats["HITS"] += 1
+        return entry
+    Include_cache_stats["MISSES"] += 1
+    return None
+
+def replay_statements(records):
+    global Functions, Function_definitions, Definitions, File_empty
+    global Should_emit_dictation_support, Uses_extensions, Include_cache_stats
+
+    statements = []
+    for statement, starting_position, uses in records:
+        if not can_replay(statement, uses):
+            Include_cache_stats["REPARSED"] += 1
+            rewind(starting_position)
+            statements.extend(parse_statements())
+            return statements
+
+        statement = copy_node(statement)
+        for use in uses:
+            if use[0] == "variable":
+                if not Definitions.has_key(use[1]):
+                    add_forward_reference(use[1], use[2])
+            elif use[0] == "dictation":
+                Should_emit_dictation_support = True
+            elif use[0] == "extensions":
+                Uses_extensions = True
+        if statement["TYPE"] == "function":
+            Functions[statement["NAME"]] = len(statement["FORMALS"])
+            Function_definitions[statement["NAME"]] = statement
+        elif statement["TYPE"] == "command":
+            File_empty = False
+        add_statement(statement, starting_position, statements)
+
+    return statements
+
+  # would statement be parsed without errors (the same way) now?
+def can_replay(statement, uses):
+    global Definitions, Functions
+    type = statement["TYPE"]
+    if type == "definition" and Definitions.has_key(statement["NAME"]):
+        return False
+    if type == "function" and Functions.has_key(statement["NAME"]):
+        return False
+    for use in uses:
+        if use[0] == "call" and Functions.get(use[1]) != use[2]:
+            return False
+    return True
+
+  # copies the dictionaries and lists of a parse tree, but not positions:
+def copy_node(node):
+    if type(node) is dict:
+        copy = {}
+        for key, value in node.iteritems():
+            copy[key] = copy_node(value)
+        return copy
+    if type(node) is list:
+        if len(node) > 0 and isinstance(node[0], Lexer):
+            return node
+        return [copy_node(element) for element in node]
+    return node
+
+
 # This is the main parsing loop.
 
-def parse_statements():    # statements = (context | top_command | definition)*
-    global Definitions, Formals, Include_stack_line, Last_include_position
-    global Statement_count, Variable_terms
+  # if records is a list, a record [statement, starting position, uses]
+  # is added to it for each statement, see replay_statements:
+def parse_statements(records=None):    # statements = (context | top_command | definition)*
+    global Formals, Uses, Variable_terms
 
     statements = []
     while not peek(TOKEN_EOF):
         Variable_terms    = []  # used in error-checking
         Formals           = []  # None => any ref ok (environment variables)
+        Uses              = []
         starting_position = get_current_position()
         try:
             statement = parse_statement()
@@ -223,32 +369,41 @@ def parse_statements():    # statements = (context | top_command | definition)*
                 eat(TOKEN_SEMICOLON)
             continue
 
-        if statement["TYPE"] == "definition":
-            name = statement["NAME"]
-            if Definitions.has_key(name):
-                log_error("Redefinition of <"+name+">", starting_position)
-            Definitions[name] = statement
-        elif statement["TYPE"] == "command":
-            statement["NAME"] = str(Statement_count)
-            Statement_count += 1
-
-        #print unparse_statements([statement]),
-        if statement["TYPE"] != "include":
-            statements.append(statement)
-        else:
-            # Handle include file
-            include_file = expand_variables(statement["ACTIONS"])
-            if not already_included(include_file):
-                # Save context, get statements from include file, restore
-                Last_include_position = starting_position
-                Include_stack_line.append(get_line_number(starting_position))
-                #print "--> " + include_file
-                statements.extend(parse_file(include_file))
-                #print "<--"
-                Include_stack_line.pop()
+        if records is not None:
+            records.append([copy_node(statement), starting_position, Uses])
+        add_statement(statement, starting_position, statements)
 
     return statements
 
+def add_statement(statement, starting_position, statements):
+    global Definitions, Include_stack_line, Last_include_position
+    global Statement_count
+
+    if statement["TYPE"] == "definition":
+        name = statement["NAME"]
+        if Definitions.has_key(name):
+            log_error("Redefinition of <"+name+">", starting_position)
+        Definitions[name] = statement
+    elif statement["TYPE"] == "command":
+        statement["NAME"] = str(Statement_count)
+        Statement_count += 1
+
+    #print unparse_statements([statement]),
+    if statement["TYPE"] != "include":
+        statements.append(statement)
+    else:
+        # Handle include file
+        include_file = expand_variables(statement["ACTIONS"])
+        if not already_included(include_file):
+            # Save context, get statements from include file, restore
+            Last_include_position = starting_position
+            Include_stack_line.append(get_line_number(starting_position))
+            #print "--> " + include_file
+            statements.extend(parse_file(include_file))
+            #print "<--"
+            Include_stack_line.pop()
+
+
 def parse_statement():
     if peek(TOKEN_CONTEXT):
         return parse_context()
@@ -548,6 +703,7 @@ def parse_term():         # <term> ::= <word> | variable | range | <menu>
             term = create_dictation_node()
         else:
             if Debug>=2: print_log("Found variable:  <" + name + ">")
+            Uses.append(["variable", name, starting_position])
             if not Definitions.has_key(name):
                 add_forward_reference(name, starting_position)
             term = create_variable_node(name)
@@ -558,6 +714,7 @@ def parse_term():         # <term> ::= <word> | variable | range | <menu>
 def create_dictation_node():
     global Should_emit_dictation_support
     Should_emit_dictation_support = True
+    Uses.append(["dictation"])
     term = {}
     term["TYPE"] = "dictation"
     return term
@@ -655,6 +812,7 @@ def create_formal_reference_node(name, position):
 
 def parse_call(callName):    # call = callName '(' arguments ')'
     global Debug, Dragon_functions, Extension_functions, Functions, Vocola_functions
+    global Uses_extensions
 
     call_position = get_last_position()
     if Debug>=2: print_log("Found call:  " + callName + "()")
@@ -670,6 +828,8 @@ def parse_call(callName):    # call = callName '(' arguments ')'
 
     nActuals = len(action["ARGUMENTS"])
     if callName.find(".") != -1:
+        Uses_extensions = True
+        Uses.append(["extensions"])
         if Extension_functions.has_key(callName):
             callFormals = Extension_functions[callName]
             lFormals = callFormals[0]
@@ -691,6 +851,7 @@ def parse_call(callName):    # call = callName '(' arguments ')'
     elif Functions.has_key(callName):
         lFormals = uFormals = Functions[callName]
         action["CALLTYPE"] = "user"
+        Uses.append(["call", callName, Functions[callName]])
     else:
         error("Call to unknown function '" + callName + "'", call_position)
 
@@ -747,11 +908,24 @@ def error(message, position, advice=""):
     raise RuntimeError, message    # <<<>>>
 
 def log_error(message, position=None, advice=""):
-    global Error_count, Input_name
+    global Error_count, Input_name, Include_stack_file
     if Error_count==0: print_log("Converting " + Input_name)
-    print_log(format_error_message(message, position, advice), True)
+    text = format_error_message(message, position, advice)
+    print_log(text, True)
     Error_count += 1
 
+    diagnostic = {}
+    diagnostic["INPUT"]   = Input_name
+    diagnostic["FILE"]    = Input_name
+    if len(Include_stack_file) > 0:
+        diagnostic["FILE"] = Include_stack_file[-1]
+    diagnostic["LINE"]    = None
+    if position != None:
+        diagnostic["LINE"] = get_line_number(position)
+    diagnostic["MESSAGE"] = message.rstrip("\n")
+    diagnostic["TEXT"]    = text
+    add_diagnostic(diagnostic)
+
 def format_error_message(message, position=None, advice=""):
     global Include_stack_file, Include_stack_line
 
@@ -798,6 +972,7 @@ def expand_variables(actions):
         elif type == "formalref":
             variable = action["TEXT"][1:]
             value = os.environ.get(variable)
+            Environment_used[variable] = value
             if not value:
                 # Should be a warning not an error.
                 log_error("Reference to unknown environment variable '"
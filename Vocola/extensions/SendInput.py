@@ -13,7 +13,9 @@
 ### Version: 0.6
 ### 
 
+from collections import OrderedDict
 from ctypes import *
+import time
 import win32con
 
 
@@ -42,13 +44,94 @@ import win32con
 ##   this problem, check the keyboard's state with the GetAsyncKeyState
 ##   function and correct as necessary.
 ## 
+##       Events may also be an EventBuffer.  A tuple of events is
+##   compiled into an EventBuffer once and reused when the same tuple is
+##   sent again (see compile_events).
+## 
+##       Long sequences are submitted in chunks of at most Chunk_size
+##   events, with a pause of Chunk_pause seconds between them, which
+##   lets other threads and the target application run.  (Only the
+##   events within one chunk are guaranteed not to be interspersed with
+##   other input.)
+## 
 
 def send_input(events):
-    inputs = [e.to_input() for e in events]
-    input = (Input * len(events))(*inputs)
-    inserted = windll.user32.SendInput(len(input), byref(input), sizeof(Input))
-    if inserted != len(events):
-        raise ValueError("windll.user32.SendInput: " + FormatMessage())
+    if not isinstance(events, EventBuffer):
+        events = compile_events(events)
+    events.send()
+
+
+Chunk_size  = 500
+Chunk_pause = 0      # seconds; 0 just yields to other threads
+
+# The Windows function, replaced by a stub for testing:
+Win32SendInput = windll.user32.SendInput
+
+
+## 
+## Compiled events:
+## 
+##     An EventBuffer holds the raw INPUT array for a sequence of events,
+## filled in directly from the events, so sending it (again) creates no
+## further ctypes objects.
+## 
+
+class EventBuffer:
+    def __init__(self, events):
+        self.length = len(events)
+        self.inputs = (Input * self.length)()
+        for i in range(self.length):
+            fill_input(self.inputs[i], events[i])
+
+    def send(self):
+        size    = sizeof(Input)
+        address = addressof(self.inputs)
+        start   = 0
+        while start < self.length:
+            if start > 0: time.sleep(Chunk_pause)
+            count    = min(Chunk_size, self.length - start)
+            inserted = Win32SendInput(count, c_void_p(address + start*size),
+                                      size)
+            if inserted != count:
+                raise ValueError("windll.user32.SendInput: " + 
+                                 FormatMessage())
+            start += count
+
+def fill_input(input, event):
+    if isinstance(event, KeyboardInput):
+        input.type     = win32con.INPUT_KEYBOARD
+        input.Union.ki = event
+    elif isinstance(event, MouseInput):
+        input.type     = win32con.INPUT_MOUSE
+        input.Union.mi = event
+    elif isinstance(event, HardwareInput):
+        input.type     = win32con.INPUT_HARDWARE
+        input.Union.hi = event
+    else:
+        event          = event.to_input()
+        input.type     = event.type
+        input.Union    = event.Union
+
+
+# EventBuffers of the most recently sent tuples of events; Vocola
+# commands send the same (cached, see ExtendedSendDragonKeys) tuples over
+# and over.  The tuples are looked up by identity (and kept alive by the
+# cache, so their ids are not reused); lists are not cached as they may be
+# changed.
+Event_buffer_cache_size = 200    # 0 disables the cache
+Event_buffer_cache      = OrderedDict()   # id: [events, EventBuffer], oldest first
+
+def compile_events(events):
+    if not isinstance(events, tuple) or Event_buffer_cache_size <= 0:
+        return EventBuffer(events)
+    try:
+        entry = Event_buffer_cache.pop(id(events))
+    except KeyError:
+        entry = [events, EventBuffer(events)]
+        if len(Event_buffer_cache) >= Event_buffer_cache_size:
+            Event_buffer_cache.popitem(last=False)   # least recently used
+    Event_buffer_cache[id(events)] = entry
+    return entry[1]
 
 
 ## 
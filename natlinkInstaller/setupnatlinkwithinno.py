@@ -143,7 +143,7 @@ class InnoScript:
         self.outputFilename = "setup-natlink-%s"% self.version
         print >> ofi, r"OutputBaseFilename=%s"% self.outputFilename
         print >> ofi, r"AppName=%s"% self.name
-        print >> ofi, r"AppVerName=%s version %s (including Vocola 2.8.6 and Unimacro)" % (self.name, self.version)
+        print >> ofi, r"AppVerName=%s version %s (including Vocola 2.8.7 and Unimacro)" % (self.name, self.version)
         print >> ofi, r"DefaultDirName=C:\%s" % self.name
         print >> ofi, r"DefaultGroupName=%s" % self.name
         print >> ofi, r"LicenseFile=..\NatLink\COPYRIGHT.txt"